@@ -1,2 +1,5 @@
-__all__ = ('llrp', 'llrp_decoder', 'llrp_errors', 'llrp_proto', 'util', 'inventory')
+__all__ = ('llrp', 'llrp_decoder', 'llrp_errors', 'llrp_proto', 'util', 'inventory',
+    'columnar', 'trace', 'bench', 'tagqueue', 'decodepool',
+    'aio', 'capabilities', 'fleet', 'timerwheel', 'aggregate',
+    'presence')
 __version__ = '0.0.1'
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""Windowed aggregation of tag sightings.
+
+In a dense tag population readers report far more sightings than most
+consumers want.  Passing a TagAggregator to LLRPClientFactory
+(tag_aggregator=...) folds the tags that clients decode into one entry per
+reader, EPC and antenna (or per reader and EPC, without per_antenna), and
+reports each entry once a window, window seconds after it was first seen,
+to the aggregator's callbacks.  The record is the entry's latest tag (a
+TagReportData dict or a record such as TagRead) with TagSeenCount summed,
+PeakRSSI the highest seen and the first-seen timestamps of its first
+sighting, counting every sighting since the entry's previous record.
+
+The factory's tag batch callbacks (addTagBatchCallback) then get these
+records in place of the raw tags.  Tag report and RO_ACCESS_REPORT message
+callbacks, and a tag_queue, still see every report as the reader sent it.
+
+Only new or changed entries are reported: once an entry has been reported,
+its next windows are reported only if its PeakRSSI has moved by at least
+rssi_change dBm since, and their sightings are otherwise carried over to the
+next record.  With rssi_change=None, every window is reported.  An entry
+that goes a window without being seen is forgotten, after reporting any
+sightings it still holds.
+
+Entries live in a hash table kept in least-recently-seen order, and their
+windows end on a ClockedTimerWheel that ticks every resolution seconds, so a
+tick costs as much as the windows that end on it, however many tags are
+known.
+Beyond maxlen entries, the least recently seen entry is evicted, reporting
+any sightings it still holds.
+"""
+
+import copy
+import logging
+from collections import OrderedDict
+from twisted.internet import reactor
+from tagqueue import tag_epc
+from timerwheel import ClockedTimerWheel, ticks_for
+
+logger = logging.getLogger(__name__)
+
+def tag_field (tag, name):
+    """Return the value of the field name of a TagReportData dict or TagRead
+    record, or None if the reader didn't send it."""
+    if isinstance(tag, dict):
+        value = tag.get(name)
+        return value[0] if value is not None else None
+    return getattr(tag, name)
+
+_first_seen = ('FirstSeenTimestampUTC', 'FirstSeenTimestampUptime')
+
+def fold_sightings (first, last, count, peak):
+    """Return a copy of last, the latest sighting of a tag, with the
+    first-seen timestamps of first, TagSeenCount count and, unless it is
+    None, PeakRSSI peak."""
+    merged = copy.copy(last)
+    if isinstance(last, dict):
+        for key in _first_seen:
+            if key in first:
+                merged[key] = first[key]
+        merged['TagSeenCount'] = (count,)
+        if peak is not None:
+            merged['PeakRSSI'] = (peak,)
+    else:
+        for attr in _first_seen:
+            if getattr(first, attr) is not None:
+                setattr(merged, attr, getattr(first, attr))
+        merged.TagSeenCount = count
+        if peak is not None:
+            merged.PeakRSSI = peak
+    return merged
+
+class _Entry (object):
+    """The sightings of one tag since its last record."""
+    __slots__ = ('first', 'last', 'count', 'peak', 'seen', 'reported',
+                 'reported_peak')
+
+    def __init__ (self):
+        self.first = self.last = None
+        self.count = 0
+        self.peak = None
+        # whether the tag has been seen in the current window
+        self.seen = False
+        # whether the entry has been reported, and with what PeakRSSI
+        self.reported = False
+        self.reported_peak = None
+
+    def add (self, tag):
+        if self.first is None:
+            self.first = tag
+        self.last = tag
+        count = tag_field(tag, 'TagSeenCount')
+        self.count += 1 if count is None else count
+        rssi = tag_field(tag, 'PeakRSSI')
+        if rssi is not None and (self.peak is None or rssi > self.peak):
+            self.peak = rssi
+        self.seen = True
+
+    def record (self):
+        """Return the record of the sightings, and start over."""
+        record = fold_sightings(self.first, self.last, self.count, self.peak)
+        self.reported = True
+        self.reported_peak = self.peak
+        self.first = self.last = None
+        self.count = 0
+        self.peak = None
+        return record
+
+class TagAggregator (object):
+    """Tag sightings aggregated per window; see the module docstring."""
+
+    def __init__ (self, window=1.0, resolution=None, maxlen=100000,
+                 per_antenna=True, rssi_change=1, clock=reactor):
+        if window <= 0:
+            raise ValueError('window must be positive')
+        if maxlen < 1:
+            raise ValueError('maxlen must be positive')
+        self.window = window
+        self.resolution = window / 10.0 if resolution is None else resolution
+        self.window_ticks = ticks_for(window, self.resolution)
+        self.wheel = ClockedTimerWheel(self._expired, self.resolution,
+                                       self.window_ticks + 1, clock=clock)
+        self.maxlen = maxlen
+        self.per_antenna = per_antenna
+        self.rssi_change = rssi_change
+
+        # (peername, EPC, antenna or None) -> _Entry, least recently seen
+        # first
+        self._entries = OrderedDict()
+        self._callbacks = []
+        # peername -> records waiting to go to the callbacks
+        self._out = {}
+
+        self.tags = 0
+        self.records = 0
+        self.suppressed = 0
+        self.evicted = 0
+        self.max_entries = 0
+
+    def __len__ (self):
+        return len(self._entries)
+
+    def addCallback (self, cb):
+        """Call cb(peername, records) with each reader's records."""
+        self._callbacks.append(cb)
+
+    def stats (self):
+        """Return the aggregator's counters as a dict."""
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'tags': self.tags,
+            'records': self.records,
+            'suppressed': self.suppressed,
+            'evicted': self.evicted,
+        }
+
+    def put (self, client, tags):
+        """Aggregate tags reported by client (an LLRPClient)."""
+        peername = client.peername
+        entries = self._entries
+        for tag in tags:
+            antenna = tag_field(tag, 'AntennaID') if self.per_antenna \
+                    else None
+            key = (peername, tag_epc(tag), antenna)
+            entry = entries.pop(key, None)
+            if entry is None:
+                if len(entries) >= self.maxlen:
+                    self._evict()
+                entry = _Entry()
+                self.wheel.schedule(key, self.window_ticks)
+            entries[key] = entry
+            entry.add(tag)
+        self.tags += len(tags)
+        self.max_entries = max(self.max_entries, len(entries))
+        self._deliver()
+
+    def flush (self):
+        """Report the sightings every entry still holds, and forget all of
+        the entries."""
+        for key, entry in self._entries.items():
+            self.wheel.cancel(key)
+            if entry.first is not None:
+                self._emit(key, entry)
+        self._entries.clear()
+        self.wheel.stop()
+        self._deliver()
+
+    def _expired (self, keys):
+        for key in keys:
+            self._expire(key)
+        self._deliver()
+
+    def _expire (self, key):
+        """End the window of the entry for key."""
+        entry = self._entries[key]
+        if not entry.seen:
+            del self._entries[key]
+            if entry.first is not None:
+                self._emit(key, entry)
+            return
+        entry.seen = False
+        if self._changed(entry):
+            self._emit(key, entry)
+        else:
+            self.suppressed += 1
+        self.wheel.schedule(key, self.window_ticks)
+
+    def _changed (self, entry):
+        if not entry.reported or self.rssi_change is None:
+            return True
+        if entry.peak is None or entry.reported_peak is None:
+            return entry.peak != entry.reported_peak
+        return abs(entry.peak - entry.reported_peak) >= self.rssi_change
+
+    def _evict (self):
+        key, entry = self._entries.popitem(last=False)
+        self.wheel.cancel(key)
+        self.evicted += 1
+        if entry.first is not None:
+            self._emit(key, entry)
+
+    def _emit (self, key, entry):
+        self._out.setdefault(key[0], []).append(entry.record())
+        self.records += 1
+
+    def _deliver (self):
+        if not self._out:
+            return
+        out, self._out = self._out, {}
+        for peername, records in out.items():
+            for fn in self._callbacks:
+                fn(peername, records)
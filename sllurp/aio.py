@@ -0,0 +1,248 @@
+"""LLRP client for asyncio event loops.
+
+AsyncLLRPClient is an asyncio Protocol that runs the same LLRPClient state
+machine, callbacks and ROSpec handling as the Twisted client, without a
+running reactor: the protocol feeds received bytes to an LLRPClient, whose
+writes go to the asyncio transport and whose timed calls go to the event
+loop.  Its coroutines wrap the client's Deferreds in futures.
+
+sllurp runs on Python 2, so this module uses Trollius, the Python 2 port of
+asyncio, which is not otherwise a dependency of sllurp; coroutines use
+"yield From(...)" rather than "await", and tag reports are read with
+next_tags() rather than "async for".  There are no native "async def"
+methods, and no uvloop, which needs Python 3.  The client still imports
+Twisted, whose Deferreds it uses internally, but never runs the reactor:
+
+    @asyncio.coroutine
+    def inventory(loop):
+        reader = yield From(connect('192.168.1.10', loop=loop, duration=10))
+        yield From(reader.start_inventory())
+        while True:
+            tags = yield From(reader.next_tags())
+            if tags is None:
+                break
+            ...
+"""
+
+import functools
+import logging
+import socket
+from twisted.internet.error import ConnectionDone
+from twisted.python import failure
+from llrp import LLRPClient, LLRP_PORT
+from llrp_errors import LLRPError
+
+try:
+    import trollius as asyncio
+    from trollius import From, Return
+    coroutine = asyncio.coroutine
+    Protocol = asyncio.Protocol
+except ImportError:
+    asyncio = None
+    coroutine = lambda f: f
+    Protocol = object
+
+logger = logging.getLogger(__name__)
+
+def future_from_deferred (d, loop):
+    """Return a future on loop with the outcome of the Deferred d."""
+    future = asyncio.Future(loop=loop)
+    def callback (result):
+        if not future.cancelled():
+            future.set_result(result)
+    def errback (failure):
+        if not future.cancelled():
+            exc = failure.value
+            if not isinstance(exc, BaseException):
+                exc = LLRPError(failure.getErrorMessage())
+            future.set_exception(exc)
+    d.addCallbacks(callback, errback)
+    return future
+
+class _DelayedCall (object):
+    def __init__ (self, loop, delay, f, args, kwargs):
+        self.called = False
+        self.cancelled = False
+        self.func = functools.partial(f, *args, **kwargs)
+        self.handle = loop.call_later(delay, self._call)
+
+    def _call (self):
+        self.called = True
+        self.func()
+
+    def active (self):
+        return not (self.called or self.cancelled)
+
+    def cancel (self):
+        self.cancelled = True
+        self.handle.cancel()
+
+class LoopClock (object):
+    """The callLater() of Twisted's reactor, scheduling calls on an asyncio
+    event loop."""
+
+    def __init__ (self, loop):
+        self.loop = loop
+
+    def callLater (self, delay, f, *args, **kwargs):
+        return _DelayedCall(self.loop, delay, f, args, kwargs)
+
+    def seconds (self):
+        return self.loop.time()
+
+class _TransportAdapter (object):
+    """The parts of a Twisted TCP transport that LLRPClient uses, over an
+    asyncio transport."""
+
+    def __init__ (self, transport):
+        self.transport = transport
+
+    def write (self, data):
+        self.transport.write(bytes(data))
+
+    def loseConnection (self):
+        self.transport.close()
+
+    def abortConnection (self):
+        self.transport.abort()
+
+    def pauseProducing (self):
+        self.transport.pause_reading()
+
+    def resumeProducing (self):
+        self.transport.resume_reading()
+
+    def getHandle (self):
+        # LLRPClient only asks its transport's handle for the peer address
+        return self
+
+    def getpeername (self):
+        return self.transport.get_extra_info('peername')
+
+    def setTcpKeepAlive (self, enabled):
+        sock = self.transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, enabled)
+
+class AsyncLLRPClient (Protocol):
+    """An asyncio Protocol driving an LLRPClient.
+
+    Keyword arguments are passed to LLRPClient; the client itself is
+    available as the client attribute, e.g., for addMessageCallback().
+    Tags are queued in batches of one TCP read (or of tag_batch_window
+    seconds) for next_tags()."""
+
+    def __init__ (self, loop=None, **kwargs):
+        if asyncio is None:
+            raise LLRPError('sllurp.aio requires Trollius')
+        self.loop = loop or asyncio.get_event_loop()
+        # LLRPClient registers itself with its factory's protocols
+        self.protocols = set()
+        self.client = LLRPClient(self, **kwargs)
+        self.client.clock = LoopClock(self.loop)
+        self.client.addTagBatchCallback(self._tagsReceived)
+        self.tags = asyncio.Queue(loop=self.loop)
+        self.closed = asyncio.Future(loop=self.loop)
+        # STATE_* -> [futures waiting for it]
+        self._state_waiters = {}
+
+    def connection_made (self, transport):
+        self.client.transport = _TransportAdapter(transport)
+        self.client.connectionMade()
+
+    def data_received (self, data):
+        self.client.dataReceived(data)
+
+    def connection_lost (self, exc):
+        self.client.connectionLost(failure.Failure(exc or ConnectionDone()))
+        self.tags.put_nowait(None)
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+    def _tagsReceived (self, _, tags):
+        self.tags.put_nowait(tags)
+
+    @coroutine
+    def next_tags (self):
+        """Return the next batch of tags as a list, or None once the
+        connection is closed."""
+        if self.closed.done() and self.tags.empty():
+            raise Return(None)
+        tags = yield From(self.tags.get())
+        if tags is None:
+            # let later calls see the end too
+            self.tags.put_nowait(None)
+        raise Return(tags)
+
+    def _stateChanged (self, client):
+        for future in self._state_waiters.pop(client.state, []):
+            if not future.done():
+                future.set_result(client.state)
+
+    @coroutine
+    def wait_for_state (self, state):
+        """Wait until the client enters state (an LLRPClient.STATE_*), unless
+        it is in it already."""
+        if self.client.state == state:
+            raise Return(state)
+        if state not in self._state_waiters:
+            self._state_waiters[state] = []
+            self.client.addStateCallback(state, self._stateChanged)
+        future = asyncio.Future(loop=self.loop)
+        self._state_waiters[state].append(future)
+        yield From(asyncio.wait([future, self.closed], loop=self.loop,
+                                return_when=asyncio.FIRST_COMPLETED))
+        if not future.done():
+            raise LLRPError('connection closed before reaching state '
+                    '{}'.format(LLRPClient.getStateName(state)))
+        raise Return(state)
+
+    @coroutine
+    def start_inventory (self):
+        """Start inventorying, unless the client is about to on its own
+        (start_inventory=True, the default, starts on connecting), and wait
+        until the reader is inventorying."""
+        if self.client.state == LLRPClient.STATE_PAUSED:
+            self.client.resume()
+        elif self.client.state == LLRPClient.STATE_CONNECTED:
+            self.client.startInventory()
+        yield From(self.wait_for_state(LLRPClient.STATE_INVENTORYING))
+
+    @coroutine
+    def stop_politely (self, disconnect=False):
+        """Delete the reader's AccessSpecs and ROSpecs, and wait for it to
+        confirm.  Raise LLRPError if it reports an error deleting them."""
+        d = self.client.stopPolitely(disconnect=disconnect)
+        # stopPolitely() logs a failed deletion and carries on, leaving the
+        # client in the state that sent it; note that state before a
+        # disconnection moves it on
+        d.addCallback(lambda _: self.client.state)
+        state = yield From(future_from_deferred(d, self.loop))
+        if state not in (LLRPClient.STATE_CONNECTED,
+                         LLRPClient.STATE_DISCONNECTED):
+            raise LLRPError('stopping failed in state {}'.format(
+                LLRPClient.getStateName(state)))
+
+    @coroutine
+    def access (self, readWords=None, writeWords=None, target=None):
+        """Add and enable an AccessSpec (see LLRPClient.startAccess()), and
+        wait for the reader to confirm.  Raise LLRPResponseError if it
+        reports an error.  The results arrive with the tags."""
+        yield From(future_from_deferred(
+            self.client.startAccess(readWords=readWords,
+                                    writeWords=writeWords, target=target),
+            self.loop))
+
+    def close (self):
+        self.client.transport.loseConnection()
+
+@coroutine
+def connect (host, port=LLRP_PORT, loop=None, **kwargs):
+    """Connect to the reader at host, and return its AsyncLLRPClient.
+    Keyword arguments are passed to LLRPClient."""
+    if asyncio is None:
+        raise LLRPError('sllurp.aio requires Trollius')
+    loop = loop or asyncio.get_event_loop()
+    _, protocol = yield From(loop.create_connection(
+        lambda: AsyncLLRPClient(loop=loop, **kwargs), host, port))
+    raise Return(protocol)
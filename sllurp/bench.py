@@ -0,0 +1,158 @@
+"""Benchmark RO_ACCESS_REPORT decoding with tracing off.
+
+Compares the decode throughput of llrp_proto as shipped, with its trace points
+guarded by trace.enabled, against a copy of llrp_proto with every
+"if trace.enabled:" block removed from the source.  The two should be within
+noise of each other; with --trace the run is repeated with a no-op hook
+installed to show what tracing costs when it is on.
+
+Decodes a recorded stream of raw LLRP messages if one is given, or else
+synthetic reports.
+"""
+
+from __future__ import print_function
+import argparse
+import imp
+import os
+import struct
+import sys
+import time
+
+import sllurp.trace as trace
+from sllurp.llrp_proto import Message_struct, msg_header, msg_header_len, \
+     par_header
+from sllurp.util import BITMASK
+
+args = None
+
+def untrace (source):
+    """Return source with every "if trace.enabled:" block removed."""
+    out = []
+    guard_indent = None
+    for line in source.splitlines(True):
+        indent = len(line) - len(line.lstrip())
+        if guard_indent is not None:
+            if not line.strip() or indent > guard_indent:
+                continue
+            guard_indent = None
+        if line.strip() == 'if trace.enabled:':
+            guard_indent = indent
+            continue
+        out.append(line)
+    return ''.join(out)
+
+def load_untraced (name='llrp_proto'):
+    """Import a copy of the sllurp module name with its trace points
+    removed."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        name + '.py')
+    with open(path) as f:
+        source = untrace(f.read())
+    mod = imp.new_module('sllurp._untraced_{}'.format(name))
+    mod.__file__ = path
+    sys.modules[mod.__name__] = mod
+    exec compile(source, path, 'exec') in mod.__dict__
+    if hasattr(mod, 'compile_codecs'):
+        # the codecs generated at import have trace points of their own
+        mod.trace_codecs = False
+        mod.compile_codecs()
+    return mod
+
+def synthetic_reports (nreports, tags_per_report):
+    """Return nreports RO_ACCESS_REPORTs with EPC-96, AntennaID, PeakRSSI,
+    FirstSeenTimestampUTC and TagSeenCount for each tag."""
+    tags = []
+    for i in range(tags_per_report):
+        body = struct.pack('!B12sBHBbBQBH',
+                0x80 | 13, struct.pack('!4xQ', i),
+                0x80 | 1, 1 + i % 4,
+                0x80 | 6, -40 - i % 30,
+                0x80 | 2, 1400000000000000 + i,
+                0x80 | 8, 1)
+        tags.append(struct.pack(par_header,
+                Message_struct['TagReportData']['type'],
+                struct.calcsize(par_header) + len(body)) + body)
+    body = ''.join(tags)
+    msgs = []
+    for i in range(nreports):
+        msgs.append(struct.pack(msg_header,
+                (1 << 10) | Message_struct['RO_ACCESS_REPORT']['type'],
+                msg_header_len + len(body), i) + body)
+    return ''.join(msgs)
+
+def report_bodies (data):
+    """Return buffers over the bodies of the RO_ACCESS_REPORTs in data."""
+    bodies = []
+    report_type = Message_struct['RO_ACCESS_REPORT']['type']
+    offset = 0
+    while offset + msg_header_len <= len(data):
+        msgtype, length, _ = struct.unpack_from(msg_header, data, offset)
+        if length < msg_header_len or offset + length > len(data):
+            break
+        if msgtype & BITMASK(10) == report_type:
+            bodies.append(buffer(data, offset + msg_header_len,
+                                 length - msg_header_len))
+        offset += length
+    return bodies
+
+def run (decode, bodies, repeat):
+    """Return (best time, number of tags) for decoding bodies repeat
+    times."""
+    best = None
+    for _ in range(repeat):
+        ntags = 0
+        start = time.time()
+        for body in bodies:
+            ntags += len(decode(body)['TagReportData'])
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, ntags
+
+def parse_args ():
+    global args
+    parser = argparse.ArgumentParser(description='Benchmark '
+            'RO_ACCESS_REPORT decoding with and without trace points')
+    parser.add_argument('file', nargs='?', type=argparse.FileType('rb'),
+            help='recorded stream of LLRP messages (default: synthetic)')
+    parser.add_argument('-n', '--reports', default=1000, type=int,
+            help='number of synthetic reports (default 1000)')
+    parser.add_argument('-t', '--tags', default=20, type=int,
+            help='tags per synthetic report (default 20)')
+    parser.add_argument('-r', '--repeat', default=5, type=int,
+            help='best of how many runs (default 5)')
+    parser.add_argument('--trace', action='store_true',
+            help='also time decoding with a no-op trace hook installed')
+    args = parser.parse_args()
+
+def main ():
+    parse_args()
+    if args.file:
+        data = args.file.read()
+    else:
+        data = synthetic_reports(args.reports, args.tags)
+    bodies = report_bodies(data)
+
+    import sllurp.llrp_proto as traced
+    untraced = load_untraced()
+    runs = [('untraced', untraced.decode_ROAccessReport),
+            ('trace off', traced.decode_ROAccessReport)]
+    results = []
+    for label, decode in runs:
+        results.append((label,) + run(decode, bodies, args.repeat))
+    if args.trace:
+        hook = lambda kind, name, fields: None
+        trace.add_hook(hook)
+        try:
+            results.append(('trace on',) +
+                    run(traced.decode_ROAccessReport, bodies, args.repeat))
+        finally:
+            trace.remove_hook(hook)
+
+    baseline = results[0][1]
+    for label, elapsed, ntags in results:
+        print('{:10} {:8d} tags in {:.3f} s: {:10.0f} tags/s ({:.2f}x)'.format(
+            label, ntags, elapsed, ntags / elapsed, elapsed / baseline))
+
+if __name__ == '__main__':
+    main()
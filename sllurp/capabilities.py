@@ -0,0 +1,139 @@
+"""Cache of reader capabilities, shared by readers of the same kind.
+
+A full GET_READER_CAPABILITIES_RESPONSE is large and slow to decode, and
+LLRPClient needs only a little of it: the number of antennas, the transmit
+power table and the RF mode table.  ReaderCapabilities holds those, indexed
+for lookup, and CapabilitiesCache keeps them in memory (and, given a path,
+in a JSON file) keyed by the identity of the reader that reported them: its
+manufacturer, model and firmware version.
+
+An LLRPClient given capabilities_cache=... (usually through
+LLRPClientFactory's keyword arguments) first requests only the General
+Device Capabilities, which carry that identity, and requests the rest only
+if the cache doesn't know the reader.  Readers of one model and firmware
+configured for different regulatory regions report different power and mode
+tables, so they shouldn't share a cache.
+"""
+
+import json
+import logging
+import os
+from binascii import hexlify
+
+logger = logging.getLogger(__name__)
+
+def reader_identity (gdc):
+    """Return the cache key identifying the reader that reported gdc, a
+    GeneralDeviceCapabilities dict."""
+    return '{}:{}:{}'.format(gdc['DeviceManufacturerName'], gdc['ModelName'],
+                             hexlify(gdc['ReaderFirmwareVersion']))
+
+class ReaderCapabilities (object):
+    """The capabilities of a reader that LLRPClient uses."""
+
+    def __init__ (self, identity, max_antennas, tx_power_table, modes):
+        self.identity = identity
+        self.max_antennas = max_antennas
+        # power table index -> dBm (index 0 is unused)
+        self.tx_power_table = tx_power_table
+        # UHFC1G2RFModeTableEntry dicts, in table order
+        self.modes = modes
+        # Mod -> modes with that modulation, in table order
+        self.modes_by_modulation = {}
+        for mode in modes:
+            self.modes_by_modulation.setdefault(mode['Mod'], []).append(mode)
+
+    @classmethod
+    def fromResponse (cls, capdict):
+        """Extract the capabilities from capdict, a decoded
+        GET_READER_CAPABILITIES_RESPONSE."""
+        gdc = capdict['GeneralDeviceCapabilities']
+        band = capdict['RegulatoryCapabilities']['UHFBandCapabilities']
+        powers = [v for k, v in band.items()
+                  if k.startswith('TransmitPowerLevelTableEntry')]
+        tx_power_table = [0] * (len(powers) + 1)
+        for v in powers:
+            tx_power_table[v['Index']] = int(v['TransmitPowerValue']) / 100.0
+        prefix = 'UHFC1G2RFModeTableEntry'
+        modes = [dict(mode) for _, mode in sorted(
+            (int(k[len(prefix):]), v)
+            for k, v in band['UHFRFModeTable'].items()
+            if k.startswith(prefix))]
+        return cls(reader_identity(gdc), gdc['MaxNumberOfAntennaSupported'],
+                   tx_power_table, modes)
+
+    def findMode (self, modulation, tari=0):
+        """Return the first mode with modulation (a Mod value) and, if tari is
+        nonzero, a MaxTari of tari; or None if there is no such mode."""
+        for mode in self.modes_by_modulation.get(modulation, ()):
+            if not tari or mode['MaxTari'] == tari:
+                return mode
+        return None
+
+    def toDict (self):
+        return {'max_antennas': self.max_antennas,
+                'tx_power_table': self.tx_power_table,
+                'modes': self.modes}
+
+    @classmethod
+    def fromDict (cls, identity, d):
+        modes = [dict((str(k), v) for k, v in mode.items())
+                 for mode in d['modes']]
+        return cls(identity, d['max_antennas'], d['tx_power_table'], modes)
+
+class CapabilitiesCache (object):
+    """ReaderCapabilities by reader identity, saved to the JSON file path if
+    one is given."""
+    version = 1
+
+    def __init__ (self, path=None):
+        self.path = path
+        self._caps = {}
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__ (self):
+        return len(self._caps)
+
+    def get (self, gdc):
+        """Return the ReaderCapabilities of the reader that reported gdc (a
+        GeneralDeviceCapabilities dict), or None."""
+        caps = self._caps.get(reader_identity(gdc))
+        if caps is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return caps
+
+    def put (self, caps):
+        """Add caps, a ReaderCapabilities, and save the cache."""
+        self._caps[caps.identity] = caps
+        if self.path is not None:
+            self.save()
+
+    def load (self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved.get('version') != self.version:
+                logger.info('ignoring capabilities cache %s of version %s',
+                            self.path, saved.get('version'))
+                return
+            for identity, d in saved['readers'].items():
+                identity = str(identity)
+                self._caps[identity] = ReaderCapabilities.fromDict(identity,
+                                                                   d)
+        except (IOError, ValueError, KeyError, TypeError):
+            logger.exception('failed to load capabilities cache %s; '
+                             'ignoring it', self.path)
+
+    def save (self):
+        saved = {'version': self.version,
+                 'readers': dict((identity, caps.toDict())
+                                 for identity, caps in self._caps.items())}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(saved, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.path)
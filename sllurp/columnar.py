@@ -0,0 +1,182 @@
+"""Columnar decoding of RO_ACCESS_REPORTs into NumPy structured arrays.
+
+When the TagReportContentSelector of the ROSpec is known, every
+TagReportData parameter carrying an EPC-96 has the same fixed size and layout,
+so a run of them can be viewed as an array of packed records and split into
+columns with NumPy instead of being decoded one tag at a time.  Parameters that
+don't fit the layout (EPCData, OpSpecResults, reader-specific extras) are
+decoded with decode_TagReportData and copied into their rows.
+
+Requires NumPy, which is not otherwise a dependency of sllurp.
+"""
+
+import struct
+import logging
+from binascii import unhexlify
+from llrp_proto import Message_struct, TagReportContentSelector_TVParams, \
+        decode_TagReportData_from, msg_header, msg_header_len, par_header, \
+        par_header_len, llrp_decoder
+from llrp_errors import LLRPError
+from util import BITMASK
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# TV-encoded parameters -> output columns; both timestamp flavors share one
+TV_COLUMNS = {
+    'FirstSeenTimestampUTC': 'FirstSeenTimestamp',
+    'FirstSeenTimestampUptime': 'FirstSeenTimestamp',
+    'LastSeenTimestampUTC': 'LastSeenTimestamp',
+    'LastSeenTimestampUptime': 'LastSeenTimestamp',
+}
+
+# struct format character -> NumPy type (big-endian, as on the wire)
+_np_types = {'B': 'u1', 'b': 'i1', 'H': '>u2', 'I': '>u4', 'Q': '>u8'}
+
+class ColumnarDecoder (object):
+    """Decode runs of TagReportData parameters into a NumPy structured array.
+
+    The array has an EPC column (12 raw bytes; longer EPCData EPCs are
+    truncated) plus one column for each field enabled in
+    tagReportContentSelector, e.g., AntennaID, PeakRSSI, ChannelIndex,
+    FirstSeenTimestamp, LastSeenTimestamp and TagSeenCount.  Fields a tag
+    doesn't carry are left as zero."""
+
+    epc_len = 12
+
+    def __init__ (self, tagReportContentSelector):
+        if numpy is None:
+            raise ImportError('columnar decoding requires NumPy')
+        wire = [('Type', '>u2'), ('Length', '>u2'),
+                ('EPCType', 'u1'), ('EPC', 'V{}'.format(self.epc_len))]
+        columns = [('EPC', 'V{}'.format(self.epc_len))]
+        # acceptable TV type bytes for each TV field, in wire order
+        self.tv_types = []
+        for field, tv_types in TagReportContentSelector_TVParams:
+            if not tagReportContentSelector.get(field):
+                continue
+            name, fmt = llrp_decoder.tve_param_formats[tv_types[0]]
+            name = TV_COLUMNS.get(name, name)
+            np_type = _np_types[fmt[1:]]
+            wire.append((name + 'Type', 'u1'))
+            wire.append((name, np_type))
+            columns.append((name, numpy.dtype(np_type).newbyteorder('=')))
+            self.tv_types.append((name, [t | 0x80 for t in tv_types]))
+        self.wire_dtype = numpy.dtype(wire)
+        self.dtype = numpy.dtype(columns)
+        self.size = self.wire_dtype.itemsize
+        self.header = struct.pack(par_header,
+                Message_struct['TagReportData']['type'], self.size)
+
+    def _valid (self, records):
+        """Return a boolean mask of the records that match the layout."""
+        ok = (records['Type'] & BITMASK(10) ==
+                Message_struct['TagReportData']['type'])
+        ok &= records['Length'] == self.size
+        ok &= records['EPCType'] == Message_struct['EPC-96']['type'] | 0x80
+        for name, tv_types in self.tv_types:
+            ok &= numpy.in1d(records[name + 'Type'], tv_types)
+        return ok
+
+    def _columns (self, records):
+        out = numpy.zeros(len(records), dtype=self.dtype)
+        for name in self.dtype.names:
+            out[name] = records[name]
+        return out
+
+    def _fill (self, out, i, par):
+        """Copy a decode_TagReportData dict into row i of out."""
+        if 'EPC-96' in par:
+            epc = par['EPC-96']
+        else:
+            epc = par['EPCData']['EPC']
+        epc = unhexlify(epc)[:self.epc_len].ljust(self.epc_len, '\0')
+        out['EPC'][i] = numpy.frombuffer(epc, dtype=out.dtype['EPC'])[0]
+        for name, value in par.items():
+            name = TV_COLUMNS.get(name, name)
+            if name != 'EPC' and name in out.dtype.names:
+                out[name][i] = value[0]
+
+    def decode (self, data, offsets=None):
+        """Decode TagReportData parameters from data (a string or buffer).
+
+        offsets lists where each parameter starts; if it is None, data must be
+        nothing but back-to-back TagReportData parameters, such as the body of
+        an RO_ACCESS_REPORT or a concatenation of several bodies."""
+        if offsets is None:
+            if len(data) % self.size == 0 and \
+                    data[:len(self.header)] == self.header:
+                # optimistically treat the whole thing as fixed-size records
+                records = numpy.frombuffer(data, dtype=self.wire_dtype)
+                if self._valid(records).all():
+                    return self._columns(records)
+            offsets = self.scan(data)
+
+        raw = numpy.frombuffer(data, dtype=numpy.uint8)
+        offsets = numpy.asarray(offsets, dtype=numpy.intp)
+        # gather the first self.size bytes at each offset into one record
+        # array; records near the end of data may be short and never valid
+        fits = offsets + self.size <= len(raw)
+        records = numpy.zeros(len(offsets), dtype=self.wire_dtype)
+        if fits.any():
+            idx = offsets[fits, numpy.newaxis] + numpy.arange(self.size)
+            records[fits] = raw[idx].view(self.wire_dtype)[:, 0]
+        valid = fits
+        valid[fits] = self._valid(records[fits])
+        # the fallback fills in only the fields a tag carries
+        records[~valid] = numpy.zeros(1, dtype=self.wire_dtype)
+
+        out = self._columns(records)
+        for i in numpy.flatnonzero(~valid):
+            par, _ = decode_TagReportData_from(data, int(offsets[i]),
+                    len(data))
+            if not par:
+                raise LLRPError('no TagReportData at offset '
+                        '{}'.format(offsets[i]))
+            self._fill(out, i, par)
+        return out
+
+    @staticmethod
+    def scan (data, start=0, end=None):
+        """Return the offsets of the TagReportData parameters in
+        data[start:end]."""
+        if end is None:
+            end = len(data)
+        offsets = []
+        unpack_from = struct.unpack_from
+        while start + par_header_len <= end:
+            msgtype, length = unpack_from(par_header, data, start)
+            if msgtype & BITMASK(10) != \
+                    Message_struct['TagReportData']['type'] or length == 0:
+                break
+            offsets.append(start)
+            start += length
+        return offsets
+
+    def decode_messages (self, data):
+        """Decode the TagReportData parameters of every RO_ACCESS_REPORT in
+        data, a stream of complete LLRP messages (e.g., a recorded session).
+        Other messages are skipped."""
+        offsets = []
+        report_type = Message_struct['RO_ACCESS_REPORT']['type']
+        start = 0
+        while start + msg_header_len <= len(data):
+            msgtype, length, _ = struct.unpack_from(msg_header, data,
+                    start)
+            if length < msg_header_len:
+                raise LLRPError('bad message length {} at offset '
+                        '{}'.format(length, start))
+            if msgtype & BITMASK(10) == report_type:
+                offsets.extend(self.scan(data, start + msg_header_len,
+                        start + length))
+            start += length
+        return self.decode(data, offsets)
+
+def decode_ROAccessReports (data, tagReportContentSelector):
+    """Decode every tag in data, a stream of LLRP messages, into a NumPy
+    structured array.  See ColumnarDecoder."""
+    return ColumnarDecoder(tagReportContentSelector).decode_messages(data)
@@ -0,0 +1,117 @@
+"""Decode LLRP messages off the reactor thread.
+
+An LLRPClient given decode_pool=... (usually through LLRPClientFactory's
+keyword arguments, so that every reader shares one pool) still frames
+messages and parses their headers in the reactor, but hands the bodies of
+RO_ACCESS_REPORTs to the pool and handles the decoded messages in the order
+the reader sent them.  Everything else is decoded inline; KEEPALIVEs are
+answered as soon as they arrive, even while reports ahead of them are still
+being decoded.
+
+ThreadDecodePool keeps the reactor responsive while reports are decoded, but
+the decoding still shares one core with it.  ProcessDecodePool decodes in
+worker processes and can use as many cores as it has workers; tags cross
+back to the reactor pickled, so it pays off mainly for large reports.
+"""
+
+import logging
+import multiprocessing
+import pickle
+from twisted.internet import defer, reactor, threads
+from twisted.python import failure, threadpool
+from llrp import LLRPMessage
+from llrp_errors import LLRPError
+from llrp_proto import TagReportDataDecoder
+
+logger = logging.getLogger(__name__)
+
+def decode_message (msgbytes, tag_decoder=None):
+    """Decode msgbytes, one complete LLRP message, and return its message
+    dict."""
+    return LLRPMessage(msgbytes=msgbytes, tag_decoder=tag_decoder).msgdict
+
+class ThreadDecodePool (object):
+    """Decode messages on a pool of threads."""
+
+    def __init__ (self, minthreads=1, maxthreads=4):
+        self.pool = threadpool.ThreadPool(minthreads, maxthreads,
+                                          name='sllurp-decode')
+        self.pool.start()
+        self._shutdown = reactor.addSystemEventTrigger('during', 'shutdown',
+                                                       self._stop)
+
+    def decode (self, msgbytes, tag_decoder=None):
+        """Return a Deferred that fires in the reactor thread with the message
+        dict of msgbytes."""
+        return threads.deferToThreadPool(reactor, self.pool, decode_message,
+                                         msgbytes, tag_decoder)
+
+    def stop (self):
+        if self._shutdown is not None:
+            reactor.removeSystemEventTrigger(self._shutdown)
+            self._stop()
+
+    def _stop (self):
+        self._shutdown = None
+        self.pool.stop()
+
+# worker-process state for ProcessDecodePool: pickled tag decoder (see
+# TagReportDataDecoder.__reduce__) -> decoder
+_tag_decoders = {}
+
+def _decode_in_worker (msgbytes, tag_decoder_spec):
+    try:
+        tag_decoder = None
+        if tag_decoder_spec is not None:
+            tag_decoder = _tag_decoders.get(tag_decoder_spec)
+            if tag_decoder is None:
+                tag_decoder = pickle.loads(tag_decoder_spec)
+                _tag_decoders[tag_decoder_spec] = tag_decoder
+        return True, decode_message(msgbytes, tag_decoder)
+    except Exception as e:
+        # exceptions don't always survive pickling; send back a description
+        return False, '{}: {}'.format(type(e).__name__, e)
+
+class ProcessDecodePool (object):
+    """Decode messages in a pool of worker processes."""
+
+    def __init__ (self, processes=None):
+        self.pool = multiprocessing.Pool(processes)
+        # the last tag decoder sent to the workers, and its pickle
+        self._spec = (None, None)
+        self._shutdown = reactor.addSystemEventTrigger('during', 'shutdown',
+                                                       self._stop)
+
+    def decode (self, msgbytes, tag_decoder=None):
+        """Return a Deferred that fires in the reactor thread with the message
+        dict of msgbytes."""
+        spec = None
+        if tag_decoder is not None:
+            if self._spec[0] is not tag_decoder:
+                self._spec = (tag_decoder, pickle.dumps(
+                        tag_decoder, pickle.HIGHEST_PROTOCOL))
+            spec = self._spec[1]
+        d = defer.Deferred()
+        def done (outcome):
+            reactor.callFromThread(self._fire, d, outcome)
+        self.pool.apply_async(_decode_in_worker, (msgbytes, spec),
+                              callback=done)
+        return d
+
+    @staticmethod
+    def _fire (d, outcome):
+        ok, result = outcome
+        if ok:
+            d.callback(result)
+        else:
+            d.errback(failure.Failure(LLRPError(result)))
+
+    def stop (self):
+        if self._shutdown is not None:
+            reactor.removeSystemEventTrigger(self._shutdown)
+            self._stop()
+
+    def _stop (self):
+        self._shutdown = None
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,288 @@
+"""Run many readers in several worker processes.
+
+LLRPClientFactory runs all of its readers in one process, so one core does
+all of the work for them, and with enough readers that core saturates.  A
+Fleet shards its readers across worker processes, each of which runs its own
+reactor and LLRPClientFactory, and merges their tags back into the parent's
+reactor:
+
+    fleet = Fleet(['reader1', 'reader2:5084',
+                   {'host': 'reader3', 'antennas': (1, 2)}],
+                  workers=4, reconnect=True, tag_batch_window=0.1)
+    fleet.addTagBatchCallback(lambda peername, tags: ...)
+    fleet.start()
+    reactor.run()
+
+Each reader is a host name, a 'host:port' string, or a dict of a 'host', an
+optional 'port', and LLRPClientFactory keyword arguments that override the
+Fleet's for that reader.  The keyword arguments are pickled to the workers,
+so they can't include objects such as a TagQueue or a decode pool.
+
+Workers are child Python processes (python -m sllurp.fleet) that exchange
+length-prefixed pickles with the parent over their stdin and stdout.  Tags
+cross in the batches of LLRPClient's tag batch callbacks, so
+tag_batch_window trades latency for fewer, larger messages.  A worker that
+exits is started again, with the same readers, after restart_delay seconds.
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+from twisted.internet import defer, error, protocol, reactor, stdio
+from twisted.protocols.basic import Int32StringReceiver
+
+from sllurp.llrp import LLRPClientFactory
+from sllurp.llrp_proto import LLRP_PORT
+
+logger = logging.getLogger(__name__)
+
+def parse_reader (reader, defaults={}):
+    """Return (host, port, factory keyword arguments) for reader, a host
+    name, 'host:port' string or dict (see the module docstring), with
+    defaults for the keyword arguments it doesn't set."""
+    settings = dict(defaults)
+    if isinstance(reader, dict):
+        reader = dict(reader)
+        host = reader.pop('host')
+        port = reader.pop('port', LLRP_PORT)
+        settings.update(reader)
+    else:
+        host, _, port = reader.partition(':')
+        port = port or LLRP_PORT
+    return host, int(port), settings
+
+class _Channel (Int32StringReceiver):
+    """Pickled messages between a Fleet and a worker; a message (name,
+    args...) calls msg_name(*args) on the handler."""
+    MAX_LENGTH = 1 << 26
+
+    def __init__ (self, handler):
+        self.handler = handler
+
+    def send (self, *msg):
+        self.sendString(pickle.dumps(msg, pickle.HIGHEST_PROTOCOL))
+
+    def stringReceived (self, data):
+        msg = pickle.loads(data)
+        getattr(self.handler, 'msg_' + msg[0])(*msg[1:])
+
+    def connectionLost (self, reason=protocol.connectionDone):
+        lost = getattr(self.handler, 'channelLost', None)
+        if lost is not None:
+            lost(reason)
+
+class _Worker (object):
+    """The worker end of a Fleet, which runs the readers it is sent."""
+    # seconds to wait for readers to stop politely when shutting down
+    shutdown_timeout = 5.0
+
+    def __init__ (self):
+        self.channel = _Channel(self)
+        # [(keyword arguments, LLRPClientFactory)]
+        self.factories = []
+
+    def factoryFor (self, settings):
+        """Return the factory for readers with the keyword arguments
+        settings."""
+        for s, factory in self.factories:
+            if s == settings:
+                return factory
+        factory = LLRPClientFactory(**settings)
+        factory.addTagBatchCallback(self.sendTags)
+        self.factories.append((settings, factory))
+        return factory
+
+    def sendTags (self, peername, tags):
+        self.channel.send('tags', peername, tags)
+
+    def msg_start (self, index, readers, loglevel):
+        logging.basicConfig(level=loglevel, format='%(asctime)s %(name)s '
+                '[worker {}]: %(levelname)s: %(message)s'.format(index))
+        for host, port, settings in readers:
+            reactor.connectTCP(host, port, self.factoryFor(settings),
+                               timeout=3)
+
+    def msg_states (self, qid):
+        states = {}
+        for _, factory in self.factories:
+            states.update(factory.getProtocolStates())
+        self.channel.send('states', qid, states)
+
+    def msg_shutdown (self):
+        for _, factory in self.factories:
+            factory.stopReconnecting()
+        d = defer.DeferredList([factory.politeShutdown()
+                                for _, factory in self.factories])
+        d.addBoth(lambda _: self.stop())
+        reactor.callLater(self.shutdown_timeout, self.stop)
+
+    def channelLost (self, reason):
+        # the parent has gone away
+        self.stop()
+
+    def stop (self):
+        try:
+            reactor.stop()
+        except error.ReactorNotRunning:
+            pass
+
+def run_worker ():
+    """Run a Fleet worker on stdin and stdout."""
+    worker = _Worker()
+    stdio.StandardIO(worker.channel)
+    reactor.run()
+
+class _WorkerProcess (protocol.ProcessProtocol):
+    """The Fleet end of a worker process."""
+
+    def __init__ (self, fleet, index):
+        self.fleet = fleet
+        self.index = index
+        self.pid = None
+        self.channel = _Channel(self)
+        # query ID -> Deferred waiting for the worker's answer
+        self._pending = {}
+        self._next_qid = 1
+
+    def connectionMade (self):
+        self.pid = self.transport.pid
+        self.channel.makeConnection(self.transport)
+        logger.info('fleet worker %d (pid %s) started with %d readers',
+                    self.index, self.pid, len(self.fleet.shards[self.index]))
+        self.channel.send('start', self.index, self.fleet.shards[self.index],
+                          logging.getLogger('sllurp').getEffectiveLevel())
+
+    def childDataReceived (self, fd, data):
+        self.channel.dataReceived(data)
+
+    def query (self, name):
+        """Send the name query and return a Deferred that fires with the
+        answer."""
+        qid = self._next_qid
+        self._next_qid += 1
+        d = self._pending[qid] = defer.Deferred()
+        self.channel.send(name, qid)
+        return d
+
+    def msg_tags (self, peername, tags):
+        for fn in self.fleet._tag_batch_callbacks:
+            fn(peername, tags)
+
+    def msg_states (self, qid, states):
+        d = self._pending.pop(qid, None)
+        if d is not None:
+            d.callback(states)
+
+    def shutdown (self):
+        self.channel.send('shutdown')
+
+    def processEnded (self, reason):
+        pending, self._pending = self._pending, {}
+        for d in pending.values():
+            d.errback(reason)
+        self.fleet._workerEnded(self, reason)
+
+class Fleet (object):
+    """Readers sharded across worker processes; see the module
+    docstring."""
+
+    def __init__ (self, readers, workers=None, restart_delay=1.0, **kwargs):
+        """Run readers in workers processes (by default, one per CPU, but
+        no more than there are readers).  kwargs are the LLRPClientFactory
+        keyword arguments of every reader."""
+        self.readers = [parse_reader(reader, kwargs) for reader in readers]
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        workers = max(1, min(workers, len(self.readers)))
+        # the (host, port, settings) of each worker's readers
+        self.shards = [self.readers[i::workers] for i in range(workers)]
+        self.restart_delay = restart_delay
+        self.clock = reactor
+        self.restarts = 0
+        self.stopping = False
+
+        self._tag_batch_callbacks = []
+        # a _WorkerProcess per shard, or None while it is being restarted
+        self._workers = [None] * workers
+        # shard index -> pending restart (an IDelayedCall)
+        self._restarting = {}
+        self._stopped = None
+
+    def addTagBatchCallback (self, cb):
+        """Call cb(peername, tags) with each batch of tags from any worker's
+        readers."""
+        self._tag_batch_callbacks.append(cb)
+
+    def start (self):
+        """Start a worker process for each shard."""
+        for index in range(len(self.shards)):
+            self.spawn(index)
+
+    def spawn (self, index):
+        self._restarting.pop(index, None)
+        worker = _WorkerProcess(self, index)
+        self._workers[index] = worker
+        reactor.spawnProcess(worker, sys.executable,
+                [sys.executable, '-m', 'sllurp.fleet'], env=os.environ.copy(),
+                childFDs={0: 'w', 1: 'r', 2: 2})
+
+    def _workerEnded (self, worker, reason):
+        self._workers[worker.index] = None
+        if self.stopping:
+            logger.info('fleet worker %d (pid %s) stopped', worker.index,
+                        worker.pid)
+            if not any(self._workers) and not self._stopped.called:
+                self._stopped.callback(None)
+            return
+        logger.warn('fleet worker %d (pid %s) exited (%s); restarting in '
+                    '%.1f seconds', worker.index, worker.pid,
+                    reason.getErrorMessage(), self.restart_delay)
+        self.restarts += 1
+        self._restarting[worker.index] = self.clock.callLater(
+                self.restart_delay, self.spawn, worker.index)
+
+    def getProtocolStates (self):
+        """Return a Deferred that fires with the states of every worker's
+        connected readers, as LLRPClientFactory.getProtocolStates() returns
+        them.  Workers that fail to answer are left out."""
+        d = defer.DeferredList([worker.query('states')
+                                for worker in self._workers if worker],
+                               consumeErrors=True)
+        def merge (results):
+            states = {}
+            for ok, result in results:
+                if ok:
+                    states.update(result)
+            return states
+        d.addCallback(merge)
+        return d
+
+    def stats (self):
+        """Return the number of workers, how many are running, and how many
+        times workers have been restarted."""
+        return {
+            'workers': len(self._workers),
+            'running': len([worker for worker in self._workers if worker]),
+            'restarts': self.restarts,
+        }
+
+    def politeShutdown (self):
+        """Stop inventory on all readers and stop the workers.  Return a
+        Deferred that fires once every worker has exited."""
+        if self._stopped is None:
+            self.stopping = True
+            self._stopped = defer.Deferred()
+            for call in self._restarting.values():
+                call.cancel()
+            self._restarting.clear()
+            for worker in self._workers:
+                if worker is not None:
+                    worker.shutdown()
+            if not any(self._workers):
+                self._stopped.callback(None)
+        return self._stopped
+
+if __name__ == '__main__':
+    run_worker()
@@ -8,6 +8,7 @@ from twisted.internet import reactor, defer
 import sllurp.llrp as llrp
 from sllurp.llrp_proto import Modulation_Name2Type, DEFAULT_MODULATION, \
      Modulation_DefaultTari
+from sllurp.capabilities import CapabilitiesCache
 
 numTags = 0
 logger = logging.getLogger('sllurp')
@@ -65,6 +66,17 @@ def parse_args ():
     parser.add_argument('-l', '--logfile')
     parser.add_argument('-r', '--reconnect', action='store_true',
             default=False, help='reconnect on connection failure or loss')
+    parser.add_argument('--capabilities-cache', metavar='FILE',
+            help='cache reader capabilities in FILE')
+    parser.add_argument('--pipeline', action='store_true',
+            help='on connecting, send commands without waiting for each '
+                'response')
+    parser.add_argument('--keepalive', metavar='SECONDS', type=float,
+            help='have readers send keepalives every SECONDS seconds, and '
+                'drop connections that miss 3 in a row')
+    parser.add_argument('--reuse-rospec', action='store_true',
+            help="on connecting, keep the reader's ROSpec if it is the one "
+                'we would add')
     args = parser.parse_args()
 
 def init_logging ():
@@ -107,6 +119,10 @@ def main ():
     d = defer.Deferred()
     d.addCallback(finish)
 
+    capabilities_cache = None
+    if args.capabilities_cache:
+        capabilities_cache = CapabilitiesCache(args.capabilities_cache)
+
     fac = llrp.LLRPClientFactory(onFinish=d,
             duration=args.time,
             report_every_n_tags=args.every_n,
@@ -119,6 +135,10 @@ def main ():
             start_inventory=True,
             disconnect_when_done=(args.time > 0),
             reconnect=args.reconnect,
+            pipeline_bringup=args.pipeline,
+            reuse_rospec=args.reuse_rospec,
+            keepalive_interval=args.keepalive,
+            capabilities_cache=capabilities_cache,
             tag_content_selector={
                 'EnableROSpecID': False,
                 'EnableSpecIndex': False,
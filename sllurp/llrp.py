@@ -1,6 +1,6 @@
 from __future__ import print_function
-from collections import defaultdict
-import time
+from collections import defaultdict, deque
+import random
 import socket
 import logging
 import pprint
@@ -8,10 +8,13 @@ import struct
 from llrp_proto import LLRPROSpec, LLRPError, Message_struct, \
          Message_Type2Name, Capability_Name2Type, AirProtocol, \
          llrp_data2xml, LLRPMessageDict, ModeIndex_Name2Type, \
-         Modulation_Name2Type, DEFAULT_MODULATION
+         Modulation_Name2Type, DEFAULT_MODULATION, TagReportDataDecoder, \
+         TagRead, EncodedSpec
+from llrp_errors import LLRPResponseError, LLRPFramingError
+from capabilities import ReaderCapabilities
 import copy
-from binascii import hexlify
 from util import *
+from sllurp import trace
 from twisted.internet import reactor, task, defer
 from twisted.internet.protocol import ClientFactory
 from twisted.protocols.basic import LineReceiver
@@ -21,18 +24,27 @@ LLRP_PORT = 5084
 
 logger = logging.getLogger(__name__)
 
-class LLRPMessage:
+class LLRPMessage (object):
     hdr_fmt = '!HI'
     hdr_len = struct.calcsize(hdr_fmt) # == 6 bytes
     full_hdr_fmt = hdr_fmt + 'I'
     full_hdr_len = struct.calcsize(full_hdr_fmt) # == 10 bytes
-    msgdict = None
     msgbytes = None
 
-    def __init__ (self, msgdict=None, msgbytes=None):
+    def __init__ (self, msgdict=None, msgbytes=None, tag_decoder=None,
+            lazy=False):
+        """Build a message from a message dict or from raw bytes.
+
+        With lazy=True, only the header of msgbytes is parsed up front;
+        the body is decoded the first time msgdict is accessed."""
         if not (msgdict or msgbytes):
             raise LLRPError('Provide either a message dict or a sequence' \
                     ' of bytes.')
+        self.tag_decoder = tag_decoder
+        self._msgdict = None
+        self._undecoded = False
+        self.name = None
+        self.msgid = None
         if msgdict:
             self.msgdict = LLRPMessageDict(msgdict)
             if not msgbytes:
@@ -40,14 +52,29 @@ class LLRPMessage:
         if msgbytes:
             self.msgbytes = msgbytes
             if not msgdict:
-                self.deserialize()
+                self.parseHeader()
+                if lazy:
+                    self._undecoded = True
+                else:
+                    self.deserialize()
         self.peername = None
 
+    @property
+    def msgdict (self):
+        if self._undecoded:
+            self._undecoded = False
+            self.deserialize()
+        return self._msgdict
+
+    @msgdict.setter
+    def msgdict (self, msgdict):
+        self._undecoded = False
+        self._msgdict = msgdict
+
     def serialize (self):
         if self.msgdict is None:
             raise LLRPError('No message dict to serialize.')
         name = self.msgdict.keys()[0]
-        logger.debug('serializing %s command', name)
         ver = self.msgdict[name]['Ver'] & BITMASK(3)
         msgtype = self.msgdict[name]['Type'] & BITMASK(10)
         msgid = self.msgdict[name]['ID']
@@ -61,34 +88,52 @@ class LLRPMessage:
                 (ver << 10) | msgtype,
                 len(data) + self.full_hdr_len,
                 msgid) + data
-        logger.debug('serialized bytes: %s', hexlify(self.msgbytes))
-        logger.debug('done serializing %s command', name)
-
-    def deserialize (self):
-        """Turns a sequence of bytes into a message dictionary."""
+        self.name = name
+        self.msgid = msgid
+        if trace.enabled:
+            trace.event('encode', name, id=msgid, data=self.msgbytes)
+
+    def parseHeader (self):
+        """Decode the message header (type, length, ID) without touching the
+        message body."""
         if self.msgbytes is None:
             raise LLRPError('No message bytes to deserialize.')
-        data = ''.join(self.msgbytes)
-        msgtype, length, msgid = struct.unpack(self.full_hdr_fmt,
-                data[:self.full_hdr_len])
-        ver = (msgtype >> 10) & BITMASK(3)
-        msgtype = msgtype & BITMASK(10)
+        if isinstance(self.msgbytes, memoryview):
+            self.msgbytes = self.msgbytes.tobytes()
+        elif not isinstance(self.msgbytes, str):
+            self.msgbytes = ''.join(self.msgbytes)
+        msgtype, self.msglen, self.msgid = \
+                struct.unpack_from(self.full_hdr_fmt, self.msgbytes)
+        self.ver = (msgtype >> 10) & BITMASK(3)
+        self.msgtype = msgtype & BITMASK(10)
         try:
-            name = Message_Type2Name[msgtype]
-            logger.debug('deserializing %s command', name)
-            decoder = Message_struct[name]['decode']
+            self.name = Message_Type2Name[self.msgtype]
+            self.decoder = Message_struct[self.name]['decode']
         except KeyError:
             raise LLRPError('Cannot find decoder for message type '
-                    '{}'.format(msgtype))
-        body = data[self.full_hdr_len:length]
+                    '{}'.format(self.msgtype))
+
+    def deserialize (self):
+        """Turns a sequence of bytes into a message dictionary."""
+        if self.name is None:
+            self.parseHeader()
+        name = self.name
+        if trace.enabled:
+            trace.event('decode', name, id=self.msgid, length=self.msglen)
+        # decoders work on offsets into the body, so don't copy it
+        body = buffer(self.msgbytes, self.full_hdr_len,
+                      self.msglen - self.full_hdr_len)
         try:
+            if self.tag_decoder and name == 'RO_ACCESS_REPORT':
+                decoded = self.decoder(body, tag_decoder=self.tag_decoder)
+            else:
+                decoded = self.decoder(body)
             self.msgdict = {
-               name: dict(decoder(body))
+               name: dict(decoded)
             }
-            self.msgdict[name]['Ver'] = ver
-            self.msgdict[name]['Type'] = msgtype
-            self.msgdict[name]['ID'] = msgid
-            logger.debug('done deserializing %s command', name)
+            self.msgdict[name]['Ver'] = self.ver
+            self.msgdict[name]['Type'] = self.msgtype
+            self.msgdict[name]['ID'] = self.msgid
         except LLRPError as e:
             logger.exception('Problem with %s message format', name)
             return ''
@@ -112,10 +157,15 @@ class LLRPMessage:
             return False
 
     def getName (self):
+        if self.name is not None:
+            return self.name
         if not self.msgdict:
             return None
         return self.msgdict.keys()[0]
 
+    def getID (self):
+        return self.msgid
+
     def __repr__ (self):
         try:
             ret = llrp_data2xml(self.msgdict)
@@ -124,6 +174,73 @@ class LLRPMessage:
             ret = ''
         return ret
 
+class LLRPFramer (object):
+    """Splits a stream of bytes from a reader into LLRP messages.
+
+    Incoming data is appended to a bytearray and consumed from a read offset,
+    so a chunk holding many small messages is framed without copying the rest
+    of the chunk for every message.  Consumed bytes are discarded only once
+    the buffer is empty or the read offset passes compact_threshold."""
+    compact_threshold = 65536
+
+    def __init__ (self):
+        self.buf = bytearray()
+        self.start = 0
+
+    def __len__ (self):
+        """Number of buffered bytes not yet returned as messages."""
+        return len(self.buf) - self.start
+
+    def compact (self):
+        try:
+            del self.buf[:self.start]
+        except BufferError:
+            # a message returned earlier still holds a view of the buffer
+            self.buf = self.buf[self.start:]
+        self.start = 0
+
+    def feed (self, data):
+        """Add data to the buffer and return a list of complete messages, as
+        memoryviews.  Views that outlive the next call to feed() force it to
+        copy the buffer, so copy messages (e.g., with tobytes()) to keep
+        them.  A header with an impossible length raises LLRPFramingError,
+        which carries the complete messages before it."""
+        if self.start and (self.start == len(self.buf) or
+                           self.start >= self.compact_threshold):
+            self.compact()
+        try:
+            self.buf.extend(data)
+        except BufferError:
+            self.buf = self.buf[self.start:]
+            self.start = 0
+            self.buf.extend(data)
+
+        buf = self.buf
+        end = len(buf)
+        frames = []
+        view = memoryview(buf)
+        hdr_fmt = LLRPMessage.full_hdr_fmt
+        hdr_len = LLRPMessage.full_hdr_len
+        start = self.start
+        while end - start >= hdr_len:
+            _, msg_len, _ = struct.unpack_from(hdr_fmt, buf, start)
+            if msg_len < hdr_len:
+                # there's no telling where the next message starts
+                self.start = start
+                raise LLRPFramingError('invalid message length {} at stream '
+                        'offset {}'.format(msg_len, start), frames)
+            if end - start < msg_len:
+                break
+            frames.append(view[start:start + msg_len])
+            start += msg_len
+        self.start = start
+        return frames
+
+    def reset (self):
+        """Discard all buffered data."""
+        self.buf = bytearray()
+        self.start = 0
+
 class LLRPClient (LineReceiver):
     STATE_DISCONNECTED = 1
     STATE_CONNECTING = 2
@@ -136,20 +253,38 @@ class LLRPClient (LineReceiver):
     STATE_SENT_GET_CAPABILITIES = 9
     STATE_PAUSING = 10
     STATE_PAUSED = 11
+    STATE_BRINGING_UP = 12
+
+    # STATE_* value -> name
+    state_names = dict((num, name) for name, num in locals().items()
+                       if name.startswith('STATE_'))
+
+    # getLatencies() names for the time spent waiting in these states
+    latency_names = {
+        STATE_DISCONNECTED: 'connect',
+        STATE_SENT_GET_CAPABILITIES: 'capabilities',
+        STATE_BRINGING_UP: 'bring_up',
+        STATE_SENT_ADD_ROSPEC: 'add_rospec',
+        STATE_SENT_ENABLE_ROSPEC: 'enable_rospec',
+        STATE_PAUSING: 'disable_rospec',
+        STATE_SENT_DELETE_ACCESSSPEC: 'delete_accessspec',
+        STATE_SENT_DELETE_ROSPEC: 'delete_rospec',
+    }
+
+    # how many state transitions to remember
+    transition_log_size = 64
 
     @classmethod
     def getStates (_):
-        state_names = [st for st in dir(LLRPClient) if st.startswith('STATE_')]
-        for state_name in state_names:
-            state_num = getattr(LLRPClient, state_name)
+        for state_num, state_name in sorted(LLRPClient.state_names.items(),
+                                            key=lambda st: st[1]):
             yield state_name, state_num
 
     @classmethod
     def getStateName (_, state):
         try:
-            return [st_name for st_name, st_num in LLRPClient.getStates() \
-                    if st_num == state][0]
-        except IndexError:
+            return LLRPClient.state_names[state]
+        except KeyError:
             raise LLRPError('unknown state {}'.format(state))
 
     def __init__ (self, factory, duration=None, report_every_n_tags=None,
@@ -157,7 +292,11 @@ class LLRPClient (LineReceiver):
             start_inventory=True, reset_on_connect=True,
             disconnect_when_done=True,
             tag_content_selector={},
-            session=2, tag_population=4):
+            session=2, tag_population=4, tag_record_type=None,
+            tag_batch_window=None, tag_queue=None, decode_pool=None,
+            pipeline_bringup=False, capabilities_cache=None,
+            reuse_rospec=False, keepalive_interval=None, keepalive_misses=3,
+            tag_aggregator=None):
         self.factory = factory
         self.setRawMode()
         self.state = LLRPClient.STATE_DISCONNECTED
@@ -173,10 +312,18 @@ class LLRPClient (LineReceiver):
         self.duration = duration
         self.peername = None
         self.tx_power_table = []
+        # sllurp.capabilities.CapabilitiesCache, to request only the General
+        # Device Capabilities of the readers it knows
+        self.capabilities_cache = capabilities_cache
         self.start_inventory = start_inventory
         self.reset_on_connect = reset_on_connect
         if self.reset_on_connect:
             logger.info('will reset reader state on connect')
+        # with reset_on_connect and start_inventory, keep the ROSpec the
+        # reader already has if it is the one we would add, instead of
+        # deleting and re-adding it
+        self.reuse_rospec = reuse_rospec and reset_on_connect and \
+                start_inventory
         self.disconnect_when_done = disconnect_when_done
         self.tag_content_selector = tag_content_selector
         if self.start_inventory:
@@ -184,15 +331,21 @@ class LLRPClient (LineReceiver):
 
         logger.info('using antennas: %s', self.antennas)
 
-        # for partial data transfers
-        self.expectingRemainingBytes = 0
-        self.partialData = ''
+        # reassembles messages split across (or packed into) TCP reads
+        self.framer = LLRPFramer()
 
         # state-change callbacks: STATE_* -> [list of callables]
         self._state_callbacks = {}
-        for _, st_num in LLRPClient.getStates():
+        for st_num in LLRPClient.state_names:
             self._state_callbacks[st_num] = []
 
+        # the last transition_log_size state changes, as (time, old state,
+        # new state); STATE_* -> seconds spent in that state the last time
+        # it was left, timed from connectionMade() for STATE_DISCONNECTED
+        self.transitions = deque(maxlen=self.transition_log_size)
+        self.state_durations = {}
+        self._state_entered = None
+
         # message callbacks (including tag reports):
         # msg_name -> [list of callables]
         self._message_callbacks = defaultdict(list)
@@ -200,20 +353,102 @@ class LLRPClient (LineReceiver):
         # Deferreds to fire during state machine machinations
         self._deferreds = defaultdict(list)
 
+        # every message we send gets the next ID; the reader gives its
+        # response (or ERROR_MESSAGE) the same ID, which maps to the Deferred
+        # returned by sendMessage()
+        self._next_msgid = 1
+        self._responses = {}
+
+        # with pipeline_bringup, write the independent commands of connection
+        # bring-up back-to-back instead of one per round trip; sendBatch()
+        # collects messages here to write them all at once
+        self.pipeline_bringup = pipeline_bringup
+        self._write_batch = None
+
         self.disconnecting = False
         self.rospec = None
 
+        # EncodedSpecs of the ROSpec and AccessSpec last sent to each reader,
+        # keyed by (parameter name, reader host); LLRPClientFactory shares one
+        # cache among its clients so that reconnecting doesn't re-encode
+        self.spec_cache = {}
+
+        # specialized TagReportData decoder matching the ROSpec we sent;
+        # tag_record_type (e.g., TagRead) replaces the per-tag dicts
+        self.tag_record_type = tag_record_type
+        self.tag_decoder = None
+        if tag_record_type is not None:
+            self.tag_decoder = TagReportDataDecoder({},
+                    record_type=tag_record_type)
+
+        # tag batch callbacks get every tag from a TCP read in one list, or
+        # from a window of tag_batch_window seconds if that is set
+        self._tag_batch_callbacks = []
+        self.tag_batch_window = tag_batch_window
+        self._tag_batch = []
+        self._tag_batch_call = None
+
+        # schedules timed calls: the reactor, or anything else with its
+        # callLater() (see sllurp.aio)
+        self.clock = reactor
+
+        # with keepalive_interval, have the reader send a KEEPALIVE every
+        # keepalive_interval seconds, and drop the connection when nothing
+        # arrives for keepalive_misses intervals; the watchdog is a single
+        # delayed call that reschedules itself if there has been traffic
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_misses = keepalive_misses
+        self._watchdog = None
+        self._last_traffic = None
+        # while reads are paused (pauseReading()), the silence is ours, so
+        # the watchdog waits for resumeReading()
+        self._reading_paused = False
+        self._watchdog_suspended = False
+
+        # bounded queue (a sllurp.tagqueue.TagQueue) for slow tag consumers
+        self.tag_queue = tag_queue
+
+        # windowed deduplication (a sllurp.aggregate.TagAggregator) for
+        # consumers that want one record per tag per window; it takes the
+        # place of the tag batch
+        self.tag_aggregator = tag_aggregator
+
+        # pool (see sllurp.decodepool) for decoding RO_ACCESS_REPORTs off the
+        # reactor thread; [message, ready] pairs waiting to be handled in
+        # the order they arrived
+        self.decode_pool = decode_pool
+        self._decoding = deque()
+
     def addStateCallback (self, state, cb):
         self._state_callbacks[state].append(cb)
 
     def addMessageCallback (self, msg_type, cb):
         self._message_callbacks[msg_type].append(cb)
 
+    def addTagBatchCallback (self, cb):
+        """Call cb(peername, tags) with a list of the tags from each batch of
+        RO_ACCESS_REPORTs.  Clients with a tag_aggregator hand their tags to
+        it instead; its records go to the factory's tag batch callbacks."""
+        self._tag_batch_callbacks.append(cb)
+
+    def flushTagBatch (self):
+        """Deliver any batched tags to the tag batch callbacks now."""
+        if self._tag_batch_call is not None:
+            if self._tag_batch_call.active():
+                self._tag_batch_call.cancel()
+            self._tag_batch_call = None
+        if not self._tag_batch:
+            return
+        tags, self._tag_batch = self._tag_batch, []
+        for fn in self._tag_batch_callbacks:
+            fn(self.peername, tags)
+
     def connectionMade (self):
         self.transport.setTcpKeepAlive(True)
         self.peername = self.transport.getHandle().getpeername()
         logger.info('connected to %s', self.peername)
         self.factory.protocols.add(self)
+        self._state_entered = self.clock.seconds()
 
     def setState (self, newstate, onComplete=None):
         assert newstate is not None
@@ -221,45 +456,84 @@ class LLRPClient (LineReceiver):
                     LLRPClient.getStateName(self.state),
                     LLRPClient.getStateName(newstate))
 
+        now = self.clock.seconds()
+        if self._state_entered is not None:
+            self.state_durations[self.state] = now - self._state_entered
+        self._state_entered = now
+        self.transitions.append((now, self.state, newstate))
         self.state = newstate
 
         for fn in self._state_callbacks[newstate]:
             fn(self)
 
+    def getLatencies (self):
+        """Return how long the reader last kept us waiting in each state
+        named in latency_names, by that name: e.g., 'connect' from the TCP
+        connection to the reader's connection notification, and
+        'add_rospec' the ADD_ROSPEC round trip."""
+        return dict((name, self.state_durations[state])
+                    for state, name in self.latency_names.items()
+                    if state in self.state_durations)
+
     def _setState_wrapper (self, _, *args, **kwargs):
         """Version of setState suitable for calling via a Deferred callback.
            XXX this is a gross hack."""
         self.setState(args[0], **kwargs)
 
     def connectionLost (self, reason):
+        self.stopWatchdog()
+        self.flushTagBatch()
+        if self.tag_queue is not None:
+            self.tag_queue.forget(self)
         self.factory.protocols.remove(self)
+        responses, self._responses = self._responses, {}
+        for d in responses.values():
+            self._failResponse(d, reason)
+
+    def useCapabilities (self, capdict):
+        """Apply capdict, a GET_READER_CAPABILITIES_RESPONSE, or the cached
+        capabilities of the reader it identifies.  Return False if capdict
+        holds only the General Device Capabilities of a reader that
+        capabilities_cache doesn't know, in which case the caller should
+        request all of them."""
+        if self.capabilities_cache is not None:
+            caps = self.capabilities_cache.get(
+                    capdict['GeneralDeviceCapabilities'])
+            if caps is not None:
+                logger.debug('using cached capabilities of %s', caps.identity)
+                self.applyCapabilities(caps)
+                return True
+            if 'RegulatoryCapabilities' not in capdict:
+                return False
+        self.parseCapabilities(capdict)
+        return True
 
     def parseCapabilities (self, capdict):
+        caps = ReaderCapabilities.fromResponse(capdict)
+        if self.capabilities_cache is not None:
+            self.capabilities_cache.put(caps)
+        self.applyCapabilities(caps)
+
+    def applyCapabilities (self, caps):
+        """Check the requested antennas, power and mode against caps, a
+        ReaderCapabilities, and choose the reader mode."""
         def find_p (p, arr):
             m = p(arr)
             for idx, val in enumerate(arr):
                 if val == m: return idx
 
         # check requested antenna set
-        gdc = capdict['GeneralDeviceCapabilities']
-        if max(self.antennas) > gdc['MaxNumberOfAntennaSupported']:
+        if max(self.antennas) > caps.max_antennas:
             reqd = ','.join(map(str, self.antennas))
-            avail = ','.join(map(str,
-                             range(1, gdc['MaxNumberOfAntennaSupported']+1)))
+            avail = ','.join(map(str, range(1, caps.max_antennas + 1)))
             logger.warn('Invalid antenna set specified: requested=%s,'
                         ' available=%s; ignoring invalid antennas', reqd, avail)
             self.antennas = [ant for ant in self.antennas \
-                            if ant <= gdc['MaxNumberOfAntennaSupported']]
+                            if ant <= caps.max_antennas]
 
         # check requested Tx power
         logger.debug('requested tx_power: %s', self.tx_power)
-        bandtbl = capdict['RegulatoryCapabilities']['UHFBandCapabilities']
-        bandtbl = {k: v for k, v in bandtbl.items() \
-            if k.startswith('TransmitPowerLevelTableEntry')}
-        self.tx_power_table = [0,] * (len(bandtbl) + 1)
-        for k, v in bandtbl.items():
-            idx = v['Index']
-            self.tx_power_table[idx] = int(v['TransmitPowerValue']) / 100.0
+        self.tx_power_table = list(caps.tx_power_table)
         logger.debug('tx_power_table: %s', self.tx_power_table)
         if self.tx_power == 0:
             # tx_power = 0 means max power
@@ -272,22 +546,15 @@ class LLRPClient (LineReceiver):
         logger.debug('set tx_power: %s (%s dBm)', self.tx_power,
                     self.tx_power_table[self.tx_power])
 
-        # fill UHFC1G2RFModeTable & check requested modulation & Tari
-        match = False # have we matched the user's requested values yet?
-        regcap = capdict['RegulatoryCapabilities']
+        # check requested modulation & Tari
         logger.info('requested modulation: %s', self.modulation)
-        for v in regcap['UHFBandCapabilities']['UHFRFModeTable'].values():
-            match = v['Mod'] == Modulation_Name2Type[self.modulation]
-            if self.tari:
-                match = match and (v['MaxTari'] == self.tari)
-            if match:
-                self.reader_mode = dict(v)
-        if not self.reader_mode:
+        mode = caps.findMode(Modulation_Name2Type[self.modulation], self.tari)
+        if mode is None:
             taristr = ' and Tari={}'.format(self.tari) if self.tari else ''
             logger.warn('Could not find reader mode matching '\
                     'modulation=%s%s', self.modulation, taristr)
-            self.reader_mode = dict(regcap['UHFBandCapabilities']\
-                    ['UHFRFModeTable']['UHFC1G2RFModeTableEntry0'])
+            mode = caps.modes[0]
+        self.reader_mode = dict(mode)
         logger.info('using reader mode: %s', self.reader_mode)
 
     def processDeferreds (self, msgName, isSuccess):
@@ -303,6 +570,30 @@ class LLRPClient (LineReceiver):
                 d.errback(self.state)
         del self._deferreds[msgName]
 
+    def processResponse (self, lmsg):
+        """Fire the Deferred of the request that lmsg responds to."""
+        d = self._responses.pop(lmsg.getID(), None)
+        if d is None:
+            logger.warn('%s with ID %s matches no request', lmsg.getName(),
+                    lmsg.getID())
+            return
+        if lmsg.isSuccess():
+            d.callback(lmsg)
+        else:
+            # a message that failed to decode has no msgdict
+            status = (lmsg.msgdict or {}).get(lmsg.getName(), {})\
+                    .get('LLRPStatus', {})
+            self._failResponse(d, LLRPResponseError('{} failed with status '
+                    '{}: {}'.format(lmsg.getName(), status.get('StatusCode'),
+                                    status.get('ErrorDescription'))))
+
+    def _failResponse (self, d, reason):
+        d.errback(reason)
+        # nobody has to wait for a response, so a failure nobody handled is
+        # not an error (the name-based Deferreds report it anyway)
+        d.addErrback(lambda f: logger.debug('unhandled response failure: %s',
+                                            f.getErrorMessage()))
+
     def handleMessage (self, lmsg):
         """Implements the LLRP client state machine."""
         logger.debug('LLRPMessage received in state %s: %s', self.state, lmsg)
@@ -313,11 +604,33 @@ class LLRPClient (LineReceiver):
         logger.debug('starting message callbacks for %s', msgName)
         for fn in self._message_callbacks[msgName]:
             fn(lmsg)
+        if msgName == 'RO_ACCESS_REPORT' and (self._tag_batch_callbacks or
+                                              self.tag_queue is not None or
+                                              self.tag_aggregator is not None):
+            tags = lmsg.msgdict[msgName]['TagReportData']
+            # the aggregator's records, not the raw tags, go to the tag
+            # batch callbacks (see LLRPClientFactory)
+            if self.tag_aggregator is not None:
+                self.tag_aggregator.put(self, tags)
+            elif self._tag_batch_callbacks:
+                self._tag_batch.extend(tags)
+            if self.tag_queue is not None:
+                self.tag_queue.put(self, tags)
         logger.debug('done with message callbacks for %s', msgName)
 
+        # responses go to the requests with matching IDs whether or not the
+        # state machine below expects them
+        if msgName.endswith('_RESPONSE') or msgName == 'ErrorMessage':
+            bringing_up = self.state == LLRPClient.STATE_BRINGING_UP
+            self.processResponse(lmsg)
+            # bringUpPipelined() has handled it, and may have changed state;
+            # the state machine doesn't track reader configuration
+            if bringing_up or msgName == 'SET_READER_CONFIG_RESPONSE':
+                return
+
         # keepalives can occur at any time
         if msgName == 'KEEPALIVE':
-            self.send_KEEPALIVE_ACK()
+            self.send_KEEPALIVE_ACK(lmsg.getID())
             return
 
         if msgName == 'RO_ACCESS_REPORT' and \
@@ -328,284 +641,640 @@ class LLRPClient (LineReceiver):
         logger.debug('in handleMessage(%s), there are %d Deferreds',
                 msgName, len(self._deferreds[msgName]))
 
-        #######
-        # LLRP client state machine follows.  Beware: gets thorny.  Note the
-        # order of the LLRPClient.STATE_* fields.
-        #######
-
-        # in DISCONNECTED, CONNECTING, and CONNECTED states, expect only
-        # READER_EVENT_NOTIFICATION messages.
-        if self.state in (LLRPClient.STATE_DISCONNECTED,
-                LLRPClient.STATE_CONNECTING, LLRPClient.STATE_CONNECTED):
-            if msgName != 'READER_EVENT_NOTIFICATION':
-                logger.error('unexpected message %s while connecting', msgName)
-                return
-
-            if not lmsg.isSuccess():
-                try:
-                    status = lmsg.msgdict[msgName]\
-                             ['ReaderEventNotificationData']\
-                             ['ConnectionAttemptEvent']['Status']
-                except KeyError:
-                    status = '(unknown status)'
-                logger.fatal('Could not start session on reader: %s', status)
-                return
-
-            self.processDeferreds(msgName, lmsg.isSuccess())
-
-            # a Deferred to call when we get GET_READER_CAPABILITIES_RESPONSE
-            d = defer.Deferred()
-            d.addCallback(self._setState_wrapper, LLRPClient.STATE_CONNECTED)
-            d.addErrback(self.panic, 'GET_READER_CAPABILITIES failed')
-            self.send_GET_READER_CAPABILITIES(onCompletion=d)
-
-        # in state SENT_GET_CAPABILITIES, expect only GET_CAPABILITIES_RESPONSE;
-        # respond to this message by advancing to state CONNECTED.
-        elif self.state == LLRPClient.STATE_SENT_GET_CAPABILITIES:
-            if msgName != 'GET_READER_CAPABILITIES_RESPONSE':
-                logger.error('unexpected response %s when getting capabilities',
-                        msgName)
-                return
-
-            if not lmsg.isSuccess():
-                status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
-                err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
-                logger.fatal('Error %s getting capabilities: %s', status, err)
-                return
-
-            self.capabilities = lmsg.msgdict['GET_READER_CAPABILITIES_RESPONSE']
-            logger.debug('Capabilities: %s', pprint.pformat(self.capabilities))
+        # the handler for msgName in this state, or else this state's
+        # complaint about an unexpected message and the handler, if any, to
+        # carry on with regardless
+        handler = self._transitions.get((self.state, msgName))
+        if handler is None:
             try:
-                self.parseCapabilities(self.capabilities)
-            except LLRPError as err:
-                logger.exception('Capabilities mismatch')
-                raise err
+                complaint, handler = self._unexpected[self.state]
+            except KeyError:
+                logger.warn('message %s received in unknown state!', msgName)
+            else:
+                if complaint is not None:
+                    logger.error(complaint, msgName)
+                if handler is None:
+                    return
+        # a handler returns False when it gives up on the message
+        if handler is not None and handler(self, lmsg, msgName) is False:
+            return
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+        if self._deferreds.get(msgName):
+            logger.error('there should NOT be Deferreds left for %s,' \
+                    ' but there are!', msgName)
 
-            if self.reset_on_connect:
-                d = self.stopPolitely(disconnect=False)
-                if self.start_inventory:
-                    d.addCallback(self.startInventory)
-            elif self.start_inventory:
-                self.startInventory()
-
-        # in state SENT_ADD_ROSPEC, expect only ADD_ROSPEC_RESPONSE; respond to
-        # favorable ADD_ROSPEC_RESPONSE by enabling the added ROSpec and
-        # advancing to state SENT_ENABLE_ROSPEC.
-        elif self.state == LLRPClient.STATE_SENT_ADD_ROSPEC:
-            if msgName != 'ADD_ROSPEC_RESPONSE':
-                logger.error('unexpected response %s when adding ROSpec', msgName)
-                return
+    def _logFailure (self, lmsg, msgName, log, fmt):
+        status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
+        err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
+        log(fmt, status, err)
 
-            if not lmsg.isSuccess():
-                status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
-                err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
-                logger.fatal('Error %s adding ROSpec: %s', status, err)
-                return
+    # in DISCONNECTED, CONNECTING, and CONNECTED states, expect only
+    # READER_EVENT_NOTIFICATION messages, and bring up the connection.
+    def _readerConnected (self, lmsg, msgName):
+        if not lmsg.isSuccess():
+            try:
+                status = lmsg.msgdict[msgName]\
+                         ['ReaderEventNotificationData']\
+                         ['ConnectionAttemptEvent']['Status']
+            except KeyError:
+                status = '(unknown status)'
+            logger.fatal('Could not start session on reader: %s', status)
+            return False
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+        self.processDeferreds(msgName, True)
 
-        # in state PAUSING, we have sent a DISABLE_ROSPEC, so expect only
-        # DISABLE_ROSPEC_RESPONSE.  advance to state PAUSED.
-        elif self.state == LLRPClient.STATE_PAUSING:
-            if msgName != 'DISABLE_ROSPEC_RESPONSE':
-                logger.error('unexpected response %s ' \
-                        ' when disabling ROSpec', msgName)
-
-            if not lmsg.isSuccess():
-                status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
-                err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
-                logger.error('DISABLE_ROSPEC failed with status %s: %s',
-                        status, err)
-                logger.fatal('Error %s disabling ROSpec: %s', status, err)
-                return
+        if self.pipeline_bringup:
+            self.bringUpPipelined()
+        else:
+            self.bringUpSerially()
+
+    # in state SENT_GET_CAPABILITIES, expect only GET_CAPABILITIES_RESPONSE;
+    # respond to this message by advancing to state CONNECTED.
+    def _capabilitiesReceived (self, lmsg, msgName):
+        if not lmsg.isSuccess():
+            self._logFailure(lmsg, msgName, logger.fatal,
+                             'Error %s getting capabilities: %s')
+            return False
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+        self.capabilities = lmsg.msgdict['GET_READER_CAPABILITIES_RESPONSE']
+        logger.debug('Capabilities: %s', pprint.pformat(self.capabilities))
+        try:
+            if not self.useCapabilities(self.capabilities):
+                # the Deferreds stay registered for the full response
+                self.send_GET_READER_CAPABILITIES(None, 'All')
+                return False
+        except LLRPError as err:
+            logger.exception('Capabilities mismatch')
+            raise err
+
+        self.processDeferreds(msgName, True)
+
+        if self.reuse_rospec:
+            self.setState(LLRPClient.STATE_BRINGING_UP)
+            d = self.sendMessage(self.rospecsRequest())
+            d.addCallback(self._rospecsResponded)
+            d.addErrback(self._rospecsFailed)
+        elif self.reset_on_connect:
+            d = self.stopPolitely(disconnect=False)
+            if self.start_inventory:
+                d.addCallback(self.startInventory)
+        elif self.start_inventory:
+            self.startInventory()
 
-        # in state SENT_ENABLE_ROSPEC, expect only ENABLE_ROSPEC_RESPONSE;
-        # respond to favorable ENABLE_ROSPEC_RESPONSE by starting the enabled
-        # ROSpec and advancing to state INVENTORYING.
-        elif self.state == LLRPClient.STATE_SENT_ENABLE_ROSPEC:
-            if msgName != 'ENABLE_ROSPEC_RESPONSE':
-                logger.error('unexpected response %s when enabling ROSpec', msgName)
-
-            if not lmsg.isSuccess():
-                status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
-                err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
-                logger.error('ENABLE_ROSPEC failed with status %s: %s',
-                        status, err)
-                logger.fatal('Error %s enabling ROSpec: %s', status, err)
-                return
+    # in state SENT_ADD_ROSPEC, expect only ADD_ROSPEC_RESPONSE; respond to
+    # favorable ADD_ROSPEC_RESPONSE by enabling the added ROSpec and
+    # advancing to state SENT_ENABLE_ROSPEC.
+    def _rospecAdded (self, lmsg, msgName):
+        if not lmsg.isSuccess():
+            self._logFailure(lmsg, msgName, logger.fatal,
+                             'Error %s adding ROSpec: %s')
+            return False
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+        self.processDeferreds(msgName, True)
 
-        elif self.state == LLRPClient.STATE_INVENTORYING:
-            if msgName not in ('RO_ACCESS_REPORT', 'READER_EVENT_NOTIFICATION',
-                    'ADD_ACCESSSPEC_RESPONSE', 'ENABLE_ACCESSSPEC_RESPONSE'):
-                logger.error('unexpected message %s while inventorying',
-                        msgName)
-                return
+    # in state PAUSING, we have sent a DISABLE_ROSPEC, so expect only
+    # DISABLE_ROSPEC_RESPONSE.  advance to state PAUSED.
+    def _rospecDisabled (self, lmsg, msgName):
+        if not lmsg.isSuccess():
+            self._logFailure(lmsg, msgName, logger.error,
+                             'DISABLE_ROSPEC failed with status %s: %s')
+            self._logFailure(lmsg, msgName, logger.fatal,
+                             'Error %s disabling ROSpec: %s')
+            return False
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+        self.processDeferreds(msgName, True)
+
+    # in state SENT_ENABLE_ROSPEC, expect only ENABLE_ROSPEC_RESPONSE;
+    # respond to favorable ENABLE_ROSPEC_RESPONSE by starting the enabled
+    # ROSpec and advancing to state INVENTORYING.
+    def _rospecEnabled (self, lmsg, msgName):
+        if not lmsg.isSuccess():
+            self._logFailure(lmsg, msgName, logger.error,
+                             'ENABLE_ROSPEC failed with status %s: %s')
+            self._logFailure(lmsg, msgName, logger.fatal,
+                             'Error %s enabling ROSpec: %s')
+            return False
 
-        elif self.state == LLRPClient.STATE_SENT_DELETE_ACCESSSPEC:
-            if msgName != 'DELETE_ACCESSSPEC_RESPONSE':
-                logger.error('unexpected response %s when deleting AccessSpec',
-                        msgName)
+        self.processDeferreds(msgName, True)
 
+    def _inventoryMessage (self, lmsg, msgName):
+        # isSuccess() decodes the message, so leave reports that nothing
+        # waits for undecoded
+        if self._deferreds.get(msgName):
             self.processDeferreds(msgName, lmsg.isSuccess())
 
-        elif self.state == LLRPClient.STATE_SENT_DELETE_ROSPEC:
-            if msgName != 'DELETE_ROSPEC_RESPONSE':
-                logger.error('unexpected response %s when deleting ROSpec',
-                        msgName)
-
-            if lmsg.isSuccess():
-                logger.info('reader finished inventory')
-                if self.disconnecting:
-                    self.setState(LLRPClient.STATE_DISCONNECTED)
-                else:
-                    self.setState(LLRPClient.STATE_CONNECTED)
-
-            else:
-                status = lmsg.msgdict[msgName]['LLRPStatus']['StatusCode']
-                err = lmsg.msgdict[msgName]['LLRPStatus']['ErrorDescription']
-                logger.error('DELETE_ROSPEC failed with status %s: %s',
-                        status, err)
+    def _accessSpecsDeleted (self, lmsg, msgName):
+        self.processDeferreds(msgName, lmsg.isSuccess())
 
-            self.processDeferreds(msgName, lmsg.isSuccess())
+    def _rospecsDeleted (self, lmsg, msgName):
+        success = lmsg.isSuccess()
+        if success:
+            logger.info('reader finished inventory')
             if self.disconnecting:
-                logger.info('disconnecting')
-                self.transport.loseConnection()
-
+                self.setState(LLRPClient.STATE_DISCONNECTED)
+            else:
+                self.setState(LLRPClient.STATE_CONNECTED)
         else:
-            logger.warn('message %s received in unknown state!', msgName)
-
-        if self._deferreds[msgName]:
-            logger.error('there should NOT be Deferreds left for %s,' \
-                    ' but there are!', msgName)
-
+            self._logFailure(lmsg, msgName, logger.error,
+                             'DELETE_ROSPEC failed with status %s: %s')
+
+        self.processDeferreds(msgName, success)
+        if self.disconnecting:
+            logger.info('disconnecting')
+            self.transport.loseConnection()
+
+    # in state BRINGING_UP, bringUpPipelined() or the ROSpec reuse check
+    # handles the responses by their message IDs; ignore anything else
+    def _ignoreMessage (self, lmsg, msgName):
+        pass
+
+    # the state machine: (state, message name) -> handler
+    _transitions = {
+        (STATE_DISCONNECTED, 'READER_EVENT_NOTIFICATION'): _readerConnected,
+        (STATE_CONNECTING, 'READER_EVENT_NOTIFICATION'): _readerConnected,
+        (STATE_CONNECTED, 'READER_EVENT_NOTIFICATION'): _readerConnected,
+        (STATE_SENT_GET_CAPABILITIES, 'GET_READER_CAPABILITIES_RESPONSE'):
+            _capabilitiesReceived,
+        (STATE_SENT_ADD_ROSPEC, 'ADD_ROSPEC_RESPONSE'): _rospecAdded,
+        (STATE_PAUSING, 'DISABLE_ROSPEC_RESPONSE'): _rospecDisabled,
+        (STATE_SENT_ENABLE_ROSPEC, 'ENABLE_ROSPEC_RESPONSE'): _rospecEnabled,
+        (STATE_INVENTORYING, 'RO_ACCESS_REPORT'): _inventoryMessage,
+        (STATE_INVENTORYING, 'READER_EVENT_NOTIFICATION'): _inventoryMessage,
+        (STATE_INVENTORYING, 'ADD_ACCESSSPEC_RESPONSE'): _inventoryMessage,
+        (STATE_INVENTORYING, 'ENABLE_ACCESSSPEC_RESPONSE'):
+            _inventoryMessage,
+        (STATE_SENT_DELETE_ACCESSSPEC, 'DELETE_ACCESSSPEC_RESPONSE'):
+            _accessSpecsDeleted,
+        (STATE_SENT_DELETE_ROSPEC, 'DELETE_ROSPEC_RESPONSE'): _rospecsDeleted,
+    }
+
+    # state -> (complaint about any other message, handler to carry on with
+    # or None to drop the message); states missing here are unknown
+    _unexpected = {
+        STATE_DISCONNECTED: ('unexpected message %s while connecting', None),
+        STATE_CONNECTING: ('unexpected message %s while connecting', None),
+        STATE_CONNECTED: ('unexpected message %s while connecting', None),
+        STATE_SENT_GET_CAPABILITIES:
+            ('unexpected response %s when getting capabilities', None),
+        STATE_SENT_ADD_ROSPEC:
+            ('unexpected response %s when adding ROSpec', None),
+        STATE_PAUSING:
+            ('unexpected response %s when disabling ROSpec', _rospecDisabled),
+        STATE_SENT_ENABLE_ROSPEC:
+            ('unexpected response %s when enabling ROSpec', _rospecEnabled),
+        STATE_INVENTORYING:
+            ('unexpected message %s while inventorying', None),
+        STATE_SENT_DELETE_ACCESSSPEC:
+            ('unexpected response %s when deleting AccessSpec',
+             _accessSpecsDeleted),
+        STATE_SENT_DELETE_ROSPEC:
+            ('unexpected response %s when deleting ROSpec', _rospecsDeleted),
+        STATE_BRINGING_UP: (None, _ignoreMessage),
+    }
 
     def rawDataReceived (self, data):
-        logger.debug('got %d bytes from reader: %s', len(data),
-                data.encode('hex'))
-
-        if self.expectingRemainingBytes:
-            if len(data) >= self.expectingRemainingBytes:
-                data = self.partialData + data
-                self.partialData = ''
-                self.expectingRemainingBytes -= len(data)
-            else:
-                # still not enough; wait until next time
-                self.partialData += data
-                self.expectingRemainingBytes -= len(data)
-                return
+        if trace.enabled:
+            trace.event('recv', self.peername, data=data)
+        if self._watchdog is not None:
+            self._last_traffic = self.clock.seconds()
 
-        while data:
-            # parse the message header to grab its length
-            if len(data) >= LLRPMessage.full_hdr_len:
-                msg_type, msg_len, message_id = \
-                    struct.unpack(LLRPMessage.full_hdr_fmt,
-                                  data[:LLRPMessage.full_hdr_len])
+        try:
+            frames = self.framer.feed(data)
+        except LLRPFramingError as err:
+            # handle the messages before the bad header, but nothing after
+            # it can be trusted
+            logger.exception('Lost LLRP message framing; discarding %d '
+                    'buffered bytes', len(self.framer))
+            self.framer.reset()
+            frames = err.frames
+
+        for frame in frames:
+            try:
+                lmsg = LLRPMessage(msgbytes=frame,
+                                   tag_decoder=self.tag_decoder, lazy=True)
+            except LLRPError:
+                logger.exception('Failed to decode LLRPMessage; skipping it')
+                continue
+            if self.decode_pool is None:
+                self.handleMessage(lmsg)
             else:
-                logger.warning('Too few bytes (%d) to unpack LLRP message header',
-                        len(data))
-                self.partialData = data
-                self.expectingRemainingBytes = \
-                    LLRPMessage.full_hdr_len - len(data)
-                break
+                self.decodeInPool(lmsg)
+
+        self._tagBatchReady()
+
+    def _tagBatchReady (self):
+        if self._tag_batch:
+            if self.tag_batch_window is None:
+                self.flushTagBatch()
+            elif self._tag_batch_call is None:
+                self._tag_batch_call = self.clock.callLater(
+                        self.tag_batch_window, self.flushTagBatch)
+
+    def decodeInPool (self, lmsg):
+        """Decode an RO_ACCESS_REPORT in self.decode_pool, or any other
+        message inline, and handle it after the messages received before it.
+        KEEPALIVEs are handled immediately."""
+        if lmsg.getName() == 'KEEPALIVE':
+            self.handleMessage(lmsg)
+            return
+        if lmsg.getName() != 'RO_ACCESS_REPORT':
+            if self._decoding:
+                self._decoding.append([lmsg, True])
+            else:
+                self.handleMessage(lmsg)
+            return
+        slot = [lmsg, False]
+        self._decoding.append(slot)
+        d = self.decode_pool.decode(lmsg.msgbytes, self.tag_decoder)
+        d.addCallbacks(self._decoded, self._decodeFailed,
+                       callbackArgs=(slot,), errbackArgs=(slot,))
+
+    def _decoded (self, msgdict, slot):
+        if msgdict is None:
+            # the decoder logged the problem and gave up on the message
+            logger.error('Failed to decode %s; skipping it',
+                         slot[0].getName())
+            slot[0] = None
+        else:
+            slot[0].msgdict = msgdict
+        slot[1] = True
+        self._handleDecoded()
+
+    def _decodeFailed (self, failure, slot):
+        logger.error('Failed to decode %s: %s', slot[0].getName(),
+                     failure.getErrorMessage())
+        slot[0] = None
+        slot[1] = True
+        self._handleDecoded()
+
+    def _handleDecoded (self):
+        while self._decoding and self._decoding[0][1]:
+            lmsg, _ = self._decoding.popleft()
+            if lmsg is not None:
+                self.handleMessage(lmsg)
+        self._tagBatchReady()
+
+    def bringUpSerially (self):
+        """Get the reader's capabilities, and leave the rest of bring-up to
+        the state machine, which sends each command when the response to the
+        previous one arrives."""
+        # a Deferred to call when we get GET_READER_CAPABILITIES_RESPONSE
+        d = defer.Deferred()
+        d.addCallback(self._setState_wrapper, LLRPClient.STATE_CONNECTED)
+        d.addErrback(self.panic, 'GET_READER_CAPABILITIES failed')
+        if self.keepalive_interval:
+            self.configureKeepalive(self.sendMessage(
+                    self.readerConfigRequest()))
+        self.send_GET_READER_CAPABILITIES(onCompletion=d)
+
+    def bringUpPipelined (self):
+        """Bring up the connection in as few round trips as possible.
+
+        GET_READER_CAPABILITIES goes in one write with the DELETE_ACCESSSPEC
+        and DELETE_ROSPEC of reset_on_connect, and ADD_ROSPEC goes in one
+        write with ENABLE_ROSPEC; the reader executes each write's commands
+        in order.  With reset_on_connect, if spec_cache already holds the
+        ROSpec last added to this reader (e.g., when reconnecting), all five
+        commands go in the first write.  With reuse_rospec, GET_ROSPECS
+        replaces the DELETEs, and the rest depends on its response.  If any
+        command fails, bring-up starts over with bringUpSerially()."""
+        self.setState(LLRPClient.STATE_BRINGING_UP)
+        msgs = [self.capabilitiesRequest()]
+        if self.reuse_rospec:
+            msgs.append(self.rospecsRequest())
+        elif self.reset_on_connect:
+            msgs.extend(self.resetMessages())
+        rospec = self.cachedSpec('ROSpec')
+        if self.start_inventory and self.reset_on_connect and \
+                not self.reuse_rospec and rospec is not None:
+            self.rospec = {'ROSpec': copy.deepcopy(rospec.par)}
+            self.updateTagDecoder()
+            msgs.extend(self.startInventoryMessages(rospec))
+        else:
+            rospec = None
+        if self.keepalive_interval:
+            msgs.insert(0, self.readerConfigRequest())
+        responses = self.sendBatch(msgs)
+        if self.keepalive_interval:
+            self.configureKeepalive(responses.pop(0))
+        d = defer.DeferredList(responses, consumeErrors=True)
+        d.addCallback(self._bringUpResponded, rospec is not None)
+
+    def _bringUpResponded (self, results, started):
+        if self._bringUpFailed(results):
+            return
+        self.capabilities = results[0][1].msgdict\
+                ['GET_READER_CAPABILITIES_RESPONSE']
+        logger.debug('Capabilities: %s', pprint.pformat(self.capabilities))
+        try:
+            if not self.useCapabilities(self.capabilities):
+                # keep the responses to the rest of the batch
+                d = self.sendMessage(self.capabilitiesRequest('All'))
+                d.addCallbacks(lambda lmsg: [(True, lmsg)] + results[1:],
+                               lambda failure: [(False, failure)])
+                d.addCallback(self._bringUpResponded, started)
+                return
+        except LLRPError:
+            logger.exception('Capabilities mismatch')
+            return
+        self.setState(LLRPClient.STATE_CONNECTED)
+
+        if started:
+            self._inventoryStarted()
+        elif self.reuse_rospec:
+            self.setState(LLRPClient.STATE_BRINGING_UP)
+            self._rospecsResponded(results[1][1])
+        elif self.start_inventory:
+            rospec = self.getEncodedSpec('ROSpec', self.getROSpec()['ROSpec'])
+            self.setState(LLRPClient.STATE_BRINGING_UP)
+            d = defer.DeferredList(
+                    self.sendBatch(self.startInventoryMessages(rospec)),
+                    consumeErrors=True)
+            d.addCallback(self._inventoryResponded)
+
+    def _inventoryResponded (self, results):
+        if not self._bringUpFailed(results):
+            self._inventoryStarted()
+
+    def _bringUpFailed (self, results):
+        for ok, result in results:
+            if not ok:
+                logger.warn('pipelined bring-up failed (%s); retrying one '
+                        'command at a time', result.getErrorMessage())
+                self.bringUpSerially()
+                return True
+        return False
+
+    def _rospecsResponded (self, lmsg):
+        state = self.matchingROSpecState(lmsg)
+        if state is None:
+            self.resetAndStartInventory()
+            return
+        rospec = self.getROSpec()['ROSpec']
+        logger.info('reusing the reader\'s %s ROSpec %d', state,
+                    rospec['ROSpecID'])
+        if state == 'Active':
+            self._inventoryStarted()
+            return
+        if state == 'Disabled':
+            msg = {'ENABLE_ROSPEC': {
+                'Ver':  1,
+                'Type': 24,
+                'ROSpecID': rospec['ROSpecID']}}
+        else:
+            msg = {'START_ROSPEC': {
+                'Ver':  1,
+                'Type': 22,
+                'ROSpecID': rospec['ROSpecID']}}
+        d = self.sendMessage(msg)
+        d.addCallbacks(self._reuseResponded, self._reuseFailed)
+
+    def _rospecsFailed (self, failure):
+        logger.warn('could not compare ROSpecs (%s); resetting the reader',
+                    failure.getErrorMessage())
+        self.resetAndStartInventory()
+
+    def _reuseResponded (self, lmsg):
+        self._inventoryStarted()
+
+    def _reuseFailed (self, failure):
+        logger.warn('could not reuse ROSpec (%s); resetting the reader',
+                    failure.getErrorMessage())
+        self.resetAndStartInventory()
+
+    def matchingROSpecState (self, lmsg):
+        """Return the CurrentState of the reader's ROSpec if lmsg, its
+        GET_ROSPECS_RESPONSE, lists only the ROSpec getROSpec() would add;
+        otherwise return None."""
+        rospecs = lmsg.msgdict['GET_ROSPECS_RESPONSE']['ROSpec']
+        if len(rospecs) != 1:
+            logger.info('reader has %d ROSpecs', len(rospecs))
+            return None
+        # compare against our ROSpec as decoded from its encoding, which
+        # normalizes it (e.g., AntennaIDs given as a string)
+        rospec = self.getEncodedSpec('ROSpec', self.getROSpec()['ROSpec'])
+        ours = Message_struct['ROSpec']['decode'](str(rospec))[0]
+        theirs = dict(rospecs[0])
+        state = theirs.pop('CurrentState')
+        del ours['CurrentState']
+        if theirs != ours:
+            logger.info('reader\'s ROSpec differs from ours')
+            logger.debug('reader\'s ROSpec: %s', theirs)
+            return None
+        return state
+
+    def resetAndStartInventory (self):
+        """Delete every AccessSpec and ROSpec on the reader, then add and
+        enable the one getROSpec() returns."""
+        if not self.pipeline_bringup:
+            d = self.stopPolitely(disconnect=False)
+            d.addCallback(self.startInventory)
+            return
+        rospec = self.getEncodedSpec('ROSpec', self.getROSpec()['ROSpec'])
+        self.setState(LLRPClient.STATE_BRINGING_UP)
+        d = defer.DeferredList(self.sendBatch(self.resetMessages() +
+                self.startInventoryMessages(rospec)), consumeErrors=True)
+        d.addCallback(self._inventoryResponded)
 
-            logger.debug('expect %d bytes (have %d)', msg_len, len(data))
+    def _inventoryStarted (self):
+        if self.duration:
+            task.deferLater(self.clock, self.duration, self.stopPolitely,
+                           True)
+        self.setState(LLRPClient.STATE_INVENTORYING)
+
+    def resetMessages (self):
+        """Return the DELETE_ACCESSSPEC and DELETE_ROSPEC messages that delete
+        every AccessSpec and ROSpec on the reader."""
+        return [
+            {'DELETE_ACCESSSPEC': {
+                'Ver':  1,
+                'Type': 41,
+                'AccessSpecID': 0}},
+            {'DELETE_ROSPEC': {
+                'Ver':  1,
+                'Type': 21,
+                'ROSpecID': 0}}]
 
-            if len(data) < msg_len:
-                # got too few bytes
-                self.partialData = data
-                self.expectingRemainingBytes = msg_len - len(data)
-                break
-            else:
-                # got at least the right number of bytes
-                self.expectingRemainingBytes = 0
-                try:
-                    lmsg = LLRPMessage(msgbytes=data[:msg_len])
-                    self.handleMessage(lmsg)
-                    data = data[msg_len:]
-                except LLRPError as err:
-                    logger.exception('Failed to decode LLRPMessage; ' \
-                            'will not decode %d remaining bytes', len(data))
-                    break
+    def startInventoryMessages (self, rospec):
+        """Return the ADD_ROSPEC and ENABLE_ROSPEC messages for rospec."""
+        return [
+            {'ADD_ROSPEC': {
+                'Ver':  1,
+                'Type': 20,
+                'ROSpecID': rospec['ROSpecID'],
+                'ROSpec': rospec}},
+            {'ENABLE_ROSPEC': {
+                'Ver':  1,
+                'Type': 24,
+                'ROSpecID': rospec['ROSpecID']}}]
+
+    def readerConfigRequest (self):
+        """Return a SET_READER_CONFIG message that has the reader send a
+        KEEPALIVE every keepalive_interval seconds."""
+        return {'SET_READER_CONFIG': {
+                    'Ver':  1,
+                    'Type': 3,
+                    'ResetToFactoryDefault': False,
+                    'KeepaliveSpec': {
+                        'KeepaliveTriggerType': 'Periodic',
+                        'PeriodicTriggerValue':
+                            int(self.keepalive_interval * 1000)}}}
+
+    def configureKeepalive (self, response):
+        """Start the watchdog once response, the Deferred response to
+        readerConfigRequest(), fires."""
+        def failed (failure):
+            logger.warn('could not configure keepalives on %s (%s); not '
+                        'watching the connection', self.peername,
+                        failure.getErrorMessage())
+        response.addCallbacks(lambda _: self.startWatchdog(), failed)
+
+    def startWatchdog (self):
+        """Drop the connection if nothing arrives from the reader for
+        keepalive_misses keepalive intervals."""
+        self.stopWatchdog()
+        if self._reading_paused:
+            self._watchdog_suspended = True
+            return
+        self._last_traffic = self.clock.seconds()
+        self._watchdog = self.clock.callLater(
+                self.keepalive_interval * self.keepalive_misses,
+                self._checkWatchdog)
+
+    def stopWatchdog (self):
+        if self._watchdog is not None and self._watchdog.active():
+            self._watchdog.cancel()
+        self._watchdog = None
+        self._watchdog_suspended = False
+
+    def pauseReading (self):
+        """Stop reading from the reader, e.g., until slow tag consumers catch
+        up, and suspend the watchdog meanwhile."""
+        if self._reading_paused:
+            return
+        watching = self._watchdog is not None
+        self.stopWatchdog()
+        self._reading_paused = True
+        self._watchdog_suspended = watching
+        self.transport.pauseProducing()
+
+    def resumeReading (self):
+        """Read from the reader again after pauseReading(), and restart the
+        watchdog if it was suspended."""
+        if not self._reading_paused:
+            return
+        self._reading_paused = False
+        self.transport.resumeProducing()
+        if self._watchdog_suspended:
+            self.startWatchdog()
+
+    def _checkWatchdog (self):
+        timeout = self.keepalive_interval * self.keepalive_misses
+        idle = self.clock.seconds() - self._last_traffic
+        if idle < timeout:
+            self._watchdog = self.clock.callLater(timeout - idle,
+                                                  self._checkWatchdog)
+            return
+        self._watchdog = None
+        logger.warn('nothing from %s for %.1f seconds; dropping the '
+                    'connection', self.peername, idle)
+        # don't wait to flush writes to a peer that has gone away
+        abort = getattr(self.transport, 'abortConnection',
+                        self.transport.loseConnection)
+        abort()
 
     def panic (self, failure, *args):
         logger.error('panic(): %s', args)
         logger.error(failure.getErrorMessage())
         logger.error(failure.getTraceback())
 
-    def send_KEEPALIVE_ACK (self):
+    def send_KEEPALIVE_ACK (self, msgid):
+        """Acknowledge the KEEPALIVE with ID msgid."""
         self.sendLLRPMessage(LLRPMessage(msgdict={
             'KEEPALIVE_ACK': {
                 'Ver':  1,
                 'Type': 72,
-                'ID':   0,
+                'ID':   msgid,
             }}))
 
-    def send_GET_READER_CAPABILITIES (self, onCompletion):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
-            'GET_READER_CAPABILITIES': {
-                'Ver':  1,
-                'Type': 1,
-                'ID':   0,
-                'RequestedData': Capability_Name2Type['All']
-            }}))
+    def capabilitiesRequest (self, requested=None):
+        """Return a GET_READER_CAPABILITIES message for the requested
+        capabilities (a Capability_Name2Type name): by default all of them,
+        or only the General Device Capabilities given a capabilities_cache
+        to look the rest up in."""
+        if requested is None:
+            requested = 'All' if self.capabilities_cache is None \
+                    else 'General Device Capabilities'
+        return {'GET_READER_CAPABILITIES': {
+                    'Ver':  1,
+                    'Type': 1,
+                    'RequestedData': Capability_Name2Type[requested]}}
+
+    def rospecsRequest (self):
+        """Return a GET_ROSPECS message."""
+        return {'GET_ROSPECS': {
+                    'Ver':  1,
+                    'Type': 26}}
+
+    def send_GET_READER_CAPABILITIES (self, onCompletion, requested=None):
+        response = self.sendMessage(self.capabilitiesRequest(requested))
         self.setState(LLRPClient.STATE_SENT_GET_CAPABILITIES)
-        self._deferreds['GET_READER_CAPABILITIES_RESPONSE'].append(onCompletion)
+        if onCompletion:
+            self._deferreds['GET_READER_CAPABILITIES_RESPONSE'].append(
+                    onCompletion)
+        return response
 
     def send_ADD_ROSPEC (self, rospec, onCompletion):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        response = self.sendMessage({
             'ADD_ROSPEC': {
                 'Ver':  1,
                 'Type': 20,
-                'ID':   0,
                 'ROSpecID': rospec['ROSpecID'],
                 'ROSpec': rospec,
-            }}))
+            }})
         self.setState(LLRPClient.STATE_SENT_ADD_ROSPEC)
         self._deferreds['ADD_ROSPEC_RESPONSE'].append(onCompletion)
+        return response
 
     def send_ENABLE_ROSPEC (self, _, rospec, onCompletion):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        response = self.sendMessage({
             'ENABLE_ROSPEC': {
                 'Ver':  1,
                 'Type': 24,
-                'ID':   0,
                 'ROSpecID': rospec['ROSpecID']
-            }}))
+            }})
         self.setState(LLRPClient.STATE_SENT_ENABLE_ROSPEC)
         self._deferreds['ENABLE_ROSPEC_RESPONSE'].append(onCompletion)
+        return response
 
     def send_ADD_ACCESSSPEC (self, accessSpec, onCompletion):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        response = self.sendMessage({
             'ADD_ACCESSSPEC': {
                 'Ver':  1,
                 'Type': 40,
-                'ID':   0,
                 'AccessSpec': accessSpec,
-            }}))
+            }})
         self._deferreds['ADD_ACCESSSPEC_RESPONSE'].append(onCompletion)
+        return response
 
     def send_ENABLE_ACCESSSPEC (self, _, accessSpecID, onCompletion=None):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        response = self.sendMessage({
             'ENABLE_ACCESSSPEC': {
                 'Ver':  1,
                 'Type': 42,
-                'ID':   0,
                 'AccessSpecID': accessSpecID,
-            }}))
+            }})
 
         if onCompletion:
             self._deferreds['ENABLE_ACCESSSPEC_RESPONSE'].append(onCompletion)
+        return response
 
     def startAccess (self, readWords=None, writeWords=None, target = None,
             *args):
+        """Add an AccessSpec that reads or writes tag memory, and enable it.
+        Return a Deferred that fires once the reader confirms that the
+        AccessSpec is enabled, or fails with LLRPResponseError if it reports
+        an error adding or enabling it."""
         m = Message_struct['AccessSpec']
         if not target:
             target = {
@@ -673,10 +1342,14 @@ class LLRPClient (LineReceiver):
         }
 
         d = defer.Deferred()
-        d.addCallback(self.send_ENABLE_ACCESSSPEC, accessSpecID)
         d.addErrback(self.panic, 'ADD_ACCESSSPEC failed')
 
-        self.send_ADD_ACCESSSPEC(accessSpec, onCompletion=d)
+        # the responses, unlike the Deferreds that the state machine fires,
+        # carry the reader's errors to the caller
+        added = self.send_ADD_ACCESSSPEC(
+            self.getEncodedSpec('AccessSpec', accessSpec), onCompletion=d)
+        added.addCallback(self.send_ENABLE_ACCESSSPEC, accessSpecID)
+        return added
 
     def startInventory (self, *args):
         """Add a ROSpec to the reader and enable it."""
@@ -684,7 +1357,7 @@ class LLRPClient (LineReceiver):
             logger.warn('ignoring startInventory() while already inventorying')
             return None
 
-        rospec = self.getROSpec()['ROSpec']
+        rospec = self.getEncodedSpec('ROSpec', self.getROSpec()['ROSpec'])
 
         logger.info('starting inventory')
 
@@ -694,7 +1367,8 @@ class LLRPClient (LineReceiver):
         started.addErrback(self.panic, 'ENABLE_ROSPEC failed')
 
         if self.duration:
-            task.deferLater(reactor, self.duration, self.stopPolitely, True)
+            task.deferLater(self.clock, self.duration, self.stopPolitely,
+                           True)
 
         d = defer.Deferred()
         d.addCallback(self.send_ENABLE_ROSPEC, rospec, onCompletion=started)
@@ -714,8 +1388,53 @@ class LLRPClient (LineReceiver):
                             session=self.session,
                             tag_population=self.tag_population)
         logger.debug('ROSpec: %s', self.rospec)
+        self.updateTagDecoder()
         return self.rospec
 
+    def updateTagDecoder (self):
+        """Match tag_decoder to the TagReportContentSelector of rospec."""
+        self.tag_decoder = TagReportDataDecoder(self.rospec['ROSpec']\
+                ['ROReportSpec']['TagReportContentSelector'],
+                record_type=self.tag_record_type)
+
+    def cachedSpec (self, name):
+        """Return the cached EncodedSpec of the name parameter (e.g.,
+        'ROSpec') last sent to this reader, or None."""
+        return self.spec_cache.get((name, self.peername and self.peername[0]))
+
+    def getEncodedSpec (self, name, par):
+        """Return an EncodedSpec of par, a name parameter (e.g., 'ROSpec'),
+        reusing the cached one if it was encoded from an identical dict."""
+        encoded = self.cachedSpec(name)
+        if encoded is None or encoded.par != par:
+            encoded = EncodedSpec(name, par)
+            self.spec_cache[name, self.peername and self.peername[0]] = \
+                    encoded
+        return encoded
+
+    def setTxPower (self, tx_power, antennas=None):
+        """Set the transmit power (an index into tx_power_table) of the
+        ROSpec on the given antennas (default: all of them).
+
+        Only the affected RFTransmitter parameters of the encoded ROSpec are
+        re-encoded.  The change takes effect the next time the ROSpec is
+        added to the reader, e.g., on reconnecting or after stopPolitely()
+        and startInventory()."""
+        rospec = self.getROSpec()['ROSpec']
+        encoded = self.getEncodedSpec('ROSpec', rospec)
+        path = ('AISpec', 'InventoryParameterSpec', 'AntennaConfiguration')
+        antconfs = rospec['AISpec']['InventoryParameterSpec']\
+                ['AntennaConfiguration']
+        for i, antconf in enumerate(antconfs):
+            if antennas is not None and antconf['AntennaID'] not in antennas:
+                continue
+            antconf['RFTransmitter'] = dict(antconf['RFTransmitter'],
+                                            TransmitPower=tx_power)
+            encoded.replace(path + (i, 'RFTransmitter'),
+                            antconf['RFTransmitter'])
+        if antennas is None:
+            self.tx_power = tx_power
+
     def stopPolitely (self, disconnect=False):
         """Delete all active ROSpecs.  Return a Deferred that will be called
            when the DELETE_ROSPEC_RESPONSE comes back."""
@@ -723,13 +1442,12 @@ class LLRPClient (LineReceiver):
         if disconnect:
             logger.info('will disconnect when stopped')
             self.disconnecting = True
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        self.sendMessage({
             'DELETE_ACCESSSPEC': {
                 'Ver': 1,
                 'Type': 41,
-                'ID': 0,
                 'AccessSpecID': 0 # all AccessSpecs
-            }}))
+            }})
         self.setState(LLRPClient.STATE_SENT_DELETE_ACCESSSPEC)
 
         d = defer.Deferred()
@@ -740,13 +1458,12 @@ class LLRPClient (LineReceiver):
         return d
 
     def stopAllROSpecs (self, *args):
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        self.sendMessage({
             'DELETE_ROSPEC': {
                 'Ver':  1,
                 'Type': 21,
-                'ID':   0,
                 'ROSpecID': 0
-            }}))
+            }})
         self.setState(LLRPClient.STATE_SENT_DELETE_ROSPEC)
 
         d = defer.Deferred()
@@ -761,13 +1478,12 @@ class LLRPClient (LineReceiver):
 
         rospec = self.getROSpec()['ROSpec']
 
-        self.sendLLRPMessage(LLRPMessage(msgdict={
+        self.sendMessage({
             'DISABLE_ROSPEC': {
                 'Ver':  1,
                 'Type': 25,
-                'ID':   0,
                 'ROSpecID': rospec['ROSpecID']
-            }}))
+            }})
         self.setState(LLRPClient.STATE_PAUSING)
 
         d = defer.Deferred()
@@ -775,7 +1491,8 @@ class LLRPClient (LineReceiver):
         self._deferreds['DISABLE_ROSPEC_RESPONSE'].append(d)
 
         if duration_seconds > 0:
-            startAgain = task.deferLater(reactor, duration_seconds, lambda: 0)
+            startAgain = task.deferLater(self.clock, duration_seconds,
+                                        lambda: 0)
             startAgain.addCallback(self.resume)
 
         return d
@@ -799,18 +1516,70 @@ class LLRPClient (LineReceiver):
         d.addErrback(self.panic, 'resume() failed')
         self.send_ENABLE_ROSPEC(None, rospec, onCompletion=d)
 
+    def nextMessageID (self):
+        """Return the ID for the next message sent on this connection."""
+        msgid = self._next_msgid
+        # IDs are 32 bits; skip 0 on wrapping around
+        self._next_msgid = msgid % 0xffffffff + 1
+        return msgid
+
+    def sendMessage (self, msgdict):
+        """Send msgdict, a {message name: message dict} with no 'ID', as the
+        next message.  Return a Deferred that fires with the LLRPMessage the
+        reader responds to it with, or fails with LLRPResponseError if the
+        response reports an error."""
+        name = msgdict.keys()[0]
+        msgid = self.nextMessageID()
+        msgdict[name]['ID'] = msgid
+        self.sendLLRPMessage(LLRPMessage(msgdict=msgdict))
+        d = defer.Deferred()
+        self._responses[msgid] = d
+        return d
+
+    def sendBatch (self, msgdicts):
+        """Send each message of msgdicts as sendMessage() does, but all in one
+        write.  Return a list of their response Deferreds."""
+        self._write_batch = []
+        try:
+            responses = [self.sendMessage(msgdict) for msgdict in msgdicts]
+        finally:
+            batch, self._write_batch = self._write_batch, None
+        self.transport.write(''.join(batch))
+        return responses
+
     def sendLLRPMessage (self, llrp_msg):
         assert isinstance(llrp_msg, LLRPMessage)
         assert llrp_msg.msgbytes, "LLRPMessage is empty"
-        self.transport.write(llrp_msg.msgbytes)
+        if self._write_batch is not None:
+            self._write_batch.append(llrp_msg.msgbytes)
+        else:
+            self.transport.write(llrp_msg.msgbytes)
 
 class LLRPClientFactory (ClientFactory):
-    def __init__ (self, onFinish=None, reconnect=False,
-            **kwargs):
+    # each failed reconnection attempt multiplies the delay before the next
+    reconnect_factor = 2.0
+
+    def __init__ (self, onFinish=None, reconnect=False, reconnect_delay=1.0,
+            max_reconnect_delay=60.0, reconnect_jitter=0.1, **kwargs):
+        """With reconnect=True, reconnect to each reader reconnect_delay
+        seconds after losing (or failing to make) the connection, backing
+        off exponentially up to max_reconnect_delay seconds while attempts
+        keep failing, until the reader is inventorying again.  Each delay is
+        randomized by +/- reconnect_jitter (a fraction) so that readers lost
+        together don't all reconnect at once."""
         self.onFinish = onFinish
         self.reconnect = reconnect
-        self.reconnect_delay = 1.0 # seconds
+        self.reconnect_delay = reconnect_delay # seconds
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnect_jitter = reconnect_jitter
         self.client_args = kwargs
+        self.clock = reactor
+
+        # connector -> {'delay': seconds before the next attempt,
+        #               'attempts': attempts since last inventorying,
+        #               'call': pending IDelayedCall or None}
+        self._backoff = {}
+        self.reconnects = 0
 
         # callbacks to pass to connected clients
         # (map of LLRPClient.STATE_* -> [list of callbacks])
@@ -821,8 +1590,20 @@ class LLRPClientFactory (ClientFactory):
         # message callbacks to pass to connected clients
         self._message_callbacks = defaultdict(list)
 
+        # tag batch callbacks to pass to connected clients
+        self._tag_batch_callbacks = []
+
+        # encoded ROSpecs and AccessSpecs, shared by all clients
+        self.spec_cache = {}
+
         self.protocols = set()
 
+        # clients hand their tags to a tag_aggregator, whose records go to
+        # the tag batch callbacks
+        aggregator = kwargs.get('tag_aggregator')
+        if aggregator is not None:
+            aggregator.addCallback(self._tagsAggregated)
+
     def startedConnecting(self, connector):
         logger.info('connecting...')
 
@@ -833,6 +1614,17 @@ class LLRPClientFactory (ClientFactory):
     def addTagReportCallback (self, cb):
         self._message_callbacks['RO_ACCESS_REPORT'].append(cb)
 
+    def addTagBatchCallback (self, cb):
+        """Call cb(peername, tags) with all of the tags decoded from each TCP
+        read, or from each window of tag_batch_window seconds if that keyword
+        argument was given, instead of once per RO_ACCESS_REPORT.  With a
+        tag_aggregator, tags are the records it reports instead."""
+        self._tag_batch_callbacks.append(cb)
+
+    def _tagsAggregated (self, peername, records):
+        for fn in self._tag_batch_callbacks:
+            fn(peername, records)
+
     def buildProtocol(self, _):
         proto = LLRPClient(factory=self, **self.client_args)
 
@@ -846,14 +1638,68 @@ class LLRPClientFactory (ClientFactory):
             for cb in cbs:
                 proto.addMessageCallback(msg_type, cb)
 
+        for cb in self._tag_batch_callbacks:
+            proto.addTagBatchCallback(cb)
+
+        proto.spec_cache = self.spec_cache
+        proto.addStateCallback(LLRPClient.STATE_INVENTORYING,
+                               self._resetBackoff)
+
         return proto
 
+    def _resetBackoff (self, proto):
+        connector = getattr(proto.transport, 'connector', None)
+        if connector in self._backoff:
+            logger.debug('inventorying again; resetting reconnect delay')
+            del self._backoff[connector]
+
+    def scheduleReconnect (self, connector):
+        """Reconnect connector after its current backoff delay."""
+        backoff = self._backoff.setdefault(connector,
+                {'delay': self.reconnect_delay, 'attempts': 0, 'call': None})
+        if backoff['call'] is not None and backoff['call'].active():
+            return
+        delay = backoff['delay'] * random.uniform(1 - self.reconnect_jitter,
+                                                  1 + self.reconnect_jitter)
+        backoff['delay'] = min(backoff['delay'] * self.reconnect_factor,
+                               self.max_reconnect_delay)
+        backoff['attempts'] += 1
+        logger.info('reconnecting to %s in %.1f seconds (attempt %d)',
+                    connector.getDestination(), delay, backoff['attempts'])
+        backoff['call'] = self.clock.callLater(delay, self._reconnect,
+                                               connector)
+
+    def _reconnect (self, connector):
+        self._backoff[connector]['call'] = None
+        self.reconnects += 1
+        connector.connect()
+
+    def stopReconnecting (self):
+        """Stop reconnecting, and cancel pending reconnection attempts."""
+        self.reconnect = False
+        for backoff in self._backoff.values():
+            if backoff['call'] is not None and backoff['call'].active():
+                backoff['call'].cancel()
+        self._backoff.clear()
+
+    def reconnectStats (self):
+        """Return the total number of reconnection attempts made, and the
+        readers being reconnected to with their attempts and next delays."""
+        readers = {}
+        for connector, backoff in self._backoff.items():
+            dest = connector.getDestination()
+            readers['{}:{}'.format(dest.host, dest.port)] = {
+                'attempts': backoff['attempts'],
+                'next_delay': backoff['delay'],
+                'pending': backoff['call'] is not None,
+            }
+        return {'reconnects': self.reconnects, 'readers': readers}
+
     def clientConnectionLost(self, connector, reason):
         logger.info('lost connection: %s', reason.getErrorMessage())
         ClientFactory.clientConnectionLost(self, connector, reason)
         if self.reconnect:
-            time.sleep(self.reconnect_delay)
-            connector.connect()
+            self.scheduleReconnect(connector)
         elif not self.protocols:
             if self.onFinish:
                 self.onFinish.callback(None)
@@ -862,8 +1708,7 @@ class LLRPClientFactory (ClientFactory):
         logger.info('connection failed: %s', reason.getErrorMessage())
         ClientFactory.clientConnectionFailed(self, connector, reason)
         if self.reconnect:
-            time.sleep(self.reconnect_delay)
-            connector.connect()
+            self.scheduleReconnect(connector)
         elif not self.protocols:
             if self.onFinish:
                 self.onFinish.callback(None)
@@ -888,3 +1733,9 @@ class LLRPClientFactory (ClientFactory):
             LLRPClient.getStateName(proto.state) for proto in self.protocols}
         logger.info('states: %s', states)
         return states
+
+    def getProtocolLatencies (self):
+        """Return LLRPClient.getLatencies() of every connected reader, by
+        host."""
+        return {'{}'.format(proto.peername[0]): proto.getLatencies()
+                for proto in self.protocols}
@@ -1,6 +1,7 @@
 import struct
 import logging
 from llrp_errors import *
+from sllurp import trace
 
 logger = logging.getLogger(__name__)
 
@@ -19,39 +20,67 @@ tve_param_formats = {
     8: ('TagSeenCount', '!H'),
     9: ('ROSpecID', '!I'),
     10: ('InventoryParameterSpecID', '!H'),
+    11: ('C1G2CRC', '!H'),
+    12: ('C1G2PC', '!H'),
+    13: ('EPC-96', '!12s'),
     14: ('SpecIndex', '!H'),
     15: ('ClientRequestOpSpecResult', '!H'),
-    16: ('AccessSpecID', '!I')
+    16: ('AccessSpecID', '!I'),
+    17: ('OpSpecID', '!H'),
+    18: ('C1G2SingulationDetails', '!HH'),
 }
 
-def decode_tve_parameter (data):
-    """Generic byte decoding function for TVE parameters.
+# precompiled tve_param_formats, indexed by the whole TV header byte
+# (0x80 | param type); None for anything that isn't a known TV parameter
+tve_param_structs = [None] * 256
+for msgtype, (param_name, param_fmt) in tve_param_formats.items():
+    tve_param_structs[0x80 | msgtype] = (param_name, struct.Struct(param_fmt))
+del msgtype, param_name, param_fmt
 
-    Given an array of bytes, tries to interpret a TVE parameter from the
-    beginning of the array.  Returns the decoded data and the number of bytes it
-    read."""
+def decode_tve_parameter (data, offset=0):
+    """Generic byte decoding function for TVE parameters.
 
-    # decode the TVE field's header (1 bit "reserved" + 7-bit type)
-    (msgtype,) = struct.unpack(tve_header, data[:tve_header_len])
-    if not msgtype & 0b10000000:
-        # not a TV-encoded param
-        return None, 0
-    msgtype = msgtype & 0x7f
-    try:
-        param_name, param_fmt = tve_param_formats[msgtype]
-        logger.debug('found %s (type=%s)', param_name, msgtype)
-    except KeyError as err:
+    Given an array of bytes, tries to interpret a TVE parameter starting at
+    offset (default: the beginning of the array).  Returns the decoded data and
+    the number of bytes it read."""
+    entry = tve_param_structs[ord(data[offset])]
+    if entry is None:
+        # not a TV-encoded param, or not one we know
         return None, 0
+    param_name, param_struct = entry
+    if trace.enabled:
+        trace.event('decode', param_name, offset=offset)
 
     # decode the body
-    nbytes = struct.calcsize(param_fmt)
-    end = tve_header_len + nbytes
+    end = tve_header_len + param_struct.size
     try:
-        unpacked = struct.unpack(param_fmt, data[tve_header_len:end])
+        unpacked = param_struct.unpack_from(data, offset + tve_header_len)
         return {param_name: unpacked}, end
     except struct.error:
         return None, 0
 
+def decode_tve_run (data, offset, out, end=None):
+    """Decode consecutive TV parameters into a mapping.
+
+    Starting at offset, stores each TV parameter found in data[offset:end] in
+    out (name -> tuple of values, as with decode_tve_parameter) until it
+    reaches end or something that isn't a known TV parameter.  Returns the
+    offset just past the last parameter decoded."""
+    if end is None:
+        end = len(data)
+    structs = tve_param_structs
+    while offset < end:
+        entry = structs[ord(data[offset])]
+        if entry is None:
+            break
+        param_name, param_struct = entry
+        body = offset + tve_header_len
+        if body + param_struct.size > end:
+            break
+        out[param_name] = param_struct.unpack_from(data, body)
+        offset = body + param_struct.size
+    return offset
+
 def decode_parameter (data):
     """Decode a single parameter."""
     pass
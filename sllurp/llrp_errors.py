@@ -2,6 +2,7 @@ __all__ = [
     # Exceptions
     "LLRPError",
     "LLRPResponseError",
+    "LLRPFramingError",
 ]
 
 class LLRPError (Exception):
@@ -9,3 +10,10 @@ class LLRPError (Exception):
 
 class LLRPResponseError (LLRPError):
     pass
+
+class LLRPFramingError (LLRPError):
+    """A message header with an impossible length; frames holds the complete
+    messages that came before it."""
+    def __init__ (self, message, frames=()):
+        LLRPError.__init__(self, message)
+        self.frames = frames
@@ -24,12 +24,15 @@
 #
 
 import logging, struct, exceptions
+import itertools
+import copy
 from collections import defaultdict
 from binascii import hexlify
 import traceback
 import time
 from util import *
 import llrp_decoder
+from sllurp import trace
 from llrp_errors import *
 
 #
@@ -41,6 +44,13 @@ __all__ = [
     "LLRPdCapabilities",
     "LLRPROSpec",
     "LLRPMessageDict",
+    "TagReportDataDecoder",
+    "TagRead",
+    "EncodedSpec",
+
+    # Generators
+    "iter_TagReportData",
+    "iter_tag_reports",
 
     # Misc
     "func",
@@ -58,6 +68,56 @@ def decode(data):
 def encode(data):
     return Message_struct[data]['encode']
 
+def slice_decoder(decode_from):
+    """Adapt a decode_*_from function to the slice-and-return interface.
+
+    decode_*_from functions take a buffer and the (offset, end) bounds of the
+    region to decode, and return the decoded parameter (or None) along with
+    the offset just past it, so that nested parameters are decoded without
+    copying.  The returned function takes a byte string and returns the
+    decoded parameter along with the remaining bytes."""
+    def decoder(data):
+        par, offset = decode_from(data, 0, len(data))
+        return par, data[offset:]
+    decoder.__name__ = decode_from.__name__[:-len('_from')]
+    decoder.__doc__ = decode_from.__doc__
+    return decoder
+
+def buffer_encoder(encode_into):
+    """Adapt an encode_*_into function to return a byte string.
+
+    encode_*_into functions append the encoded parameter to a bytearray, so
+    that a whole tree of nested parameters is built in one buffer instead of
+    by concatenating (and re-copying) the bytes of every level.  The returned
+    function takes the parameter dict and returns its encoding."""
+    def encoder(par):
+        buf = bytearray()
+        encode_into(par, buf)
+        return str(buf)
+    encoder.__name__ = encode_into.__name__[:-len('_into')]
+    encoder.__doc__ = encode_into.__doc__
+    return encoder
+
+def into_encoder(encode):
+    """Adapt an encode_* function that returns a byte string to the
+    encode_*_into interface."""
+    def encoder_into(par, buf):
+        buf += encode(par)
+    encoder_into.__name__ = encode.__name__ + '_into'
+    return encoder_into
+
+def begin_par(buf, msgtype):
+    """Append a TLV parameter header of type msgtype to buf, and return its
+    offset for end_par() to fill in the length."""
+    start = len(buf)
+    buf += _par_header_struct.pack(msgtype, 0)
+    return start
+
+def end_par(buf, start):
+    """Set the length of the parameter begun at offset start of buf to run to
+    the end of buf."""
+    _u16_struct.pack_into(buf, start + 2, len(buf) - start)
+
 def bin2dump(data, label=''):
     def isprint(c):
         return ord(c) >= 32 and ord(c) <= 126
@@ -108,6 +168,8 @@ msg_header = '!HII'
 msg_header_len = struct.calcsize(msg_header)
 par_header = '!HH'
 par_header_len = struct.calcsize(par_header)
+_par_header_struct = struct.Struct(par_header)
+_u16_struct = struct.Struct('!H')
 tve_header = '!B'
 tve_header_len = struct.calcsize(tve_header)
 
@@ -156,6 +218,14 @@ StopTrigger_Name2Type = {
 
 StopTrigger_Type2Name = reverse_dict(StopTrigger_Name2Type)
 
+# 16.2.6.4 Keepalive trigger
+KeepaliveTrigger_Name2Type = {
+    'Null':                 0,
+    'Periodic':             1
+}
+
+KeepaliveTrigger_Type2Name = reverse_dict(KeepaliveTrigger_Name2Type)
+
 # 13.2.6.11 Connection attemp events
 ConnEvent_Name2Type = {
     'Success':                          0,
@@ -213,6 +283,14 @@ ROReportTrigger_Name2Type = {
     'Upon_N_Tags_Or_End_Of_ROSpec': 2,
 }
 
+ROReportTrigger_Type2Name = reverse_dict(ROReportTrigger_Name2Type)
+
+# 16.2.7.6.9 AntennaEvent
+AntennaEvent_Type2Name = {
+    0: 'Disconnected',
+    1: 'Connected',
+}
+
 # 16.2.1.1.2.1 UHFRFModeTable, to be filled in by capabilities parser
 ModeIndex_Name2Type = defaultdict(int)
 
@@ -238,45 +316,43 @@ DEFAULT_MODULATION = 'M4'
 Message_struct = { }
 
 # 16.1.1 GET_READER_CAPABILITIES
-def encode_GetReaderCapabilities(msg):
-    req = msg['RequestedData']
-    return struct.pack('!B', req)
-
 Message_struct['GET_READER_CAPABILITIES'] = {
     'type': 1,
     'fields': [
         'Ver', 'Type', 'ID',
         'RequestedData'
     ],
-    'encode': encode_GetReaderCapabilities
+    'schema': [('RequestedData', 'B')],
 }
 
 # 16.1.2 GET_READER_CAPABILITIES_RESPONSE
 def decode_GetReaderCapabilitiesResponse(data):
     msg = LLRPMessageDict()
-    logger.debug(func())
+    if trace.enabled:
+        trace.event('decode', func())
 
     # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
+    end = len(data)
+    ret, offset = decode_LLRPStatus_from(data, 0, end)
     if ret:
         msg['LLRPStatus'] = ret
     else:
         raise LLRPError('missing or invalid LLRPStatus parameter')
 
-    ret, body = decode('GeneralDeviceCapabilities')(body)
+    ret, offset = decode_GeneralDeviceCapabilities_from(data, offset, end)
     if ret:
         msg['GeneralDeviceCapabilities'] = ret
 
-    ret, body = decode('LLRPCapabilities')(body)
+    ret, offset = decode_LLRPCapabilities_from(data, offset, end)
     if ret:
         msg['LLRPCapabilities'] = ret
 
-    ret, body = decode('RegulatoryCapabilities')(body)
+    ret, offset = decode_RegulatoryCapabilities_from(data, offset, end)
     if ret:
         msg['RegulatoryCapabilities'] = ret
 
-    if len(body):
-        msg['AirProtocolLLRPCapabilities'] = body
+    if offset < end:
+        msg['AirProtocolLLRPCapabilities'] = data[offset:end]
 
     return msg
 
@@ -294,275 +370,215 @@ Message_struct['GET_READER_CAPABILITIES_RESPONSE'] = {
 }
 
 # 16.1.3 ADD_ROSPEC
-def encode_AddROSpec(msg):
-    return encode('ROSpec')(msg['ROSpec'])
-
 Message_struct['ADD_ROSPEC'] = {
     'type': 20,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpec'
     ],
-    'encode': encode_AddROSpec
+    'schema': [('ROSpec', 'param', True)],
 }
 
 # 16.1.4 ADD_ROSPEC_RESPONSE
-def decode_AddROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['ADD_ROSPEC_RESPONSE'] = {
     'type': 30,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_AddROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 16.1.5 DELETE_ROSPEC
-def encode_DeleteROSpec(msg):
-        msgid = msg['ROSpecID']
-
-        return struct.pack('!I', msgid)
-
 Message_struct['DELETE_ROSPEC'] = {
     'type': 21,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpecID'
     ],
-    'encode': encode_DeleteROSpec
+    'schema': [('ROSpecID', 'I')],
 }
 
 # 16.1.6 DELETE_ROSPEC_RESPONSE
-def decode_DeleteROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['DELETE_ROSPEC_RESPONSE'] = {
     'type': 31,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_DeleteROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 16.1.7 START_ROSPEC
-def encode_StartROSpec(msg):
-        msgid = msg['ROSpecID']
-
-        return struct.pack('!I', msgid)
-
 Message_struct['START_ROSPEC'] = {
     'type': 22,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpecID'
     ],
-    'encode': encode_StartROSpec
+    'schema': [('ROSpecID', 'I')],
 }
 
 # 16.1.8 START_ROSPEC_RESPONSE
-def decode_StartROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['START_ROSPEC_RESPONSE'] = {
     'type': 32,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_StartROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 16.1.9 STOP_ROSPEC
-def encode_StopROSpec(msg):
-        msgid = msg['ROSpecID']
-
-        return struct.pack('!I', msgid)
-
 Message_struct['STOP_ROSPEC'] = {
     'type': 23,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpecID'
     ],
-    'encode': encode_StopROSpec
+    'schema': [('ROSpecID', 'I')],
 }
 
 # 16.1.10 STOP_ROSPEC_RESPONSE
-def decode_StopROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['STOP_ROSPEC_RESPONSE'] = {
     'type': 33,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_StopROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 16.1.11 ENABLE_ROSPEC
-def encode_EnableROSpec(msg):
-    msgid = msg['ROSpecID']
-
-    return struct.pack('!I', msgid)
-
 Message_struct['ENABLE_ROSPEC'] = {
     'type': 24,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpecID'
     ],
-    'encode': encode_EnableROSpec
+    'schema': [('ROSpecID', 'I')],
 }
 
 # 16.1.12 ENABLE_ROSPEC_RESPONSE
-def decode_EnableROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['ENABLE_ROSPEC_RESPONSE'] = {
     'type': 34,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_EnableROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 16.1.13 DISABLE_ROSPEC
-def encode_DisableROSpec(msg):
-        msgid = msg['ROSpecID']
-
-        return struct.pack('!I', msgid)
-
 Message_struct['DISABLE_ROSPEC'] = {
     'type': 25,
     'fields': [
         'Ver', 'Type', 'ID',
         'ROSpecID'
     ],
-    'encode': encode_DisableROSpec
+    'schema': [('ROSpecID', 'I')],
 }
 
 # 16.1.14 DISABLE_ROSPEC_RESPONSE
-def decode_DisableROSpecResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 Message_struct['DISABLE_ROSPEC_RESPONSE'] = {
     'type': 35,
     'fields': [
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_DisableROSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
+}
+
+# 16.1.15 GET_ROSPECS
+Message_struct['GET_ROSPECS'] = {
+    'type': 26,
+    'fields': [
+        'Ver', 'Type', 'ID',
+    ],
+    'schema': [],
+}
+
+# 16.1.16 GET_ROSPECS_RESPONSE
+Message_struct['GET_ROSPECS_RESPONSE'] = {
+    'type': 36,
+    'fields': [
+        'Ver', 'Type', 'ID',
+        'LLRPStatus',
+        'ROSpec'
+    ],
+    'schema': [
+        ('LLRPStatus', 'param', True),
+        ('ROSpec', 'params'),
+    ],
 }
 
 # 16.1.30 RO_ACCESS_REPORT
-def decode_ROAccessReport(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
+def iter_TagReportData(data, offset=0, end=None, tag_decoder=None):
+    """Yield the TagReportData parameters in data[offset:end] (by default, an
+    entire RO_ACCESS_REPORT body) one at a time."""
+    if end is None:
+        end = len(data)
+    if tag_decoder is None:
+        decode_tag = decode_TagReportData_from
+    else:
+        decode_tag = tag_decoder.decode_from
 
-    # Decode parameters
-    msg['TagReportData'] = [ ]
     while True:
         try:
-            ret, data = decode('TagReportData')(data)
+            ret, offset = decode_tag(data, offset, end)
         except TypeError: # XXX
             logger.error('Unable to decode TagReportData')
             break
-        #print('len(ret) = {}'.format(len(ret)))
-        #print('len(data) = {}'.format(len(data)))
         if ret:
-            msg['TagReportData'].append(ret)
+            yield ret
         else:
             break
 
+def iter_tag_reports(data, tag_decoder=None):
+    """Yield the tags reported in a sequence of LLRP messages, one at a time.
+
+    data is either a string or buffer holding one or more complete messages
+    (e.g., a single RO_ACCESS_REPORT, or a recorded capture), or a file-like
+    object from which messages are read one by one.  Messages other than
+    RO_ACCESS_REPORT are skipped, as is a truncated message at the end."""
+    report_type = Message_struct['RO_ACCESS_REPORT']['type']
+    if hasattr(data, 'read'):
+        while True:
+            header = data.read(msg_header_len)
+            if len(header) < msg_header_len:
+                return
+            msgtype, length, _ = struct.unpack(msg_header, header)
+            if length < msg_header_len:
+                raise LLRPError('invalid message length {}'.format(length))
+            body = data.read(length - msg_header_len)
+            if len(body) < length - msg_header_len:
+                return
+            if msgtype & BITMASK(10) == report_type:
+                for tag in iter_TagReportData(body, tag_decoder=tag_decoder):
+                    yield tag
+    else:
+        offset = 0
+        while offset + msg_header_len <= len(data):
+            msgtype, length, _ = struct.unpack_from(msg_header, data, offset)
+            if length < msg_header_len:
+                raise LLRPError('invalid message length {}'.format(length))
+            if offset + length > len(data):
+                return
+            if msgtype & BITMASK(10) == report_type:
+                for tag in iter_TagReportData(data, offset + msg_header_len,
+                        offset + length, tag_decoder):
+                    yield tag
+            offset += length
+
+def decode_ROAccessReport(data, tag_decoder=None):
+    msg = LLRPMessageDict()
+    if trace.enabled:
+        trace.event('decode', func())
+
+    # Decode parameters
+    msg['TagReportData'] = list(iter_TagReportData(data,
+        tag_decoder=tag_decoder))
+
     ## Check the end of the message
     #if len(data) > 0:
     #    raise LLRPError('junk at end of message: ' + bin2dump(data))
@@ -579,42 +595,38 @@ Message_struct['RO_ACCESS_REPORT'] = {
 }
 
 # 16.1.35 KEEPALIVE
-def decode_Keepalive(msg):
-    return ''
-
 Message_struct['KEEPALIVE'] = {
     'type': 62,
     'fields': [
         'Ver', 'Type', 'ID',
     ],
-    'decode': decode_Keepalive
+    'schema': [],
 }
 
 # 16.1.36 KEEPALIVE_ACK
-def encode_KeepaliveAck(msg):
-    return ''
-
 Message_struct['KEEPALIVE_ACK'] = {
     'type': 72,
     'fields': [
         'Ver', 'Type', 'ID',
     ],
-    'encode': encode_KeepaliveAck
+    'schema': [],
 }
 
 # 16.1.33 READER_EVENT_NOTIFICATION
 def decode_ReaderEventNotification(data):
     msg = LLRPMessageDict()
-    logger.debug(func())
+    if trace.enabled:
+        trace.event('decode', func())
 
     # Decode parameters
-    ret, body = decode('ReaderEventNotificationData')(data)
+    ret, offset = decode_ReaderEventNotificationData_from(data, 0, len(data))
     if ret:
         msg['ReaderEventNotificationData'] = ret
 
-    # Check the end of the message
-        if len(body) > 0:
-                raise LLRPError('junk at end of message: ' + bin2dump(body))
+        # Check the end of the message
+        if offset < len(data):
+            raise LLRPError('junk at end of message: ' +
+                            bin2dump(data[offset:]))
 
     return msg
 
@@ -627,36 +639,52 @@ Message_struct['READER_EVENT_NOTIFICATION'] = {
     'decode': decode_ReaderEventNotification
 }
 
-# 16.1.40 CLOSE_CONNECTION
-def encode_CloseConnection(msg):
-    return ''
+# 16.1.38 SET_READER_CONFIG
+# only ResetToFactoryDefault and KeepaliveSpec are encoded; other
+# configuration parameters are refused rather than dropped
+def encode_SetReaderConfig_into(msg, buf):
+    unsupported = set(msg) - set(Message_struct['SET_READER_CONFIG']['fields'])
+    if unsupported:
+        raise LLRPError('cannot encode SET_READER_CONFIG parameters: ' +
+                        ', '.join(sorted(unsupported)))
+    buf += struct.pack('!B', (msg.get('ResetToFactoryDefault') and 1 or 0)
+                       << 7)
+    if 'KeepaliveSpec' in msg:
+        encode_KeepaliveSpec_into(msg['KeepaliveSpec'], buf)
+
+encode_SetReaderConfig = buffer_encoder(encode_SetReaderConfig_into)
+
+Message_struct['SET_READER_CONFIG'] = {
+    'type': 3,
+    'fields': [
+        'Ver', 'Type', 'ID',
+        'ResetToFactoryDefault',
+        'KeepaliveSpec'
+    ],
+    'encode': encode_SetReaderConfig,
+    'encode_into': encode_SetReaderConfig_into,
+}
 
+# 16.1.39 SET_READER_CONFIG_RESPONSE
+Message_struct['SET_READER_CONFIG_RESPONSE'] = {
+    'type': 13,
+    'fields': [
+        'Ver', 'Type', 'ID',
+        'LLRPStatus'
+    ],
+    'schema': [('LLRPStatus', 'param', True)],
+}
+
+# 16.1.40 CLOSE_CONNECTION
 Message_struct['CLOSE_CONNECTION'] = {
     'type': 14,
     'fields': [
         'Ver', 'Type', 'ID',
     ],
-    'encode': encode_CloseConnection
+    'schema': [],
 }
 
 # 16.1.41 CLOSE_CONNECTION_RESPONSE
-def decode_CloseConnectionResponse(data):
-    msg = LLRPMessageDict()
-    logger.debug(func())
-
-    # Decode parameters
-    ret, body = decode('LLRPStatus')(data)
-    if ret:
-        msg['LLRPStatus'] = ret
-    else:
-        raise LLRPError('missing or invalid LLRPStatus parameter')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return msg
-
 # 16.1.41 CLOSE_CONNECTION_RESPONSE
 Message_struct['CLOSE_CONNECTION_RESPONSE'] = {
     'type': 4,
@@ -664,7 +692,7 @@ Message_struct['CLOSE_CONNECTION_RESPONSE'] = {
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_CloseConnectionResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 #
@@ -672,25 +700,26 @@ Message_struct['CLOSE_CONNECTION_RESPONSE'] = {
 #
 
 # 16.2.2.1 UTCTimestamp Parameter
-def decode_UTCTimestamp(data):
-    logger.debug(func())
+def decode_UTCTimestamp_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['UTCTimestamp']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
-    (par['Microseconds'], ) = struct.unpack('!Q', body)
+    (par['Microseconds'], ) = struct.unpack_from('!Q', data, body)
+
+    return par, offset + length
 
-    return par, data[length : ]
+decode_UTCTimestamp = slice_decoder(decode_UTCTimestamp_from)
 
 Message_struct['UTCTimestamp'] = {
     'type':   128,
@@ -698,7 +727,8 @@ Message_struct['UTCTimestamp'] = {
         'Type',
         'Microseconds'
     ],
-    'decode' : decode_UTCTimestamp
+    'decode' : decode_UTCTimestamp,
+    'schema': [('Microseconds', 'Q')],
 }
 """
 Message_struct['LLRPdCapabilities'] = {
@@ -711,33 +741,36 @@ Message_struct['LLRPdCapabilities'] = {
     ]
 }
 """
-def decode_RegulatoryCapabilities(data):
-    logger.debug(func())
+def decode_RegulatoryCapabilities_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['RegulatoryCapabilities']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt = '!HH'
     fmt_len = struct.calcsize(fmt)
     # Decode fields
     (par['CountryCode'],
-     par['CommunicationsStandard']) = struct.unpack(fmt, body[:fmt_len])
+     par['CommunicationsStandard']) = struct.unpack_from(fmt, data, body)
 
-    body = body[fmt_len : ]
-    ret, body = decode('UHFBandCapabilities')(body)
+    body += fmt_len
+    ret, body = decode_UHFBandCapabilities_from(data, body, body_end)
     if ret:
         par['UHFBandCapabilities'] = ret
 
-    return par, data[length : ]
+    return par, body_end
+
+decode_RegulatoryCapabilities = \
+        slice_decoder(decode_RegulatoryCapabilities_from)
 
 
 Message_struct['RegulatoryCapabilities'] = {
@@ -748,42 +781,46 @@ Message_struct['RegulatoryCapabilities'] = {
         'CommunicationsStandard',
         'UHFBandCapabilities'
     ],
-    'decode': decode_RegulatoryCapabilities
+    'decode': decode_RegulatoryCapabilities,
+    'decode_from': decode_RegulatoryCapabilities_from,
 }
 
-def decode_UHFBandCapabilities(data):
-    logger.debug(func())
+def decode_UHFBandCapabilities_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['UHFBandCapabilities']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
     i = 0
-    ret, body = decode('TransmitPowerLevelTableEntry')(body)
+    ret, body = decode_TransmitPowerLevelTableEntry_from(data, body, body_end)
     while ret:
         par['TransmitPowerLevelTableEntry' + str(i)] = ret
-        ret, body = decode('TransmitPowerLevelTableEntry')(body)
+        ret, body = decode_TransmitPowerLevelTableEntry_from(data, body,
+                                                             body_end)
         i += 1
 
-    ret, body = decode('FrequencyInformation')(body)
+    ret, body = decode_FrequencyInformation_from(data, body, body_end)
     if ret:
         par['FrequencyInformation'] = ret
 
-    ret, body = decode('UHFRFModeTable')(body)
+    ret, body = decode_UHFRFModeTable_from(data, body, body_end)
     if ret:
         par['UHFRFModeTable'] = ret
 
-    ret, body = decode('RFSurveyFrequencyCapabilities')(body)
+    ret, body = decode_RFSurveyFrequencyCapabilities_from(data, body, body_end)
     if ret:
         par['RFSurveyFrequencyCapabilities'] = ret
-    return par, data[length : ]
+    return par, body_end
+
+decode_UHFBandCapabilities = slice_decoder(decode_UHFBandCapabilities_from)
 
 Message_struct['UHFBandCapabilities'] = {
     'type': 144,
@@ -794,28 +831,10 @@ Message_struct['UHFBandCapabilities'] = {
         'UHFRFModeTable',
         'RFSurveyFrequencyCapabilities'
     ],
-    'decode': decode_UHFBandCapabilities
+    'decode': decode_UHFBandCapabilities,
+    'decode_from': decode_UHFBandCapabilities_from,
 }
 
-def decode_TransmitPowerLevelTableEntry(data):
-    logger.debug(func())
-    par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['TransmitPowerLevelTableEntry']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (par['Index'],
-      par['TransmitPowerValue']) = struct.unpack('!HH', body)
-
-    return par, data[length : ]
-
 Message_struct['TransmitPowerLevelTableEntry'] = {
     'type': 145,
     'fields': [
@@ -823,40 +842,42 @@ Message_struct['TransmitPowerLevelTableEntry'] = {
         'Index',
         'TransmitPowerValue'
     ],
-    'decode': decode_TransmitPowerLevelTableEntry
+    'schema': [('Index', 'H'), ('TransmitPowerValue', 'H')],
 }
 
-def decode_FrequencyInformation(data):
-    logger.debug(func())
+def decode_FrequencyInformation_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['FrequencyInformation']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt_len = struct.calcsize('!B')
     # Decode fields
-    (flags, ) = struct.unpack('!B', body[ : fmt_len])
+    (flags, ) = struct.unpack_from('!B', data, body)
     par['Hopping'] = flags & BIT(7) == BIT(7)
-    body = body[fmt_len : ]
+    body += fmt_len
 
     i = 0
-    ret, body = decode('FrequencyHopTable')(body)
+    ret, body = decode_FrequencyHopTable_from(data, body, body_end)
     while ret:
         par['FrequencyHopTable' + str(i)] = ret
-        ret, body = decode('FrequencyHopTable')(body)
+        ret, body = decode_FrequencyHopTable_from(data, body, body_end)
         i += 1
 
-    ret, body = decode('FixedFrequencyTable')(body)
+    ret, body = decode_FixedFrequencyTable_from(data, body, body_end)
     if ret:
         par['FixedFrequencyTable'] = ret
 
-    return par, data[length : ]
+    return par, body_end
+
+decode_FrequencyInformation = slice_decoder(decode_FrequencyInformation_from)
 
 Message_struct['FrequencyInformation'] = {
     'type': 146,
@@ -866,21 +887,21 @@ Message_struct['FrequencyInformation'] = {
         'FrequencyHopTable',
         'FixedFrequencyTable'
     ],
-    'decode': decode_FrequencyInformation
+    'decode': decode_FrequencyInformation,
+    'decode_from': decode_FrequencyInformation_from,
 }
 
-def decode_FrequencyHopTable(data):
-    logger.debug(func())
+def decode_FrequencyHopTable_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['FrequencyHopTable']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt = '!BBH'
     fmt_len = struct.calcsize(fmt)
@@ -890,14 +911,16 @@ def decode_FrequencyHopTable(data):
     # Decode fields
     (par['HopTableId'],
      flags,
-     par['NumHops']) = struct.unpack(fmt, body[: fmt_len])
-    body = body[fmt_len : ]
+     par['NumHops']) = struct.unpack_from(fmt, data, body)
+    body += fmt_len
     num = int(par['NumHops'])
     for x in range(1, num + 1):
-       par['Frequency' + str(x)] = struct.unpack(id_fmt, body[: id_fmt_len])
-       body = body[id_fmt_len : ]
+       par['Frequency' + str(x)] = struct.unpack_from(id_fmt, data, body)
+       body += id_fmt_len
 
-    return par, data[length : ]
+    return par, offset + length
+
+decode_FrequencyHopTable = slice_decoder(decode_FrequencyHopTable_from)
 
 Message_struct['FrequencyHopTable'] = {
     'type': 147,
@@ -907,21 +930,21 @@ Message_struct['FrequencyHopTable'] = {
         'NumHops',
         'Frequencies'
     ],
-    'decode': decode_FrequencyHopTable
+    'decode': decode_FrequencyHopTable,
+    'decode_from': decode_FrequencyHopTable_from,
 }
 
-def decode_FixedFrequencyTable(data):
-    logger.debug(func())
+def decode_FixedFrequencyTable_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['FixedFrequencyTable']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt = '!H'
     fmt_len = struct.calcsize(fmt)
@@ -929,14 +952,16 @@ def decode_FixedFrequencyTable(data):
     id_fmt = '!I'
     id_fmt_len = struct.calcsize(id_fmt)
     # Decode fields
-    par['NumFrequencies'] = struct.unpack(fmt, body[: fmt_len])
-    body = body[fmt_len : ]
+    (par['NumFrequencies'], ) = struct.unpack_from(fmt, data, body)
+    body += fmt_len
     num = int(par['NumFrequencies'])
     for x in range(1, num + 1):
-       par['Frequency' + str(x)] = struct.unpack(id_fmt, body[ : id_fmt_len])
-       body = body[id_fmt_len : ]
+       par['Frequency' + str(x)] = struct.unpack_from(id_fmt, data, body)
+       body += id_fmt_len
+
+    return par, offset + length
 
-    return par, data[length : ]
+decode_FixedFrequencyTable = slice_decoder(decode_FixedFrequencyTable_from)
 
 Message_struct['FixedFrequencyTable'] = {
     'type': 148,
@@ -945,34 +970,36 @@ Message_struct['FixedFrequencyTable'] = {
         'NumFrequencies',
         'Frequencies'
     ],
-    'decode': decode_FrequencyInformation
+    'decode': decode_FixedFrequencyTable,
+    'decode_from': decode_FixedFrequencyTable_from,
 }
 
-def decode_UHFRFModeTable (data):
-    logger.debug(func())
+def decode_UHFRFModeTable_from (data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     if msgtype != Message_struct['UHFRFModeTable']['type']:
-        return (None, data)
+        return (None, offset)
 
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    body = offset + par_header_len
+    body_end = offset + length
 
     # Decode fields
     i = 0
-    ret, body = decode('UHFC1G2RFModeTableEntry')(body)
+    ret, body = decode_UHFC1G2RFModeTableEntry_from(data, body, body_end)
     while ret:
         par['UHFC1G2RFModeTableEntry' + str(i)] = ret
-        ret, body = decode('UHFC1G2RFModeTableEntry')(body)
+        ret, body = decode_UHFC1G2RFModeTableEntry_from(data, body, body_end)
         i += 1
 
-    return par, data[length : ]
+    return par, body_end
+
+decode_UHFRFModeTable = slice_decoder(decode_UHFRFModeTable_from)
 
 Message_struct['UHFRFModeTable'] = {
     'type': 328,
@@ -980,23 +1007,23 @@ Message_struct['UHFRFModeTable'] = {
         'Type',
         'UHFC1G2RFModeTableEntry'
     ],
-    'decode': decode_UHFRFModeTable
+    'decode': decode_UHFRFModeTable,
+    'decode_from': decode_UHFRFModeTable_from,
 }
 
-def decode_UHFC1G2RFModeTableEntry (data):
-    logger.debug(func())
+def decode_UHFC1G2RFModeTableEntry_from (data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     if msgtype != Message_struct['UHFC1G2RFModeTableEntry']['type']:
-        return (None, data)
+        return (None, offset)
 
-    body = data[par_header_len : length]
+    body = offset + par_header_len
 
     # Decode fields
     (par['ModeIdentifier'],
@@ -1008,13 +1035,16 @@ def decode_UHFC1G2RFModeTableEntry (data):
      par['PIE'],
      par['MinTari'],
      par['MaxTari'],
-     par['StepTari']) = struct.unpack('!IBBBBIIIII', body)
+     par['StepTari']) = struct.unpack_from('!IBBBBIIIII', data, body)
 
     # parse RC
     par['R'] = RC >> 7
     par['C'] = (RC >> 6) & 1
 
-    return par, data[length : ]
+    return par, offset + length
+
+decode_UHFC1G2RFModeTableEntry = \
+        slice_decoder(decode_UHFC1G2RFModeTableEntry_from)
 
 Message_struct['UHFC1G2RFModeTableEntry'] = {
     'type': 329,
@@ -1030,29 +1060,32 @@ Message_struct['UHFC1G2RFModeTableEntry'] = {
         'MaxTari',
         'StepTari'
     ],
-    'decode': decode_UHFC1G2RFModeTableEntry
+    'decode': decode_UHFC1G2RFModeTableEntry,
+    'decode_from': decode_UHFC1G2RFModeTableEntry_from,
 }
 
-def decode_RFSurveyFrequencyCapabilities(data):
-    logger.debug(func())
+def decode_RFSurveyFrequencyCapabilities_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
 
     if msgtype != Message_struct['RFSurveyFrequencyCapabilities']['type']:
-        return (None, data)
+        return (None, offset)
 
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
     (par['MinimumFrequency'],
-     par['MaximumFrequency']) = struct.unpack('!II', body)
+     par['MaximumFrequency']) = struct.unpack_from('!II', data, body)
+
+    return par, offset + length
 
-    return par, data[length : ]
+decode_RFSurveyFrequencyCapabilities = \
+        slice_decoder(decode_RFSurveyFrequencyCapabilities_from)
 
 Message_struct['RFSurveyFrequencyCapabilities'] = {
     'type': 365,
@@ -1061,24 +1094,24 @@ Message_struct['RFSurveyFrequencyCapabilities'] = {
         'MinimumFrequency',
         'MaximumFrequency'
     ],
-    'decode': decode_RFSurveyFrequencyCapabilities
+    'decode': decode_RFSurveyFrequencyCapabilities,
+    'decode_from': decode_RFSurveyFrequencyCapabilities_from,
 }
 
 # 16.2.3.2 LLRPCapabilities Parameter
-def decode_LLRPCapabilities(data):
-    logger.debug(func())
+def decode_LLRPCapabilities_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['LLRPCapabilities']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
     (flags,
@@ -1088,7 +1121,8 @@ def decode_LLRPCapabilities(data):
      par['MaxNumSpecsPerROSpec'],
      par['MaxNumInventoryParametersSpecsPerAISpec'],
      par['MaxNumAccessSpec'],
-     par['MaxNumOpSpecsPerAccessSpec']) = struct.unpack('!BBHIIIII', body)
+     par['MaxNumOpSpecsPerAccessSpec']) = struct.unpack_from('!BBHIIIII',
+                                                             data, body)
 
     par['CanDoRFSurvey'] = (flags & BIT(7) == BIT(7))
     par['CanReportBufferFillWarning'] = (flags & BIT(6) == BIT(6))
@@ -1097,7 +1131,9 @@ def decode_LLRPCapabilities(data):
                     (flags & BIT(4) == BIT(4))
     par['SupportsEventAndReportHolding'] = (flags & BIT(3) == BIT(3))
 
-    return par, data[length : ]
+    return par, offset + length
+
+decode_LLRPCapabilities = slice_decoder(decode_LLRPCapabilities_from)
 
 Message_struct['LLRPCapabilities'] = {
     'type': 142,
@@ -1116,24 +1152,25 @@ Message_struct['LLRPCapabilities'] = {
         'MaxNumAccessSpec',
         'MaxNumOpSpecsPerAccessSpec'
     ],
-    'decode': decode_LLRPCapabilities
+    'decode': decode_LLRPCapabilities,
+    'decode_from': decode_LLRPCapabilities_from,
 }
 
 # 16.2.3.2 GeneralDeviceCapabilities Parameter
-def decode_GeneralDeviceCapabilities(data):
-    logger.debug(func())
+def decode_GeneralDeviceCapabilities_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['GeneralDeviceCapabilities']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt = '!HHIIH'
     fmt_len = struct.calcsize(fmt)
@@ -1142,36 +1179,41 @@ def decode_GeneralDeviceCapabilities(data):
      flags,
      par['DeviceManufacturerName'],
      par['ModelName'],
-     par['FirmwareVersionByteCount']) = struct.unpack(fmt, body[:fmt_len])
+     par['FirmwareVersionByteCount']) = struct.unpack_from(fmt, data, body)
 
     par['CanSetAntennaProperties'] = (flags & BIT(15) == BIT(15))
     par['HasUTCClockCapability'] = (flags & BIT(14) == BIT(14))
 
-    pastVer = fmt_len + par['FirmwareVersionByteCount']
-    par['ReaderFirmwareVersion'] = body[fmt_len : pastVer]
-    body = body[pastVer : ]
-    ret, body = decode('ReceiveSensitivityTableEntry')(body)
+    body += fmt_len
+    pastVer = body + par['FirmwareVersionByteCount']
+    par['ReaderFirmwareVersion'] = data[body : pastVer]
+    body = pastVer
+    ret, body = decode_ReceiveSensitivityTableEntry_from(data, body, body_end)
     if ret:
         par['ReceiveSensitivityTableEntry'] = ret
 
-    ret, body = decode('PerAntennaReceiveSensitivityRange')(body)
+    ret, body = decode_PerAntennaReceiveSensitivityRange_from(data, body,
+                                                              body_end)
     if ret:
         par['PerAntennaReceiveSensitivityRange'] = ret
 
-    ret, body = decode('GPIOCapabilities')(body)
+    ret, body = decode_GPIOCapabilities_from(data, body, body_end)
     if ret:
         par['GPIOCapabilities'] = ret
 
-    ret, body = decode('PerAntennaAirProtocol')(body)
+    ret, body = decode_PerAntennaAirProtocol_from(data, body, body_end)
     if ret:
         par['PerAntennaAirProtocol'] = ret
 
-    ret, body = decode('MaximumReceiveSensitivity')(body)
+    ret, body = decode_MaximumReceiveSensitivity_from(data, body, body_end)
     if ret:
         par['MaximumReceiveSensitivity'] = ret
 
 
-    return par, data[length : ]
+    return par, body_end
+
+decode_GeneralDeviceCapabilities = \
+        slice_decoder(decode_GeneralDeviceCapabilities_from)
 
 Message_struct['GeneralDeviceCapabilities'] = {
     'type': 137,
@@ -1190,55 +1232,19 @@ Message_struct['GeneralDeviceCapabilities'] = {
         'PerAntennaAirProtocol',
         'MaximumReceiveSensitivity'
     ],
-    'decode': decode_GeneralDeviceCapabilities
+    'decode': decode_GeneralDeviceCapabilities,
+    'decode_from': decode_GeneralDeviceCapabilities_from,
 }
 
-def decode_MaximumReceiveSensitivity(data):
-    logger.debug(func())
-    par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['MaximumReceiveSensitivity']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (par['MaximumSensitivityValue']) = struct.unpack('!H', body)
-
-    return par, data[length : ]
-
 Message_struct['MaximumReceiveSensitivity'] = {
     'type': 363,
     'fields': [
         'Type',
         'MaximumSensitivityValue'
     ],
-    'decode': decode_MaximumReceiveSensitivity
+    'schema': [('MaximumSensitivityValue', 'H')],
 }
 
-def decode_ReceiveSensitivityTableEntry(data):
-    logger.debug(func())
-    par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['ReceiveSensitivityTableEntry']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (par['Index'],
-     par['ReceiveSensitivityValue']) = struct.unpack('!HH', body)
-
-    return par, data[length : ]
-
 Message_struct['ReceiveSensitivityTableEntry'] = {
     'type': 139,
     'fields': [
@@ -1246,29 +1252,9 @@ Message_struct['ReceiveSensitivityTableEntry'] = {
         'Index',
         'ReceiveSensitivityValue'
     ],
-    'decode': decode_ReceiveSensitivityTableEntry
+    'schema': [('Index', 'H'), ('ReceiveSensitivityValue', 'H')],
 }
 
-def decode_PerAntennaReceiveSensitivityRange(data):
-    logger.debug(func())
-    par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['PerAntennaReceiveSensitivityRange']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (par['AntennaID'],
-     par['ReceiveSensitivityIndexMin'],
-     par['ReceiveSensitivityIndexMax']) = struct.unpack('!HHH', body)
-
-    return par, data[length : ]
-
 Message_struct['PerAntennaReceiveSensitivityRange'] = {
     'type': 149,
     'fields': [
@@ -1277,35 +1263,41 @@ Message_struct['PerAntennaReceiveSensitivityRange'] = {
         'ReceiveSensitivityIndexMin',
         'ReceiveSensitivityIndexMax'
     ],
-    'decode': decode_PerAntennaReceiveSensitivityRange
+    'schema': [
+        ('AntennaID', 'H'),
+        ('ReceiveSensitivityIndexMin', 'H'),
+        ('ReceiveSensitivityIndexMax', 'H'),
+    ],
 }
 
-def decode_PerAntennaAirProtocol(data):
-    logger.debug(func())
+def decode_PerAntennaAirProtocol_from(data, offset, end):
     par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    if offset >= end:
+        return None, offset
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['PerAntennaAirProtocol']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     fmt = '!HH'
     fmt_len = struct.calcsize(fmt)
 
     # Decode fields
     (par['AntennaID'],
-     par['NumProtocols']) = struct.unpack(fmt, body[:fmt_len])
-    body = body[fmt_len : ]
+     par['NumProtocols']) = struct.unpack_from(fmt, data, body)
+    body += fmt_len
     num = int(par['NumProtocols'])
     id_fmt = '!B'
     for i in xrange(num):
-        par['ProtocolID{}'.format(i+1)] = struct.unpack(id_fmt, body[i])[0]
+        par['ProtocolID{}'.format(i+1)] = \
+                struct.unpack_from(id_fmt, data, body + i)[0]
 
-    return par, data[length : ]
+    return par, offset + length
+
+decode_PerAntennaAirProtocol = slice_decoder(decode_PerAntennaAirProtocol_from)
 
 Message_struct['PerAntennaAirProtocol'] = {
     'type': 140,
@@ -1315,28 +1307,10 @@ Message_struct['PerAntennaAirProtocol'] = {
         'NumProtocols',
         'ProtocolIDs'
     ],
-    'decode': decode_PerAntennaAirProtocol
+    'decode': decode_PerAntennaAirProtocol,
+    'decode_from': decode_PerAntennaAirProtocol_from,
 }
 
-def decode_GPIOCapabilities(data):
-    logger.debug(func())
-    par = {}
-    if len(data) == 0:
-        return None, data
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['GPIOCapabilities']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (par['NumGPIs'],
-     par['NumGPIs']) = struct.unpack('!HH', body)
-
-    return par, data[length : ]
-
 Message_struct['GPIOCapabilities'] = {
     'type': 141,
     'fields': [
@@ -1344,13 +1318,14 @@ Message_struct['GPIOCapabilities'] = {
         'NumGPIs',
         'NumGPOs'
     ],
-    'decode': decode_GPIOCapabilities
+    'schema': [('NumGPIs', 'H'), ('NumGPOs', 'H')],
 }
 
 def decode_ErrorMessage(data):
     msg = LLRPMessageDict()
-    logger.debug(func())
-    ret, body = decode('LLRPStatus')(data)
+    if trace.enabled:
+        trace.event('decode', func())
+    ret, _ = decode_LLRPStatus_from(data, 0, len(data))
     if ret:
         msg['LLRPStatus'] = ret
     else:
@@ -1360,33 +1335,75 @@ def decode_ErrorMessage(data):
 Message_struct['ErrorMessage'] = {
     'type': 100,
     'fields': [
-        'Type',
-        'MessageLength',
-        'MessageID',
+        'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
     'decode': decode_ErrorMessage
 }
 
 # 16.2.4.1 ROSpec Parameter
-def encode_ROSpec(par):
-    msgtype = Message_struct['ROSpec']['type']
+def encode_ROSpec_into(par, buf):
+    if isinstance(par, EncodedSpec):
+        buf += par.buf
+        return
     msgid = par['ROSpecID'] & BITMASK(10)
     priority = par['Priority'] & BITMASK(7)
     state = ROSpecState_Name2Type[par['CurrentState']] & BITMASK(7)
 
-    msg_header = '!HHIBB'
-    msg_header_len = struct.calcsize(msg_header)
+    start = begin_par(buf, Message_struct['ROSpec']['type'])
+    buf += struct.pack('!IBB', msgid, priority, state)
+    encode_ROBoundarySpec_into(par['ROBoundarySpec'], buf)
+    encode_AISpec_into(par['AISpec'], buf)
+    encode_ROReportSpec_into(par['ROReportSpec'], buf)
+    end_par(buf, start)
+
+encode_ROSpec = buffer_encoder(encode_ROSpec_into)
+
+def decode_ROSpec_from(data, offset, end):
+    par = {}
+
+    if offset >= end:
+        return None, offset
+
+    msgtype, length = struct.unpack_from(par_header, data, offset)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['ROSpec']['type']:
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
+
+    # Decode fields
+    (par['ROSpecID'], par['Priority'], state) = struct.unpack_from('!IBB',
+            data, body)
+    par['CurrentState'] = ROSpecState_Type2Name.get(state, state)
+    body += 6
+
+    # Decode parameters
+    ret, body = decode_ROBoundarySpec_from(data, body, body_end)
+    if ret:
+        par['ROBoundarySpec'] = ret
+    else:
+        raise LLRPError('missing or invalid ROBoundarySpec parameter')
 
-    data = encode('ROBoundarySpec')(par['ROBoundarySpec'])
-    data += encode('AISpec')(par['AISpec'])
-    data += encode('ROReportSpec')(par['ROReportSpec'])
+    # XXX RFSurveySpec, LoopSpec and more than one AISpec
+    ret, body = decode_AISpec_from(data, body, body_end)
+    if ret:
+        par['AISpec'] = ret
 
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len,
-            msgid, priority, state) + data
+    ret, body = decode_ROReportSpec_from(data, body, body_end)
+    if ret:
+        par['ROReportSpec'] = ret
+
+    # Check the end of the message
+    if body < body_end:
+        raise LLRPError('junk at end of message: ' +
+                        bin2dump(data[body:body_end]))
 
-    return data
+    return par, body_end
+
+decode_ROSpec = slice_decoder(decode_ROSpec_from)
 
 Message_struct['ROSpec'] = {
     'type': 177,
@@ -1400,30 +1417,29 @@ Message_struct['ROSpec'] = {
         'RFSurveySpec',
         'ROReportSpec'
     ],
-    'encode': encode_ROSpec
+    'encode': encode_ROSpec,
+    'encode_into': encode_ROSpec_into,
+    'decode': decode_ROSpec,
+    'decode_from': decode_ROSpec_from,
 }
 
 # 17.2.5.1 AccessSpec
-def encode_AccessSpec (par):
-    msgtype = Message_struct['AccessSpec']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!I', int(par['AccessSpecID']))
-    data += struct.pack('!H', int(par['AntennaID']))
-    data += struct.pack('!B', par['ProtocolID'])
-    data += struct.pack('!B', par['C'] and (1<<7) or 0)
-    data += struct.pack('!I', par['ROSpecID'])
-
-    data += encode('AccessSpecStopTrigger')(par['AccessSpecStopTrigger'])
-    data += encode('AccessCommand')(par['AccessCommand'])
+def encode_AccessSpec_into (par, buf):
+    if isinstance(par, EncodedSpec):
+        buf += par.buf
+        return
+    start = begin_par(buf, Message_struct['AccessSpec']['type'])
+    buf += struct.pack('!IHBBI', int(par['AccessSpecID']),
+                       int(par['AntennaID']), par['ProtocolID'],
+                       par['C'] and (1<<7) or 0, par['ROSpecID'])
+
+    encode_AccessSpecStopTrigger_into(par['AccessSpecStopTrigger'], buf)
+    encode_AccessCommand_into(par['AccessCommand'], buf)
     if 'AccessReportSpec' in par:
-        data += encode('AccessReportSpec')(par['AccessReportSpec'])
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
+        encode_AccessReportSpec_into(par['AccessReportSpec'], buf)
+    end_par(buf, start)
 
-    return data
+encode_AccessSpec = buffer_encoder(encode_AccessSpec_into)
 
 # 17.2.5.1 AccessSpec
 Message_struct['AccessSpec'] = {
@@ -1439,28 +1455,22 @@ Message_struct['AccessSpec'] = {
         'AccessCommand',
         'AccessReportSpec'
     ],
-    'encode': encode_AccessSpec
+    'encode': encode_AccessSpec,
+    'encode_into': encode_AccessSpec_into,
 }
 
 # 17.1.21 ADD_ACCESSSPEC
-def encode_AddAccessSpec (msg):
-    return encode('AccessSpec')(msg['AccessSpec'])
-
 # 17.1.21 ADD_ACCESSSPEC
 Message_struct['ADD_ACCESSSPEC'] = {
     'type': 40,
     'fields': [
-        'Type',
+        'Ver', 'Type', 'ID',
         'AccessSpec',
     ],
-    'encode': encode_AddAccessSpec
+    'schema': [('AccessSpec', 'param', True)],
 }
 
 # 17.1.22 ADD_ACCESSSPEC_RESPONSE
-def decode_AddAccessSpecResponse (msg):
-    # just an LLRPStatus wrapper, same format as ADD_ROSPEC_RESPONSE
-    return decode_AddROSpecResponse(msg)
-
 # 17.1.22 ADD_ACCESSSPEC_RESPONSE
 Message_struct['ADD_ACCESSSPEC_RESPONSE'] = {
     'type': 50,
@@ -1468,13 +1478,10 @@ Message_struct['ADD_ACCESSSPEC_RESPONSE'] = {
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_AddAccessSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 17.1.23 DELETE_ACCESSSPEC
-def encode_DeleteAccessSpec (msg):
-    return struct.pack('!I', msg['AccessSpecID'])
-
 # 17.1.23 DELETE_ACCESSSPEC
 Message_struct['DELETE_ACCESSSPEC'] = {
     'type': 41,
@@ -1482,14 +1489,10 @@ Message_struct['DELETE_ACCESSSPEC'] = {
         'Ver', 'Type', 'ID',
         'AccessSpecID'
     ],
-    'encode': encode_DeleteAccessSpec
+    'schema': [('AccessSpecID', 'I')],
 }
 
 # 17.1.24 DELETE_ACCESSSPEC_RESPONSE
-def decode_DeleteAccessSpecResponse (msg):
-    # just an LLRPStatus wrapper, same format as ADD_ROSPEC_RESPONSE
-    return decode_DeleteROSpecResponse(msg)
-
 # 17.1.24 DELETE_ACCESSSPEC_RESPONSE
 Message_struct['DELETE_ACCESSSPEC_RESPONSE'] = {
     'type': 51,
@@ -1497,13 +1500,10 @@ Message_struct['DELETE_ACCESSSPEC_RESPONSE'] = {
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_DeleteAccessSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 17.1.25 ENABLE_ACCESSSPEC
-def encode_EnableAccessSpec (msg):
-    return struct.pack('!I', msg['AccessSpecID'])
-
 # 17.1.25 ENABLE_ACCESSSPEC
 Message_struct['ENABLE_ACCESSSPEC'] = {
     'type': 42,
@@ -1511,14 +1511,10 @@ Message_struct['ENABLE_ACCESSSPEC'] = {
         'Ver', 'Type', 'ID',
         'AccessSpecID'
     ],
-    'encode': encode_EnableAccessSpec
+    'schema': [('AccessSpecID', 'I')],
 }
 
 # 17.1.26 ENABLE_ACCESSSPEC_RESPONSE
-def decode_EnableAccessSpecResponse (msg):
-    # just an LLRPStatus wrapper, same format as ADD_ROSPEC_RESPONSE
-    return decode_EnableROSpecResponse(msg)
-
 # 17.1.26 ENABLE_ACCESSSPEC_RESPONSE
 Message_struct['ENABLE_ACCESSSPEC_RESPONSE'] = {
     'type': 52,
@@ -1526,13 +1522,10 @@ Message_struct['ENABLE_ACCESSSPEC_RESPONSE'] = {
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_EnableAccessSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
 # 17.1.27 DISABLE_ACCESSSPEC
-def encode_DisableAccessSpec (msg):
-    return struct.pack('!I', msg['AccessSpecID'])
-
 # 17.1.27 DISABLE_ACCESSSPEC
 Message_struct['DISABLE_ACCESSSPEC'] = {
     'type': 43,
@@ -1540,14 +1533,10 @@ Message_struct['DISABLE_ACCESSSPEC'] = {
         'Ver', 'Type', 'ID',
         'AccessSpecID'
     ],
-    'encode': encode_DisableAccessSpec
+    'schema': [('AccessSpecID', 'I')],
 }
 
 # 17.1.28 DISABLE_ACCESSSPEC_RESPONSE
-def decode_DisableAccessSpecResponse (msg):
-    # just an LLRPStatus wrapper, same format as ADD_ROSPEC_RESPONSE
-    return decode_DisableROSpecResponse(msg)
-
 # 17.1.28 DISABLE_ACCESSSPEC_RESPONSE
 Message_struct['DISABLE_ACCESSSPEC_RESPONSE'] = {
     'type': 53,
@@ -1555,22 +1544,9 @@ Message_struct['DISABLE_ACCESSSPEC_RESPONSE'] = {
         'Ver', 'Type', 'ID',
         'LLRPStatus'
     ],
-    'decode': decode_DisableAccessSpecResponse
+    'schema': [('LLRPStatus', 'param', True)],
 }
 
-def encode_AccessSpecStopTrigger (par):
-    msgtype = Message_struct['AccessSpecStopTrigger']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!B', int(par['AccessSpecStopTriggerType']))
-    data += struct.pack('!H', int(par['OperationCountValue']))
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-
-    return data
-
 Message_struct['AccessSpecStopTrigger'] = {
     'type': 208,
     'fields': [
@@ -1578,28 +1554,26 @@ Message_struct['AccessSpecStopTrigger'] = {
         'AccessSpecStopTriggerType',
         'OperationCountValue'
     ],
-    'encode': encode_AccessSpecStopTrigger
+    'schema': [
+        ('AccessSpecStopTriggerType', 'B'),
+        ('OperationCountValue', 'H'),
+    ],
 }
 
-def encode_AccessCommand (par):
-    msgtype = Message_struct['AccessCommand']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = encode_C1G2TagSpec(par['TagSpecParameter'])
+def encode_AccessCommand_into (par, buf):
+    start = begin_par(buf, Message_struct['AccessCommand']['type'])
+    encode_C1G2TagSpec_into(par['TagSpecParameter'], buf)
 
     if 'WriteData' in par['OpSpecParameter']:
         if par['OpSpecParameter']['WriteDataWordCount'] > 1:
-            data += encode_C1G2BlockWrite(par['OpSpecParameter'])
+            encode_C1G2BlockWrite_into(par['OpSpecParameter'], buf)
         else:
-            data += encode_C1G2Write(par['OpSpecParameter'])
+            encode_C1G2Write_into(par['OpSpecParameter'], buf)
     else:
-        data += encode_C1G2Read(par['OpSpecParameter'])
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
+        encode_C1G2Read_into(par['OpSpecParameter'], buf)
+    end_par(buf, start)
 
-    return data
+encode_AccessCommand = buffer_encoder(encode_AccessCommand_into)
 
 Message_struct['AccessCommand'] = {
     'type': 209,
@@ -1608,23 +1582,20 @@ Message_struct['AccessCommand'] = {
         'TagSpecParameter',
         'OpSpecParameter'
     ],
-    'encode': encode_AccessCommand
+    'encode': encode_AccessCommand,
+    'encode_into': encode_AccessCommand_into,
 }
 
-def encode_C1G2TagSpec (par):
-    msgtype = Message_struct['C1G2TagSpec']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
+def encode_C1G2TagSpec_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2TagSpec']['type'])
     targets = par['C1G2TargetTag']
-    if type(targets) != ListType:
+    if not isinstance(targets, list):
         targets = (targets,)
     for target in targets:
-        data = encode_C1G2TargetTag(target)
+        encode_C1G2TargetTag_into(target, buf)
+    end_par(buf, start)
 
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-    return data
+encode_C1G2TagSpec = buffer_encoder(encode_C1G2TagSpec_into)
 
 Message_struct['C1G2TagSpec'] = {
     'type': 338,
@@ -1632,7 +1603,8 @@ Message_struct['C1G2TagSpec'] = {
         'Type',
         'C1G2TargetTag'
     ],
-    'encode': encode_C1G2TagSpec
+    'encode': encode_C1G2TagSpec,
+    'encode_into': encode_C1G2TagSpec_into,
 }
 
 def encode_bitstring (bstr, length_bytes):
@@ -1642,27 +1614,22 @@ def encode_bitstring (bstr, length_bytes):
     Bs += ['\x00'] * (length_bytes - len(bstr))
     return ''.join(Bs)
 
-def encode_C1G2TargetTag (par):
-    msgtype = Message_struct['C1G2TargetTag']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!B', ((int(par['MB']) << 6) | \
-                (par['M'] and (1<<5) or 0)))
-    data += struct.pack('!H', int(par['Pointer']))
-    data += struct.pack('!H', int(par['MaskBitCount']))
+def encode_C1G2TargetTag_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2TargetTag']['type'])
+    buf += struct.pack('!BHH', ((int(par['MB']) << 6) | \
+                (par['M'] and (1<<5) or 0)),
+                int(par['Pointer']), int(par['MaskBitCount']))
     if int(par['MaskBitCount']):
         numBytes = ((par['MaskBitCount'] - 1) / 8) + 1
-        data += encode_bitstring(par['TagMask'], numBytes)
+        buf += encode_bitstring(par['TagMask'], numBytes)
 
-    data += struct.pack('!H', int(par['DataBitCount']))
+    buf += struct.pack('!H', int(par['DataBitCount']))
     if int(par['DataBitCount']):
         numBytes = ((par['DataBitCount'] - 1) / 8) + 1
-        data += encode_bitstring(par['TagData'], numBytes)
+        buf += encode_bitstring(par['TagData'], numBytes)
+    end_par(buf, start)
 
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-    return data
+encode_C1G2TargetTag = buffer_encoder(encode_C1G2TargetTag_into)
 
 Message_struct['C1G2TargetTag'] = {
     'type': 339,
@@ -1676,23 +1643,19 @@ Message_struct['C1G2TargetTag'] = {
         'DataBitCount',
         'TagData'
     ],
-    'encode': encode_C1G2TargetTag
+    'encode': encode_C1G2TargetTag,
+    'encode_into': encode_C1G2TargetTag_into,
 }
 
 # 16.2.1.3.2.2 C1G2Read
-def encode_C1G2Read (par):
-    msgtype = Message_struct['C1G2Read']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-    data = struct.pack('!H', int(par['OpSpecID']))
-    data += struct.pack('!I', int(par['AccessPassword']))
-    data += struct.pack('!B', int(par['MB']) << 6)
-    data += struct.pack('!H', int(par['WordPtr']))
-    data += struct.pack('!H', int(par['WordCount']))
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-    return data
+def encode_C1G2Read_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2Read']['type'])
+    buf += struct.pack('!HIBHH', int(par['OpSpecID']),
+                       int(par['AccessPassword']), int(par['MB']) << 6,
+                       int(par['WordPtr']), int(par['WordCount']))
+    end_par(buf, start)
+
+encode_C1G2Read = buffer_encoder(encode_C1G2Read_into)
 
 Message_struct['C1G2Read'] = {
     'type': 341,
@@ -1704,25 +1667,20 @@ Message_struct['C1G2Read'] = {
         'WordCount',
         'AccessPassword'
     ],
-    'encode': encode_C1G2Read
+    'encode': encode_C1G2Read,
+    'encode_into': encode_C1G2Read_into,
 }
 
 # 16.2.1.3.2.3 C1G2Write
-def encode_C1G2Write (par):
-    msgtype = Message_struct['C1G2Write']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!H', int(par['OpSpecID']))
-    data += struct.pack('!I', int(par['AccessPassword']))
-    data += struct.pack('!B', int(par['MB']) << 6)
-    data += struct.pack('!H', int(par['WordPtr']))
-    data += struct.pack('!H', int(par['WriteDataWordCount']))
-    data += par['WriteData']
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-    return data
+def encode_C1G2Write_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2Write']['type'])
+    buf += struct.pack('!HIBHH', int(par['OpSpecID']),
+                       int(par['AccessPassword']), int(par['MB']) << 6,
+                       int(par['WordPtr']), int(par['WriteDataWordCount']))
+    buf += par['WriteData']
+    end_par(buf, start)
+
+encode_C1G2Write = buffer_encoder(encode_C1G2Write_into)
 
 Message_struct['C1G2Write'] = {
     'type': 342,
@@ -1735,25 +1693,20 @@ Message_struct['C1G2Write'] = {
         'WriteDataWordCount',
         'WriteData'
     ],
-    'encode': encode_C1G2Write
+    'encode': encode_C1G2Write,
+    'encode_into': encode_C1G2Write_into,
 }
 
 # 16.2.1.3.2.7 C1G2BlockWrite
-def encode_C1G2BlockWrite (par):
-    msgtype = Message_struct['C1G2BlockWrite']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!H', int(par['OpSpecID']))
-    data += struct.pack('!I', int(par['AccessPassword']))
-    data += struct.pack('!B', int(par['MB']) << 6)
-    data += struct.pack('!H', int(par['WordPtr']))
-    data += struct.pack('!H', int(par['WriteDataWordCount']))
-    data += par['WriteData']
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-    return data
+def encode_C1G2BlockWrite_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2BlockWrite']['type'])
+    buf += struct.pack('!HIBHH', int(par['OpSpecID']),
+                       int(par['AccessPassword']), int(par['MB']) << 6,
+                       int(par['WordPtr']), int(par['WriteDataWordCount']))
+    buf += par['WriteData']
+    end_par(buf, start)
+
+encode_C1G2BlockWrite = buffer_encoder(encode_C1G2BlockWrite_into)
 
 Message_struct['C1G2BlockWrite'] = {
     'type': 347,
@@ -1766,45 +1719,20 @@ Message_struct['C1G2BlockWrite'] = {
         'WriteDataWordCount',
         'WriteData'
     ],
-    'encode': encode_C1G2Write
+    'encode': encode_C1G2BlockWrite,
+    'encode_into': encode_C1G2BlockWrite_into,
 }
 
-def encode_AccessReportSpec (par):
-    msgtype = Message_struct['AccessReportSpec']['type']
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!B', par['AccessReportTrigger'])
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-
-    return data
-
 Message_struct['AccessReportSpec'] = {
     'type': 239,
     'fields': [
         'Type',
         'AccessReportTrigger'
     ],
-    'encode': encode_AccessReportSpec
+    'schema': [('AccessReportTrigger', 'B')],
 }
 
 # 16.2.4.1.1 ROBoundarySpec Parameter
-def encode_ROBoundarySpec(par):
-    msgtype = Message_struct['ROBoundarySpec']['type']
-
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = encode('ROSpecStartTrigger')(par['ROSpecStartTrigger'])
-    data += encode('ROSpecStopTrigger')(par['ROSpecStopTrigger'])
-
-    data = struct.pack(msg_header, msgtype,
-                                len(data) + msg_header_len) + data
-
-    return data
-
 Message_struct['ROBoundarySpec'] = {
     'type': 178,
     'fields': [
@@ -1812,24 +1740,13 @@ Message_struct['ROBoundarySpec'] = {
         'ROSpecStartTrigger',
         'ROSpecStopTrigger'
     ],
-    'encode': encode_ROBoundarySpec
+    'schema': [
+        ('ROSpecStartTrigger', 'param', True),
+        ('ROSpecStopTrigger', 'param', True),
+    ],
 }
 
 # 16.2.4.1.1.1 ROSpecStartTrigger Parameter
-def encode_ROSpecStartTrigger(par):
-    msgtype = Message_struct['ROSpecStartTrigger']['type']
-    t_type = StartTrigger_Name2Type[par['ROSpecStartTriggerType']]
-
-    msg_header = '!HHB'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = ''
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len, t_type) + data
-
-    return data
-
 Message_struct['ROSpecStartTrigger'] = {
     'type': 179,
     'fields': [
@@ -1838,26 +1755,10 @@ Message_struct['ROSpecStartTrigger'] = {
         'PeriodicTriggerValue',
         'GPITriggerValue'
     ],
-    'encode': encode_ROSpecStartTrigger
+    'schema': [('ROSpecStartTriggerType', 'B', StartTrigger_Type2Name)],
 }
 
 # 16.2.4.1.1.2 ROSpecStopTrigger Parameter
-def encode_ROSpecStopTrigger(par):
-    msgtype = Message_struct['ROSpecStopTrigger']['type']
-    t_type = StopTrigger_Name2Type[par['ROSpecStopTriggerType']]
-    duration = par['DurationTriggerValue']
-
-    msg_header = '!HHBI'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = ''
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len,
-            t_type, duration) + data
-
-    return data
-
 Message_struct['ROSpecStopTrigger'] = {
     'type': 182,
     'fields': [
@@ -1866,33 +1767,74 @@ Message_struct['ROSpecStopTrigger'] = {
         'DurationTriggerValue',
         'GPITriggerValue'
     ],
-    'encode': encode_ROSpecStopTrigger
+    'schema': [
+        ('ROSpecStopTriggerType', 'B', StopTrigger_Type2Name),
+        ('DurationTriggerValue', 'I'),
+    ],
 }
 
 # 16.2.4.2 AISpec Parameter
-def encode_AISpec(par):
-    msgtype = Message_struct['AISpec']['type']
-
-    msg_header = '!HHH'
-    msg_header_len = struct.calcsize(msg_header)
-    data = ''
-
+def encode_AISpec_into(par, buf):
     antid = par['AntennaIDs']
     antennas = []
     if type(antid) is str:
         antennas = antid.split()
     else:
         antennas.extend(antid)
-    for a in antennas:
-        data += struct.pack('!H', int(a))
 
-    data += encode('AISpecStopTrigger')(par['AISpecStopTrigger'])
-    data += encode('InventoryParameterSpec')(par['InventoryParameterSpec'])
+    start = begin_par(buf, Message_struct['AISpec']['type'])
+    buf += struct.pack('!H{}H'.format(len(antennas)), len(antennas),
+                       *map(int, antennas))
+    encode_AISpecStopTrigger_into(par['AISpecStopTrigger'], buf)
+    encode_InventoryParameterSpec_into(par['InventoryParameterSpec'], buf)
+    end_par(buf, start)
+
+encode_AISpec = buffer_encoder(encode_AISpec_into)
 
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len, len(antennas)) + data
+def decode_AISpec_from(data, offset, end):
+    par = {}
+
+    if offset >= end:
+        return None, offset
 
-    return data
+    msgtype, length = struct.unpack_from(par_header, data, offset)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['AISpec']['type']:
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
+
+    # Decode fields
+    (count, ) = struct.unpack_from('!H', data, body)
+    body += 2
+    par['AntennaIDs'] = list(struct.unpack_from('!{}H'.format(count), data,
+                                                body))
+    body += 2 * count
+
+    # Decode parameters
+    ret, body = decode_AISpecStopTrigger_from(data, body, body_end)
+    if ret:
+        par['AISpecStopTrigger'] = ret
+    else:
+        raise LLRPError('missing or invalid AISpecStopTrigger parameter')
+
+    # XXX more than one InventoryParameterSpec
+    ret, body = decode_InventoryParameterSpec_from(data, body, body_end)
+    if ret:
+        par['InventoryParameterSpec'] = ret
+    else:
+        raise LLRPError('missing or invalid InventoryParameterSpec parameter')
+
+    # Check the end of the message
+    if body < body_end:
+        raise LLRPError('junk at end of message: ' +
+                        bin2dump(data[body:body_end]))
+
+    return par, body_end
+
+decode_AISpec = slice_decoder(decode_AISpec_from)
 
 Message_struct['AISpec'] = {
     'type': 183,
@@ -1903,26 +1845,13 @@ Message_struct['AISpec'] = {
         'AISpecStopTrigger',
         'InventoryParameterSpec'
     ],
-    'encode': encode_AISpec
+    'encode': encode_AISpec,
+    'encode_into': encode_AISpec_into,
+    'decode': decode_AISpec,
+    'decode_from': decode_AISpec_from,
 }
 
 # 16.2.4.2.1 AISpecStopTrigger Parameter
-def encode_AISpecStopTrigger(par):
-    msgtype = Message_struct['AISpecStopTrigger']['type']
-    t_type = StopTrigger_Name2Type[par['AISpecStopTriggerType']]
-    duration = int(par['DurationTriggerValue'])
-
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = struct.pack('!B', t_type)
-    data += struct.pack('!I', int(duration))
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len) + data
-
-    return data
-
 Message_struct['AISpecStopTrigger'] = {
     'type': 184,
     'fields': [
@@ -1932,27 +1861,13 @@ Message_struct['AISpecStopTrigger'] = {
         'GPITriggerValue',
         'TagObservationTrigger'
     ],
-    'encode': encode_AISpecStopTrigger
+    'schema': [
+        ('AISpecStopTriggerType', 'B', StopTrigger_Type2Name),
+        ('DurationTriggerValue', 'I'),
+    ],
 }
 
 # 16.2.4.2.2 InventoryParameterSpec Parameter
-def encode_InventoryParameterSpec(par):
-    msgtype = Message_struct['InventoryParameterSpec']['type']
-
-    msg_header = '!HH'
-    msg_header_len = struct.calcsize(msg_header)
-    data = struct.pack('!H', par['InventoryParameterSpecID'])
-    data += struct.pack('!B', par['ProtocolID'])
-
-    for antconf in par['AntennaConfiguration']:
-        logger.debug('encoding AntennaConfiguration: %s', antconf)
-        data += encode('AntennaConfiguration')(antconf)
-
-    data = struct.pack(msg_header, msgtype,
-            struct.calcsize(msg_header) + len(data)) + data
-
-    return data
-
 Message_struct['InventoryParameterSpec'] = {
     'type': 186,
     'fields': [
@@ -1961,24 +1876,28 @@ Message_struct['InventoryParameterSpec'] = {
         'ProtocolID',
         'AntennaConfiguration'
     ],
-    'encode': encode_InventoryParameterSpec
+    'schema': [
+        ('InventoryParameterSpecID', 'H'),
+        ('ProtocolID', 'B'),
+        ('AntennaConfiguration', 'params'),
+    ],
 }
 
-# 16.2.6.6 AntennaConfiguration Parameter
-def encode_AntennaConfiguration(par):
-    msgtype = Message_struct['AntennaConfiguration']['type']
-    msg_header = '!HH'
-    data = struct.pack('!H', int(par['AntennaID']))
-    if 'RFReceiver' in par:
-        data += encode('RFReceiver')(par['RFReceiver'])
-    if 'RFTransmitter' in par:
-        data += encode('RFTransmitter')(par['RFTransmitter'])
-    if 'C1G2InventoryCommand' in par:
-        data += encode('C1G2InventoryCommand')(par['C1G2InventoryCommand'])
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
+# 16.2.6.4 KeepaliveSpec Parameter
+Message_struct['KeepaliveSpec'] = {
+    'type': 220,
+    'fields': [
+        'Type',
+        'KeepaliveTriggerType',
+        'PeriodicTriggerValue'
+    ],
+    'schema': [
+        ('KeepaliveTriggerType', 'B', KeepaliveTrigger_Type2Name),
+        ('PeriodicTriggerValue', 'I'),
+    ],
+}
 
+# 16.2.6.6 AntennaConfiguration Parameter
 Message_struct['AntennaConfiguration'] = {
     'type': 222,
     'fields': [
@@ -1990,38 +1909,25 @@ Message_struct['AntennaConfiguration'] = {
         # C1G2InventoryCommand?
         'C1G2InventoryCommand'
     ],
-    'encode': encode_AntennaConfiguration
+    'schema': [
+        ('AntennaID', 'H'),
+        ('RFReceiver', 'param'),
+        ('RFTransmitter', 'param'),
+        ('C1G2InventoryCommand', 'param'),
+    ],
 }
 
 # 16.2.6.7 RFReceiver Parameter
-def encode_RFReceiver (par):
-    msgtype = Message_struct['RFReceiver']['type']
-    msg_header = '!HH'
-    data = struct.pack('!H', par['ReceiverSensitivity'])
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
-
 Message_struct['RFReceiver'] = {
     'type': 223,
     'fields': [
         'Type',
         'ReceiverSensitivity',
     ],
-    'encode': encode_RFReceiver
+    'schema': [('ReceiverSensitivity', 'H')],
 }
 
 # 16.2.6.8 RFTransmitter Parameter
-def encode_RFTransmitter (par):
-    msgtype = Message_struct['RFTransmitter']['type']
-    msg_header = '!HH'
-    data = struct.pack('!H', par['HopTableId'])
-    data += struct.pack('!H', par['ChannelIndex'])
-    data += struct.pack('!H', par['TransmitPower'])
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
-
 Message_struct['RFTransmitter'] = {
     'type': 224,
     'fields': [
@@ -2030,25 +1936,67 @@ Message_struct['RFTransmitter'] = {
         'ChannelIndex',
         'TransmitPower',
     ],
-    'encode': encode_RFTransmitter
+    'schema': [
+        ('HopTableId', 'H'),
+        ('ChannelIndex', 'H'),
+        ('TransmitPower', 'H'),
+    ],
 }
 
 # 16.3.1.2.1 C1G2InventoryCommand Parameter
-def encode_C1G2InventoryCommand (par):
-    msgtype = Message_struct['C1G2InventoryCommand']['type']
-    msg_header = '!HH'
-    data = struct.pack('!B', (par['TagInventoryStateAware'] and 1 or 0) << 7)
+def encode_C1G2InventoryCommand_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2InventoryCommand']['type'])
+    buf += struct.pack('!B', (par['TagInventoryStateAware'] and 1 or 0) << 7)
     if 'C1G2Filter' in par:
-        data += encode('C1G2Filter')(par['C1G2Filter'])
+        buf += encode_C1G2Filter(par['C1G2Filter'])
     if 'C1G2RFControl' in par:
-        data += encode('C1G2RFControl')(par['C1G2RFControl'])
+        encode_C1G2RFControl_into(par['C1G2RFControl'], buf)
     if 'C1G2SingulationControl' in par:
-        data += encode('C1G2SingulationControl')(par['C1G2SingulationControl'])
+        encode_C1G2SingulationControl_into(par['C1G2SingulationControl'],
+                                           buf)
     # XXX custom parameters
+    end_par(buf, start)
+
+encode_C1G2InventoryCommand = buffer_encoder(encode_C1G2InventoryCommand_into)
+
+def decode_C1G2InventoryCommand_from (data, offset, end):
+    par = {}
+
+    if offset >= end:
+        return None, offset
 
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
+    msgtype, length = struct.unpack_from(par_header, data, offset)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['C1G2InventoryCommand']['type']:
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
+
+    # Decode fields
+    (flags, ) = struct.unpack_from('!B', data, body)
+    par['TagInventoryStateAware'] = bool(flags >> 7)
+    body += 1
+
+    # Decode parameters
+    # XXX C1G2Filter, custom parameters
+    ret, body = decode_C1G2RFControl_from(data, body, body_end)
+    if ret:
+        par['C1G2RFControl'] = ret
+
+    ret, body = decode_C1G2SingulationControl_from(data, body, body_end)
+    if ret:
+        par['C1G2SingulationControl'] = ret
+
+    # Check the end of the message
+    if body < body_end:
+        raise LLRPError('junk at end of message: ' +
+                        bin2dump(data[body:body_end]))
+
+    return par, body_end
+
+decode_C1G2InventoryCommand = slice_decoder(decode_C1G2InventoryCommand_from)
 
 Message_struct['C1G2InventoryCommand'] = {
     'type': 330,
@@ -2059,7 +2007,10 @@ Message_struct['C1G2InventoryCommand'] = {
         'C1G2SingulationControl'
         # XXX custom parameters
     ],
-    'encode': encode_C1G2InventoryCommand
+    'encode': encode_C1G2InventoryCommand,
+    'encode_into': encode_C1G2InventoryCommand_into,
+    'decode': decode_C1G2InventoryCommand,
+    'decode_from': decode_C1G2InventoryCommand_from,
 }
 
 # 16.3.1.2.1.1 C1G2Filter Parameter
@@ -2073,38 +2024,49 @@ Message_struct['C1G2Filter'] = {
 }
 
 # 16.3.1.2.1.2 C1G2RFControl Parameter
-def encode_C1G2RFControl (par):
-# 'C1G2RFControl': {
-#     'ModeIndex': 1,
-#     'Tari': 0,
-# },
-    msgtype = Message_struct['C1G2RFControl']['type']
-    msg_header = '!HH'
-    data = struct.pack('!H', par['ModeIndex'])
-    data += struct.pack('!H', par['Tari'])
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
-
 Message_struct['C1G2RFControl'] = {
     'type': 335,
     'fields': [
         'ModeIndex',
         'Tari',
     ],
-    'encode': encode_C1G2RFControl
+    'schema': [('ModeIndex', 'H'), ('Tari', 'H')],
 }
 
 # 16.3.1.2.1.3 C1G2SingulationControl Parameter
-def encode_C1G2SingulationControl (par):
-    msgtype = Message_struct['C1G2SingulationControl']['type']
-    msg_header = '!HH'
-    data = struct.pack('!B', par['Session'] << 6)
-    data += struct.pack('!H', par['TagPopulation'])
-    data += struct.pack('!I', par['TagTransitTime'])
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
-    return data
+def encode_C1G2SingulationControl_into (par, buf):
+    start = begin_par(buf, Message_struct['C1G2SingulationControl']['type'])
+    buf += struct.pack('!BHI', par['Session'] << 6, par['TagPopulation'],
+                       par['TagTransitTime'])
+    end_par(buf, start)
+
+encode_C1G2SingulationControl = buffer_encoder(
+        encode_C1G2SingulationControl_into)
+
+def decode_C1G2SingulationControl_from (data, offset, end):
+    par = {}
+
+    if offset >= end:
+        return None, offset
+
+    msgtype, length = struct.unpack_from(par_header, data, offset)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['C1G2SingulationControl']['type']:
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
+
+    # Decode fields
+    (session, par['TagPopulation'], par['TagTransitTime']) = \
+            struct.unpack_from('!BHI', data, body)
+    par['Session'] = session >> 6
+
+    # XXX C1G2TagInventoryStateAwareSingulationAction
+    return par, offset + length
+
+decode_C1G2SingulationControl = slice_decoder(
+        decode_C1G2SingulationControl_from)
 
 Message_struct['C1G2SingulationControl'] = {
     'type': 336,
@@ -2113,26 +2075,13 @@ Message_struct['C1G2SingulationControl'] = {
         'TagPopulation',
         'TagTransitTime',
     ],
-    'encode': encode_C1G2SingulationControl
+    'encode': encode_C1G2SingulationControl,
+    'encode_into': encode_C1G2SingulationControl_into,
+    'decode': decode_C1G2SingulationControl,
+    'decode_from': decode_C1G2SingulationControl_from,
 }
 
 # 16.2.7.1 ROReportSpec Parameter
-def encode_ROReportSpec (par):
-    msgtype = Message_struct['ROReportSpec']['type']
-    n = int(par['N'])
-    roReportTrigger = ROReportTrigger_Name2Type[par['ROReportTrigger']]
-
-    msg_header = '!HHBH'
-    msg_header_len = struct.calcsize(msg_header)
-
-    data = encode('TagReportContentSelector')(par['TagReportContentSelector'])
-
-    data = struct.pack(msg_header, msgtype,
-            len(data) + msg_header_len,
-            roReportTrigger, n) + data
-
-    return data
-
 Message_struct['ROReportSpec'] = {
     'type': 237,
     'fields': [
@@ -2140,15 +2089,15 @@ Message_struct['ROReportSpec'] = {
         'ROReportTrigger',
         'TagReportContentSelector'
     ],
-    'encode': encode_ROReportSpec
+    'schema': [
+        ('ROReportTrigger', 'B', ROReportTrigger_Type2Name),
+        ('N', 'H'),
+        ('TagReportContentSelector', 'param', True),
+    ],
 }
 
 # 16.2.7.1 TagReportContentSelector Parameter
-def encode_TagReportContentSelector (par):
-    msgtype = Message_struct['TagReportContentSelector']['type']
-
-    msg_header = '!HH'
-
+def encode_TagReportContentSelector_into (par, buf):
     flags = 0
     i = 15
     for field in Message_struct['TagReportContentSelector']['fields']:
@@ -2156,11 +2105,39 @@ def encode_TagReportContentSelector (par):
             flags = flags | (1 << i)
         i = i - 1
 
-    data = struct.pack('!H', flags)
-    data = struct.pack(msg_header, msgtype,
-            len(data) + struct.calcsize(msg_header)) + data
+    start = begin_par(buf, Message_struct['TagReportContentSelector']['type'])
+    buf += struct.pack('!H', flags)
+    end_par(buf, start)
 
-    return data
+encode_TagReportContentSelector = buffer_encoder(
+        encode_TagReportContentSelector_into)
+
+def decode_TagReportContentSelector_from (data, offset, end):
+    par = {}
+
+    if offset >= end:
+        return None, offset
+
+    msgtype, length = struct.unpack_from(par_header, data, offset)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['TagReportContentSelector']['type']:
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
+
+    # Decode fields
+    (flags, ) = struct.unpack_from('!H', data, body)
+    i = 15
+    for field in Message_struct['TagReportContentSelector']['fields']:
+        par[field] = bool(flags & (1 << i))
+        i = i - 1
+
+    # XXX AirProtocolEPCMemorySelector parameters
+    return par, offset + length
+
+decode_TagReportContentSelector = slice_decoder(
+        decode_TagReportContentSelector_from)
 
 Message_struct['TagReportContentSelector'] = {
     'type': 238,
@@ -2176,53 +2153,49 @@ Message_struct['TagReportContentSelector'] = {
         'EnableTagSeenCount',
         'EnableAccessSpecID'
     ],
-    'encode': encode_TagReportContentSelector
+    'encode': encode_TagReportContentSelector,
+    'encode_into': encode_TagReportContentSelector_into,
+    'decode': decode_TagReportContentSelector,
+    'decode_from': decode_TagReportContentSelector_from,
 }
 
 # 16.2.7.3 TagReportData Parameter
-def decode_TagReportData(data):
+def decode_TagReportData_from(data, offset, end):
     par = {}
-    logger.debug(func())
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['TagReportData']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
+        return (None, offset)
+    body = offset + par_header_len
+    body_end = offset + length
 
     # Decode parameters
-    ret, body = decode('EPCData')(body)
+    ret, body = decode_EPCData_from(data, body, body_end)
     if ret:
-        logger.debug("got EPCData; won't try EPC-96")
         par['EPCData'] = ret
     else:
-        logger.debug('failed to decode EPCData; trying EPC-96')
-        ret, body = decode('EPC-96')(body)
+        ret, body = decode_EPC96_from(data, body, body_end)
         if ret:
             par['EPC-96'] = ret['EPC']
-            logger.debug('EPC-96: %s', ret['EPC'])
         else:
             raise LLRPError('missing or invalid EPCData parameter')
 
     # grab TV-encoded parameters
-    while body:
-        ret, nbytes = llrp_decoder.decode_tve_parameter(body)
-        if ret:
-            par.update(ret)
-            body = body[nbytes:]
-        else:
-            break
+    body = llrp_decoder.decode_tve_run(data, body, par, body_end)
 
-    ret, body = decode_OpSpecResult(body)
+    ret, body = decode_OpSpecResult_from(data, body, body_end)
     if ret:
         par['OpSpecResult'] = ret
 
-    logger.debug('par=%s', par)
-    return par, data[length : ]
+    if trace.enabled:
+        trace.event('decode', func(), par=par)
+    return par, body_end
+
+decode_TagReportData = slice_decoder(decode_TagReportData_from)
 
 Message_struct['TagReportData'] = {
     'type': 240,
@@ -2245,19 +2218,176 @@ Message_struct['TagReportData'] = {
         'AccessSpecID',
         'OpSpecResult',
     ],
-    'decode': decode_TagReportData
-}
+    'decode': decode_TagReportData,
+    'decode_from': decode_TagReportData_from,
+}
+
+# TagReportContentSelector flags, paired with the TV-encoded parameter(s) each
+# one adds to a TagReportData parameter, in the order in which the reader
+# sends them.  Timestamps may arrive in either UTC or Uptime flavors.
+TagReportContentSelector_TVParams = (
+    ('EnableROSpecID', (9,)),
+    ('EnableSpecIndex', (14,)),
+    ('EnableInventoryParameterSpecID', (10,)),
+    ('EnableAntennaID', (1,)),
+    ('EnablePeakRRSI', (6,)),
+    ('EnableChannelIndex', (7,)),
+    ('EnableFirstSeenTimestamp', (2, 3)),
+    ('EnableLastSeenTimestamp', (4, 5)),
+    ('EnableTagSeenCount', (8,)),
+    ('EnableAccessSpecID', (16,)),
+)
+
+# TagReportData fields that are not TV-encoded, and so are not wrapped in a
+# tuple in decode_TagReportData's output
+TagRead_untupled = ('EPC-96', 'EPCData', 'OpSpecResult')
+
+class TagRead(object):
+    """Compact record for a single TagReportData parameter.
+
+    Holds the same fields as the dicts built by decode_TagReportData, as
+    attributes named after them ('EPC-96' becomes EPC96), but with the TV
+    parameters unwrapped from their 1-tuples: read.AntennaID == 1 rather than
+    par['AntennaID'] == (1,).  Fields the reader didn't send read as None.
+    to_dict() rebuilds the decode_TagReportData form."""
+
+    # TagReportData field name -> attribute name
+    attrs = {'EPC-96': 'EPC96'}
+    for name in Message_struct['TagReportData']['fields'][1:]:
+        attrs.setdefault(name, name)
+    for name, _ in llrp_decoder.tve_param_formats.values():
+        attrs.setdefault(name, name)
+    del name, _
+    __slots__ = tuple(sorted(attrs.values()))
+
+    def __init__(self, par=None):
+        if par:
+            for name, value in par.iteritems():
+                if name not in TagRead_untupled and len(value) == 1:
+                    value = value[0]
+                setattr(self, self.attrs[name], value)
+
+    def __getattr__(self, attr):
+        # only reached for slots that were never assigned
+        if attr in self.__slots__:
+            return None
+        raise AttributeError(attr)
+
+    def to_dict(self):
+        par = {}
+        for name, attr in self.attrs.iteritems():
+            value = getattr(self, attr)
+            if value is None:
+                continue
+            if name not in TagRead_untupled and not isinstance(value, tuple):
+                value = (value,)
+            par[name] = value
+        return par
+
+    def __eq__(self, other):
+        if not isinstance(other, TagRead):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr)
+                   for attr in self.__slots__)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __getstate__(self):
+        return dict((attr, getattr(self, attr)) for attr in self.__slots__
+                    if getattr(self, attr) is not None)
+
+    def __setstate__(self, state):
+        for attr, value in state.iteritems():
+            setattr(self, attr, value)
 
-def decode_OpSpecResult (data):
+    def __repr__(self):
+        return 'TagRead({})'.format(', '.join('{}={!r}'.format(attr, value)
+                for attr, value in sorted(self.__getstate__().items())))
+
+class TagReportDataDecoder(object):
+    """Decoder for TagReportData parameters laid out according to a known
+    TagReportContentSelector.
+
+    When the selector is known, every TagReportData carrying an EPC-96 has the
+    same fixed layout, which is unpacked with a single precompiled struct.
+    Anything that doesn't fit that layout (EPCData, OpSpecResults, unexpected
+    fields) is handed to decode_TagReportData.  Calling an instance is
+    equivalent to calling decode_TagReportData; decode_from is the
+    equivalent of decode_TagReportData_from.
+
+    If record_type is given (e.g., TagRead), tags are returned as instances of
+    it instead of dicts.  The record type is built with no arguments for the
+    fast path, or from the decode_TagReportData dict otherwise, and must map
+    field names to attribute names in its attrs dict."""
+
+    def __init__(self, tagReportContentSelector, record_type=None):
+        self.tagReportContentSelector = dict(tagReportContentSelector)
+        self.record_type = record_type
+        fmt = par_header + 'B12s'
+        choices = [(Message_struct['EPC-96']['type'],)]
+        for field, tv_types in TagReportContentSelector_TVParams:
+            if not tagReportContentSelector.get(field):
+                continue
+            fmt += 'B' + llrp_decoder.tve_param_formats[tv_types[0]][1][1:]
+            choices.append(tv_types)
+        self.struct = struct.Struct(fmt)
+
+        # map each acceptable sequence of TV header bytes to the names of the
+        # fields they introduce
+        self.layouts = {}
+        for tv_types in itertools.product(*choices):
+            headers = tuple(t | 0x80 for t in tv_types)
+            names = ['EPC-96'] + [llrp_decoder.tve_param_formats[t][0]
+                                  for t in tv_types[1:]]
+            if record_type is not None:
+                names = [record_type.attrs[name] for name in names]
+            self.layouts[headers] = tuple(names)
+
+    def decode_from(self, data, offset, end):
+        size = self.struct.size
+        if end - offset >= size:
+            fields = self.struct.unpack_from(data, offset)
+            names = self.layouts.get(fields[2::2])
+            if names is not None and fields[1] == size and \
+                    fields[0] & BITMASK(10) == \
+                    Message_struct['TagReportData']['type']:
+                values = fields[3::2]
+                if self.record_type is None:
+                    par = {'EPC-96': hexlify(values[0])}
+                    for i in xrange(1, len(names)):
+                        par[names[i]] = (values[i],)
+                else:
+                    par = self.record_type()
+                    setattr(par, names[0], hexlify(values[0]))
+                    for i in xrange(1, len(names)):
+                        setattr(par, names[i], values[i])
+                return par, offset + size
+        par, offset = decode_TagReportData_from(data, offset, end)
+        if par and self.record_type is not None:
+            par = self.record_type(par)
+        return par, offset
+
+    def __call__(self, data):
+        par, offset = self.decode_from(data, 0, len(data))
+        return par, data[offset:]
+
+    def __reduce__(self):
+        # Structs don't pickle; rebuild from the selector instead
+        return (TagReportDataDecoder,
+                (self.tagReportContentSelector, self.record_type))
+
+def decode_OpSpecResult_from (data, offset, end):
     # handle any of the C1G2*OpSpecResult types
     par = {}
-    logger.debug(func())
+    if trace.enabled:
+        trace.event('decode', func())
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     c1g2opspecresults = ('C1G2ReadOpSpecResult',
             'C1G2WriteOpSpecResult',
@@ -2270,31 +2400,33 @@ def decode_OpSpecResult (data):
             'C1G2GetBlockPermalockStatusOpSpecResult')
     ok_types = (Message_struct[x]['type'] for x in c1g2opspecresults)
     if msgtype not in ok_types:
-        return (None, data)
-    body = data[par_header_len : length]
+        return (None, offset)
+    body = offset + par_header_len
 
     # all OpSpecResults begin with Result and OpSpecID
-    par['Result'], par['OpSpecID'] = struct.unpack('!BH', body[:3])
-    body = body[3:]
+    par['Result'], par['OpSpecID'] = struct.unpack_from('!BH', data, body)
+    body += 3
 
     if msgtype == Message_struct['C1G2ReadOpSpecResult']['type']:
-        wordcnt = struct.unpack('!H', body[:2])[0]
+        wordcnt = struct.unpack_from('!H', data, body)[0]
         par['ReadDataWordCount'] = wordcnt
-        end = 2 + (wordcnt*2)
-        par['ReadData'] = body[2:end]
+        data_end = body + 2 + (wordcnt*2)
+        par['ReadData'] = data[body + 2:data_end]
 
     elif msgtype in (Message_struct['C1G2WriteOpSpecResult']['type'],
             Message_struct['C1G2BlockWriteOpSpecResult']['type']):
-        par['NumWordsWritten'] = struct.unpack('!H', body[:2])[0]
+        par['NumWordsWritten'] = struct.unpack_from('!H', data, body)[0]
 
     if msgtype == \
       Message_struct['C1G2GetBlockPermalockStatusOpSpecResult']['type']:
-        wordcnt = struct.unpack('!H', body[:2])[0]
+        wordcnt = struct.unpack_from('!H', data, body)[0]
         par['StatusWordCount'] = wordcnt
-        end = 2 + (wordcnt*2)
-        par['PermalockStatus'] = body[2:end]
+        data_end = body + 2 + (wordcnt*2)
+        par['PermalockStatus'] = data[body + 2:data_end]
 
-    return par, data[length:]
+    return par, offset + length
+
+decode_OpSpecResult = slice_decoder(decode_OpSpecResult_from)
 
 Message_struct['OpSpecResult'] = {
     'type': -1,
@@ -2320,7 +2452,8 @@ Message_struct['C1G2ReadOpSpecResult'] = {
         'ReadDataWordCount',
         'ReadData'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2WriteOpSpecResult'] = {
@@ -2331,7 +2464,8 @@ Message_struct['C1G2WriteOpSpecResult'] = {
         'OpSpecID',
         'NumWordsWritten'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2KillOpSpecResult'] = {
@@ -2341,7 +2475,8 @@ Message_struct['C1G2KillOpSpecResult'] = {
         'Result',
         'OpSpecID'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2RecommissionOpSpecResult'] = {
@@ -2351,7 +2486,8 @@ Message_struct['C1G2RecommissionOpSpecResult'] = {
         'Result',
         'OpSpecID'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2LockOpSpecResult'] = {
@@ -2361,7 +2497,8 @@ Message_struct['C1G2LockOpSpecResult'] = {
         'Result',
         'OpSpecID'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2BlockEraseOpSpecResult'] = {
@@ -2371,7 +2508,8 @@ Message_struct['C1G2BlockEraseOpSpecResult'] = {
         'Result',
         'OpSpecID'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2BlockWriteOpSpecResult'] = {
@@ -2382,7 +2520,8 @@ Message_struct['C1G2BlockWriteOpSpecResult'] = {
         'OpSpecID',
         'NumWordsWritten'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2BlockPermalockOpSpecResult'] = {
@@ -2392,7 +2531,8 @@ Message_struct['C1G2BlockPermalockOpSpecResult'] = {
         'Result',
         'OpSpecID'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 Message_struct['C1G2GetBlockPermalockStatusOpSpecResult'] = {
@@ -2404,30 +2544,32 @@ Message_struct['C1G2GetBlockPermalockStatusOpSpecResult'] = {
         'StatusWordCount',
         'PermalockStatus'
     ],
-    'decode': decode_OpSpecResult
+    'decode': decode_OpSpecResult,
+    'decode_from': decode_OpSpecResult_from,
 }
 
 # 16.2.7.3.1 EPCData Parameter
-def decode_EPCData(data):
+def decode_EPCData_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
     if msgtype != Message_struct['EPCData']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + par_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
-    (par['EPCLengthBits'], ) = struct.unpack('!H',
-                    body[0 : struct.calcsize('!H')])
-    par['EPC'] = body[struct.calcsize('!H') : ].encode('hex')
+    (par['EPCLengthBits'], ) = struct.unpack_from('!H', data, body)
+    par['EPC'] = hexlify(data[body + struct.calcsize('!H') : offset + length])
+
+    return par, offset + length
 
-    return par, data[length : ]
+decode_EPCData = slice_decoder(decode_EPCData_from)
 
 Message_struct['EPCData'] = {
     'type': 241,
@@ -2436,29 +2578,32 @@ Message_struct['EPCData'] = {
         'EPCLengthBits',
         'EPC'
     ],
-    'decode': decode_EPCData
+    'decode': decode_EPCData,
+    'decode_from': decode_EPCData_from,
 }
 
 # 16.2.7.3.2 EPC-96 Parameter
-def decode_EPC96(data):
+def decode_EPC96_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : tve_header_len]
-    (msgtype, ) = struct.unpack(tve_header, header)
+    (msgtype, ) = struct.unpack_from(tve_header, data, offset)
     msgtype = msgtype & BITMASK(7)
     if msgtype != Message_struct['EPC-96']['type']:
-        return (None, data)
+        return (None, offset)
     length = tve_header_len + (96 / 8)
-    body = data[tve_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    body = offset + tve_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
-    par['EPC'] = body.encode('hex')
+    par['EPC'] = hexlify(data[body : offset + length])
 
-    return par, data[length : ]
+    return par, offset + length
+
+decode_EPC96 = slice_decoder(decode_EPC96_from)
 
 Message_struct['EPC-96'] = {
     'type': 13,
@@ -2466,28 +2611,31 @@ Message_struct['EPC-96'] = {
         'Type',
         'EPC'
     ],
-    'decode': decode_EPC96
+    'decode': decode_EPC96,
+    'decode_from': decode_EPC96_from,
 }
 
 # 16.2.7.3.3 ROSpecID Parameter
-def decode_ROSpecID(data):
+def decode_ROSpecID_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : tve_header_len]
-    (msgtype, ), length = struct.unpack(tve_header, header), 1 + 4
+    (msgtype, ), length = struct.unpack_from(tve_header, data, offset), 1 + 4
     msgtype = msgtype & BITMASK(7)
     if msgtype != Message_struct['ROSpecID']['type']:
-        return (None, data)
-    body = data[tve_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+        return (None, offset)
+    body = offset + tve_header_len
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode fields
-    (par['ROSpecID'], ) = struct.unpack('!I', body)
+    (par['ROSpecID'], ) = struct.unpack_from('!I', data, body)
+
+    return par, offset + length
 
-    return par, data[length : ]
+decode_ROSpecID = slice_decoder(decode_ROSpecID_from)
 
 Message_struct['ROSpecID'] = {
     'type': 9,
@@ -2495,38 +2643,43 @@ Message_struct['ROSpecID'] = {
         'Type',
         'ROSpecID'
     ],
-    'decode': decode_ROSpecID
+    'decode': decode_ROSpecID,
+    'decode_from': decode_ROSpecID_from,
 }
 
 # 16.2.7.6 ReaderEventNotificationData Parameter
-def decode_ReaderEventNotificationData(data):
+def decode_ReaderEventNotificationData_from(data, offset, end):
     par = {}
 
-    if len(data) == 0:
-        return None, data
+    if offset >= end:
+        return None, offset
 
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
+    msgtype, length = struct.unpack_from(par_header, data, offset)
     msgtype = msgtype & BITMASK(10)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+    body = offset + par_header_len
+    body_end = offset + length
+    if trace.enabled:
+        trace.event('decode', func(), type=msgtype, length=length)
 
     # Decode parameters
-    ret, body = decode('UTCTimestamp')(body)
+    ret, body = decode_UTCTimestamp_from(data, body, body_end)
     if ret:
         par['UTCTimestamp'] = ret
     else:
         raise LLRPError('missing or invalid UTCTimestamp parameter')
 
-    ret, body = decode('ConnectionAttemptEvent')(body)
+    ret, body = decode_ConnectionAttemptEvent_from(data, body, body_end)
     if ret:
         par['ConnectionAttemptEvent'] = ret
 
-    ret, body = decode('AntennaEvent')(body)
+    ret, body = decode_AntennaEvent_from(data, body, body_end)
     if ret:
         par['AntennaEvent'] = ret
 
-    return par, body
+    return par, body_end
+
+decode_ReaderEventNotificationData = \
+        slice_decoder(decode_ReaderEventNotificationData_from)
 
 Message_struct['ReaderEventNotificationData'] = {
     'type': 246,
@@ -2544,32 +2697,11 @@ Message_struct['ReaderEventNotificationData'] = {
         'ConnectionAttemptEvent',
         'ConnectionCloseEvent'
     ],
-    'decode': decode_ReaderEventNotificationData
+    'decode': decode_ReaderEventNotificationData,
+    'decode_from': decode_ReaderEventNotificationData_from,
 }
 
 # 16.2.7.6.9 AntennaEvent Parameter
-def decode_AntennaEvent(data):
-    logger.debug(func())
-    par = {}
-
-    if len(data) == 0:
-        return None, data
-
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['AntennaEvent']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (event_type, antenna_id) = struct.unpack('!BH', body)
-    par['EventType'] = event_type and 'Connected' or 'Disconnected'
-    par['AntennaID'] = antenna_id
-
-    return par, data[length : ]
-
 Message_struct['AntennaEvent'] = {
     'type': 255,
     'fields': [
@@ -2577,88 +2709,23 @@ Message_struct['AntennaEvent'] = {
         'EventType',
         'AntennaID'
     ],
-    'decode': decode_AntennaEvent
+    'schema': [
+        ('EventType', 'B', AntennaEvent_Type2Name),
+        ('AntennaID', 'H'),
+    ],
 }
 
 # 16.2.7.6.10 ConnectionAttemptEvent Parameter
-def decode_ConnectionAttemptEvent(data):
-    logger.debug(func())
-    par = {}
-
-    if len(data) == 0:
-        return None, data
-
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['ConnectionAttemptEvent']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    (status, ) = struct.unpack('!H', body)
-    par['Status'] = ConnEvent_Type2Name[status]
-
-    return par, data[length : ]
-
 Message_struct['ConnectionAttemptEvent'] = {
     'type': 256,
     'fields': [
         'Type',
         'Status'
     ],
-    'decode': decode_ConnectionAttemptEvent
+    'schema': [('Status', 'H', ConnEvent_Type2Name)],
 }
 
 # 16.2.8.1 LLRPStatus Parameter
-def decode_LLRPStatus(data):
-    logger.debug(func())
-    par = {}
-    logger.debug('decode_LLRPStatus: %s', hexlify(data))
-
-    if len(data) == 0:
-        return None, data
-
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['LLRPStatus']['type']:
-        logger.debug('got msgtype={0}, expected {1}'.format(msgtype,
-                    Message_struct['LLRPStatus']['type']))
-        logger.debug('note length=%d', length)
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
-
-    # Decode fields
-    offset = struct.calcsize('!HH')
-    (code, n) = struct.unpack('!HH', body[ : offset])
-    try:
-        par['StatusCode'] = Error_Type2Name[code]
-    except KeyError:
-        logger.warning('Unknown field code %s', code)
-    par['ErrorDescription'] = body[offset : offset + n]
-
-    # Decode parameters
-    ret, body = decode('FieldError')(body[offset + n : ])
-    if ret:
-        par['FieldError'] = ret
-    else:
-        logging.debug('no FieldError')
-
-    ret, body = decode('ParameterError')(body)
-    if ret:
-        par['ParameterError'] = ret
-    else:
-        logging.debug('no ParameterError')
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return par, data[length : ]
-
 Message_struct['LLRPStatus'] = {
     'type':   287,
     'fields': [
@@ -2668,32 +2735,15 @@ Message_struct['LLRPStatus'] = {
         'FieldError',
         'ParameterError'
     ],
-    'decode': decode_LLRPStatus
+    'schema': [
+        ('StatusCode', 'H', Error_Type2Name),
+        ('ErrorDescription', 'v'),
+        ('FieldError', 'param'),
+        ('ParameterError', 'param'),
+    ],
 }
 
 # 16.2.8.1.1 FieldError Parameter
-def decode_FieldError(data):
-    logger.debug(func())
-    par = {}
-
-    if len(data) == 0:
-        return None, data
-
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['FieldError']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d data=%s)', func(), msgtype, length,
-            repr(body))
-
-    # Decode fields
-    offset = struct.calcsize('!H')
-    (par['FieldNum'], ) = struct.unpack('!H', body[ : offset])
-
-    return par, data[length : ]
-
 Message_struct['FieldError'] = {
     'type':   288,
     'fields': [
@@ -2701,46 +2751,10 @@ Message_struct['FieldError'] = {
         'ErrorCode',
         'FieldNum',
     ],
-    'decode': decode_FieldError
+    'schema': [('FieldNum', 'H'), ('ErrorCode', 'H')],
 }
 
 # 16.2.8.1.2 ParameterError Parameter
-def decode_ParameterError(data):
-    logger.debug(func())
-    par = {}
-
-    if len(data) == 0:
-        return None, data
-
-    header = data[0 : par_header_len]
-    msgtype, length = struct.unpack(par_header, header)
-    msgtype = msgtype & BITMASK(10)
-    if msgtype != Message_struct['ParameterError']['type']:
-        return (None, data)
-    body = data[par_header_len : length]
-    logger.debug('%s (type=%d len=%d data=%s)', func(), msgtype, length,
-            repr(body))
-
-    # Decode fields
-    offset = struct.calcsize('!HH')
-    (par['ParameterType'], par['ErrorCode']) = \
-            struct.unpack('!HH', body[ : offset])
-
-    # Decode parameters
-    ret, body = decode('FieldError')(body[offset : ])
-    if ret:
-        par['FieldError'] = ret
-
-    ret, body = decode('ParameterError')(body)
-    if ret:
-        par['ParameterError'] = ret
-
-    # Check the end of the message
-    if len(body) > 0:
-        raise LLRPError('junk at end of message: ' + bin2dump(body))
-
-    return par, data[length : ]
-
 Message_struct['ParameterError'] = {
     'type':   289,
     'fields': [
@@ -2750,7 +2764,12 @@ Message_struct['ParameterError'] = {
         'FieldError',
         'ParameterError'
     ],
-    'decode': decode_ParameterError
+    'schema': [
+        ('ParameterType', 'H'),
+        ('ErrorCode', 'H'),
+        ('FieldError', 'param'),
+        ('ParameterError', 'param'),
+    ],
 }
 
 #
@@ -2892,16 +2911,416 @@ class LLRPROSpec(dict):
     def __repr__(self):
         return llrp_data2xml(self)
 
+class EncodedSpec(object):
+    """A parameter such as a ROSpec or AccessSpec, encoded once so that the
+    same bytes can be sent again and again.
+
+    Use an EncodedSpec in place of the parameter dict in a message (e.g., as
+    the ROSpec of an ADD_ROSPEC) to send its bytes as they are.  par is a copy
+    of the dict it was encoded from; indexing an EncodedSpec reads from it.
+    replace() re-encodes a single nested parameter and patches the lengths of
+    the parameters around it, instead of re-encoding the whole tree."""
+
+    # bytes of fixed fields between a parameter's TLV header and its first
+    # nested parameter (AISpec's depend on its AntennaCount)
+    fixed_len = {
+        'ROSpec': 6,
+        'ROBoundarySpec': 0,
+        'InventoryParameterSpec': 3,
+        'AntennaConfiguration': 2,
+        'C1G2InventoryCommand': 1,
+        'ROReportSpec': 3,
+        'AccessSpec': 12,
+        'AccessCommand': 0,
+        'C1G2TagSpec': 0,
+    }
+
+    # dict keys that differ from the name of the parameter they hold
+    param_names = {
+        'TagSpecParameter': 'C1G2TagSpec',
+    }
+
+    def __init__(self, name, par):
+        self.name = name
+        self.par = copy.deepcopy(par)
+        self.buf = bytearray()
+        Message_struct[name]['encode_into'](self.par, self.buf)
+
+    def __getitem__(self, key):
+        return self.par[key]
+
+    def __len__(self):
+        return len(self.buf)
+
+    def __str__(self):
+        return str(self.buf)
+
+    def _body(self, name, start):
+        """Return the offset of the first nested parameter of the name
+        parameter at offset start."""
+        body = start + par_header_len
+        if name == 'AISpec':
+            (count,) = _u16_struct.unpack_from(self.buf, body)
+            return body + 2 + 2 * count
+        try:
+            return body + self.fixed_len[name]
+        except KeyError:
+            raise LLRPError('cannot find parameters nested in '
+                    '{}'.format(name))
+
+    def find(self, path):
+        """Return the offsets of the parameters along path, a sequence of
+        dict keys and list indices leading from par to a nested parameter
+        (e.g., ('AISpec', 'InventoryParameterSpec', 'AntennaConfiguration', 0,
+        'RFTransmitter')), followed by the offset just past the last one."""
+        path = list(path)
+        name = self.name
+        starts = [0]
+        while path:
+            key = path.pop(0)
+            index = 0
+            if path and isinstance(path[0], (int, long)):
+                index = path.pop(0)
+            child = self.param_names.get(key, key)
+            msgtype = Message_struct[child]['type']
+            start = starts[-1]
+            offset = self._body(name, start)
+            (length,) = _u16_struct.unpack_from(self.buf, start + 2)
+            end = start + length
+            while offset + par_header_len <= end:
+                ptype, plen = _par_header_struct.unpack_from(self.buf, offset)
+                if ptype & BITMASK(10) == msgtype:
+                    if index == 0:
+                        break
+                    index -= 1
+                offset += plen
+            else:
+                raise LLRPError('no {} in encoded {}'.format(child, name))
+            starts.append(offset)
+            name = child
+        (length,) = _u16_struct.unpack_from(self.buf, starts[-1] + 2)
+        return starts + [starts[-1] + length]
+
+    def replace(self, path, value):
+        """Replace the parameter at path (see find()) with value, in both par
+        and the encoded bytes."""
+        path = tuple(path)
+        offsets = self.find(path)
+        start, end = offsets[-2:]
+        name = [key for key in path if not isinstance(key, (int, long))][-1]
+        name = self.param_names.get(name, name)
+        data = bytearray()
+        Message_struct[name]['encode_into'](value, data)
+        self.buf[start:end] = data
+        delta = len(data) - (end - start)
+        if delta:
+            for outer in offsets[:-2]:
+                (length,) = _u16_struct.unpack_from(self.buf, outer + 2)
+                _u16_struct.pack_into(self.buf, outer + 2, length + delta)
+
+        parent = self.par
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = copy.deepcopy(value)
+
 class LLRPMessageDict(dict):
     def __repr__(self):
         return llrp_data2xml(self)
 
-# Reverse dictionary for Message_struct types
+# Reverse dictionary for message types; parameters are left out, since their
+# types are numbered separately (e.g., 13 is both SET_READER_CONFIG_RESPONSE
+# and EPC-96)
 Message_Type2Name = { }
 for m in Message_struct:
     if 'type' in Message_struct[m]:
+        if Message_struct[m]['fields'][:3] != ['Ver', 'Type', 'ID']:
+            continue
         i = Message_struct[m]['type']
         Message_Type2Name[i] = m
     else:
         logging.debug('Pseudo-warning: Message_struct type {} ' \
                 'lacks "type" field'.format(m))
+
+#
+# Schema-driven codecs
+#
+# A Message_struct entry may describe its wire layout in a 'schema': a list of
+# (name, kind[, extra]) items, in wire order, where kind is one of
+#
+#   - a struct format character ('B', 'H', 'I', 'Q', 'b', 'h', 'i', 'q') for
+#     a fixed-size field; extra, if present, is a {value: name} dictionary
+#     translating the field's values to names when decoding (and back when
+#     encoding)
+#   - 'v' for a byte string preceded by its 16-bit length
+#   - 'param' for a nested TLV parameter, which must be present if extra is
+#     True and is otherwise optional
+#   - 'params' for a (possibly empty) list of nested parameters of one type
+#
+# For each such entry, compile_codecs() generates straight-line encode_into
+# and decode functions (plus decode_from for parameters) and installs them,
+# and an encode wrapping encode_into, in the entry; entries with a schema have
+# no hand-written codecs.  The generated functions use precompiled structs and
+# call nested codecs directly, with no per-call Message_struct lookups.  A
+# nested codec that Message_struct doesn't define makes the corresponding
+# direction unavailable: e.g., the generated decoder of ADD_ACCESSSPEC would
+# need an AccessSpec decoder.  The codecs of parameters are also bound by
+# name (decode_*_from, decode_*, encode_*_into and encode_*), for the
+# hand-written codecs of enclosing parameters to call.
+#
+# Some entries are left hand-written because schemas can't describe them:
+#
+#   - RO_ACCESS_REPORT, TagReportData and the other reports, whose fields are
+#     TV-encoded and whose parameters are choices (EPCData or EPC-96, the
+#     OpSpecResults); llrp_decoder's TV decoder and TagReportDataDecoder
+#     decode them instead
+#   - ROSpec, AccessSpec and their bodies (AISpec, AccessCommand,
+#     C1G2InventoryCommand and so on), which pass EncodedSpecs through, pack
+#     bit flags and counted lists, and fill in defaults; they are encoded
+#     once per connection and cached, and only decoded by GET_ROSPECS
+#
+
+schema_int_kinds = 'BHIQbhiq'
+
+# whether generated decoders have trace points, as hand-written ones do
+# (sllurp.bench recompiles the codecs without them)
+trace_codecs = True
+
+def _schema_groups(schema):
+    """Split a schema into runs of fixed-size fields and single other
+    items."""
+    groups = []
+    for item in schema:
+        kind = item[1]
+        if kind in schema_int_kinds:
+            if groups and groups[-1][0] == 'fixed':
+                groups[-1][1].append(item)
+            else:
+                groups.append(('fixed', [item]))
+        elif kind in ('v', 'param', 'params'):
+            groups.append((kind, item))
+        else:
+            raise LLRPError('unknown schema item kind {}'.format(kind))
+    return groups
+
+def _schema_is_message(entry):
+    return entry['fields'][:3] == ['Ver', 'Type', 'ID']
+
+def _schema_decoder_source(fname, entry, ns):
+    """Return the source of a decoder named fname for a Message_struct entry,
+    adding the objects it refers to to the namespace ns."""
+    is_message = _schema_is_message(entry)
+    if is_message:
+        lines = ['def {}(data):'.format(fname),
+                 '    par = LLRPMessageDict()',
+                 '    body = 0',
+                 '    body_end = len(data)']
+    else:
+        lines = ['def {}(data, offset, end):'.format(fname),
+                 '    if offset >= end:',
+                 '        return None, offset',
+                 '    msgtype, length = _par_header.unpack_from(data, offset)',
+                 '    if msgtype & {} != {}:'.format(BITMASK(10),
+                                                    entry['type']),
+                 '        return None, offset',
+                 '    par = {}',
+                 '    body = offset + {}'.format(par_header_len),
+                 '    body_end = offset + length']
+    if trace_codecs:
+        lines.extend([
+            '    if trace.enabled:',
+            '        trace.event("decode", {!r}{})'.format(fname,
+                '' if is_message else ', type=msgtype, length=length')])
+    has_params = False
+    for g, (kind, items) in enumerate(_schema_groups(entry['schema'])):
+        if kind == 'fixed':
+            st = struct.Struct('!' + ''.join(item[1] for item in items))
+            ns['_s{}'.format(g)] = st
+            values = ['v{}_{}'.format(g, i) for i in xrange(len(items))]
+            lines.append('    ({},) = _s{}.unpack_from(data, body)'.format(
+                ', '.join(values), g))
+            lines.append('    body += {}'.format(st.size))
+            for i, item in enumerate(items):
+                if len(item) > 2:
+                    ns['_enum{}_{}'.format(g, i)] = item[2]
+                    lines.append('    par[{!r}] = _enum{}_{}.get({}, {})'\
+                            .format(item[0], g, i, values[i], values[i]))
+                else:
+                    lines.append('    par[{!r}] = {}'.format(item[0],
+                        values[i]))
+        elif kind == 'v':
+            lines.extend([
+                '    (n,) = _u16.unpack_from(data, body)',
+                '    body += 2',
+                '    par[{!r}] = data[body:body + n]'.format(items[0]),
+                '    body += n'])
+        else:
+            has_params = True
+            pname = items[0]
+            decoder = '_codec{}'.format(g)
+            ns[decoder] = pname
+            if kind == 'params':
+                lines.extend([
+                    '    par[{!r}] = []'.format(pname),
+                    '    while True:',
+                    '        ret, body = {}(data, body, body_end)'.format(
+                        decoder),
+                    '        if not ret:',
+                    '            break',
+                    '        par[{!r}].append(ret)'.format(pname)])
+            else:
+                lines.extend([
+                    '    ret, body = {}(data, body, body_end)'.format(decoder),
+                    '    if ret:',
+                    '        par[{!r}] = ret'.format(pname)])
+                if len(items) > 2 and items[2]:
+                    lines.extend([
+                        '    else:',
+                        '        raise LLRPError("missing or invalid {} '
+                            'parameter")'.format(pname)])
+    if is_message or has_params:
+        lines.extend([
+            '    if body < body_end:',
+            '        raise LLRPError("junk at end of message: " +',
+            '                        bin2dump(data[body:body_end]))'])
+    if is_message:
+        lines.append('    return par')
+    else:
+        lines.append('    return par, body_end')
+    return '\n'.join(lines) + '\n'
+
+def _schema_encoder_source(fname, entry, ns):
+    """Return the source of an encode_*_into function named fname for a
+    Message_struct entry, adding the objects it refers to to the namespace
+    ns."""
+    lines = ['def {}(par, buf):'.format(fname)]
+    groups = _schema_groups(entry['schema'])
+    # a parameter of fixed-size fields only is packed, header and all, by a
+    # single struct, with its length known in advance
+    fixed_size = not _schema_is_message(entry) and \
+            all(kind == 'fixed' for kind, _ in groups)
+    if fixed_size:
+        fmt = par_header + ''.join(item[1] for _, items in groups
+                                   for item in items)
+        ns['_s0'] = struct.Struct(fmt)
+        groups = [('fixed', [item for _, items in groups for item in items])]
+        header = '{}, {}, '.format(entry['type'], ns['_s0'].size)
+    elif not _schema_is_message(entry):
+        lines.extend([
+            '    start = len(buf)',
+            '    buf += _par_header.pack({}, 0)'.format(entry['type'])])
+    for g, (kind, items) in enumerate(groups):
+        if kind == 'fixed':
+            if not fixed_size:
+                ns['_s{}'.format(g)] = struct.Struct(
+                        '!' + ''.join(item[1] for item in items))
+                header = ''
+            values = []
+            for i, item in enumerate(items):
+                value = 'par[{!r}]'.format(item[0])
+                if len(item) > 2:
+                    ns['_enum{}_{}'.format(g, i)] = reverse_dict(item[2])
+                    value = '_enum{}_{}.get({}, {})'.format(g, i, value,
+                            value)
+                values.append('int({})'.format(value))
+            lines.append('    buf += _s{}.pack({}{})'.format(g, header,
+                ', '.join(values)))
+        elif kind == 'v':
+            lines.extend([
+                '    v = par[{!r}]'.format(items[0]),
+                '    buf += _u16.pack(len(v))',
+                '    buf += v'])
+        else:
+            pname = items[0]
+            encoder = '_codec{}'.format(g)
+            ns[encoder] = pname
+            if kind == 'params':
+                lines.extend([
+                    '    for p in par[{!r}]:'.format(pname),
+                    '        {}(p, buf)'.format(encoder)])
+            elif len(items) > 2 and items[2]:
+                lines.append('    {}(par[{!r}], buf)'.format(encoder,
+                    pname))
+            else:
+                lines.extend([
+                    '    if {!r} in par:'.format(pname),
+                    '        {}(par[{!r}], buf)'.format(encoder, pname)])
+    if _schema_is_message(entry):
+        lines.append('    pass')
+    elif not fixed_size:
+        lines.append('    _u16.pack_into(buf, start + 2, len(buf) - start)')
+    return '\n'.join(lines) + '\n'
+
+def compile_codecs():
+    """Generate and install the codecs of every Message_struct entry that has
+    a schema."""
+    # (name, direction) -> (function name, source, namespace, nested names)
+    pending = {}
+    for name, entry in Message_struct.items():
+        if 'schema' not in entry:
+            continue
+        ident = name.replace('-', '')
+        if _schema_is_message(entry):
+            decoder = 'decode_' + ident
+        else:
+            decoder = 'decode_{}_from'.format(ident)
+        for direction, fname, source_fn in (
+                ('decode', decoder, _schema_decoder_source),
+                ('encode', 'encode_{}_into'.format(ident),
+                 _schema_encoder_source)):
+            ns = {'LLRPMessageDict': LLRPMessageDict,
+                  'LLRPError': LLRPError,
+                  'trace': trace,
+                  'bin2dump': bin2dump,
+                  '_par_header': struct.Struct(par_header),
+                  '_u16': struct.Struct('!H')}
+            source = source_fn(fname, entry, ns)
+            nested = dict((key, ns[key]) for key in ns
+                          if key.startswith('_codec'))
+            pending[name, direction] = (fname, source, ns, nested)
+
+    # a nested parameter needs a codec of its own, either hand-written or
+    # generated; drop the generated codecs that can't have one
+    nested_key = {'decode': 'decode_from', 'encode': 'encode_into'}
+    changed = True
+    while changed:
+        changed = False
+        for (name, direction), (_, _, _, nested) in pending.items():
+            for pname in nested.values():
+                available = Message_struct.get(pname, {})
+                if (pname, direction) not in pending and \
+                        nested_key[direction] not in available and \
+                        direction not in available:
+                    del pending[name, direction]
+                    changed = True
+                    break
+
+    for (name, direction), (fname, source, ns, _) in pending.items():
+        exec compile(source, '<schema {}>'.format(name), 'exec') in ns
+        fn = ns[fname]
+        fn.source = source
+        entry = Message_struct[name]
+        if direction == 'encode':
+            key, wrapper = 'encode_into', 'encode'
+            entry['encode'] = buffer_encoder(fn)
+        elif _schema_is_message(entry):
+            key, wrapper = 'decode', None
+        else:
+            key, wrapper = 'decode_from', 'decode'
+            entry['decode'] = slice_decoder(fn)
+        entry[key] = fn
+        if wrapper and not _schema_is_message(entry):
+            globals()[fname] = fn
+            globals()[entry[wrapper].__name__] = entry[wrapper]
+    # encode_*_into for the remaining hand-written encoders
+    for name, entry in Message_struct.items():
+        if 'encode' in entry and 'encode_into' not in entry:
+            entry['encode_into'] = into_encoder(entry['encode'])
+            if not _schema_is_message(entry):
+                globals().setdefault('encode_{}_into'.format(
+                    name.replace('-', '')), entry['encode_into'])
+
+    for (name, direction), (_, _, ns, nested) in pending.items():
+        for key, pname in nested.items():
+            ns[key] = Message_struct[pname][nested_key[direction]]
+
+compile_codecs()
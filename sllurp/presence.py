@@ -0,0 +1,128 @@
+"""Tag presence: arrival and departure events.
+
+A PresenceTracker follows which tags are present and calls its callbacks
+with cb(event, key, peername, tag): ARRIVED when a key is first seen, and
+DEPARTED once it hasn't been seen for timeout seconds, with the reader and
+tag of its last sighting.  Keys are EPCs, or with per=READER (reader, EPC)
+pairs and with per=ANTENNA (reader, EPC, antenna) triples.  The tracker
+takes tag batches from an LLRPClientFactory or a Fleet:
+
+    tracker = PresenceTracker(timeout=5.0)
+    tracker.addCallback(lambda event, key, peername, tag: ...)
+    factory.addTagBatchCallback(tracker.put)
+
+Departures are found on a hierarchical ClockedTimerWheel rather than by
+scanning the tags.  A sighting only notes the tick the key was seen on; when
+the key's timer expires, it is scheduled again for the rest of its timeout if
+it has been seen since, so a key costs a few wheel operations per timeout
+however often it is read.  Departures are reported within resolution seconds
+of their timeouts.
+"""
+
+import logging
+from twisted.internet import reactor
+from aggregate import tag_field
+from tagqueue import tag_epc
+from timerwheel import ClockedTimerWheel, ticks_for
+
+logger = logging.getLogger(__name__)
+
+class PresenceTracker (object):
+    """Tags present, by key; see the module docstring."""
+    EPC = 'epc'
+    READER = 'reader'
+    ANTENNA = 'antenna'
+    scopes = (EPC, READER, ANTENNA)
+
+    ARRIVED = 'arrived'
+    DEPARTED = 'departed'
+
+    # slots in each level of the timer wheel
+    wheel_slots = 64
+
+    def __init__ (self, timeout=5.0, per=EPC, resolution=0.1, clock=reactor):
+        if per not in self.scopes:
+            raise ValueError('unknown presence scope {!r}'.format(per))
+        if timeout <= 0:
+            raise ValueError('timeout must be positive')
+        self.timeout = timeout
+        self.per = per
+        self.resolution = resolution
+        self.timeout_ticks = ticks_for(timeout, resolution)
+        levels = 1
+        while self.wheel_slots ** levels <= self.timeout_ticks:
+            levels += 1
+        self.wheel = ClockedTimerWheel(self._expired, resolution,
+                                       self.wheel_slots, levels, clock=clock)
+
+        # key -> [tick last seen on, peername, tag]
+        self._present = {}
+        self._callbacks = []
+
+        self.arrivals = 0
+        self.departures = 0
+
+    def __len__ (self):
+        return len(self._present)
+
+    def __contains__ (self, key):
+        return key in self._present
+
+    def addCallback (self, cb):
+        """Call cb(event, key, peername, tag) with each arrival and
+        departure."""
+        self._callbacks.append(cb)
+
+    def stats (self):
+        """Return the tracker's counters as a dict."""
+        return {
+            'present': len(self._present),
+            'arrivals': self.arrivals,
+            'departures': self.departures,
+        }
+
+    def keyFor (self, peername, tag):
+        """Return the key of tag, seen by the reader at peername."""
+        if self.per == PresenceTracker.EPC:
+            return tag_epc(tag)
+        if self.per == PresenceTracker.READER:
+            return (peername, tag_epc(tag))
+        return (peername, tag_epc(tag), tag_field(tag, 'AntennaID'))
+
+    def put (self, peername, tags):
+        """Note tags seen by the reader at peername."""
+        present = self._present
+        now = self.wheel.now
+        for tag in tags:
+            key = self.keyFor(peername, tag)
+            sighting = present.get(key)
+            if sighting is not None:
+                sighting[0] = now
+                sighting[1] = peername
+                sighting[2] = tag
+                continue
+            present[key] = [now, peername, tag]
+            self.wheel.schedule(key, self.timeout_ticks)
+            self.arrivals += 1
+            for fn in self._callbacks:
+                fn(PresenceTracker.ARRIVED, key, peername, tag)
+
+    def stop (self):
+        """Forget every tag, without reporting departures."""
+        for key in self._present:
+            self.wheel.cancel(key)
+        self._present.clear()
+        self.wheel.stop()
+
+    def _expired (self, keys):
+        now = self.wheel.now
+        for key in keys:
+            seen, peername, tag = self._present[key]
+            remaining = seen + self.timeout_ticks - now
+            if remaining > 0:
+                self.wheel.schedule(key, remaining)
+                continue
+            del self._present[key]
+            self.departures += 1
+            for fn in self._callbacks:
+                fn(PresenceTracker.DEPARTED, key, peername, tag)
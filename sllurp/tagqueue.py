@@ -0,0 +1,188 @@
+"""Bounded queue between LLRPClients and slow tag consumers.
+
+Tag callbacks run in the reactor thread, so a slow consumer (e.g., one that
+writes to a database) stalls every reader sharing the reactor.  Passing a
+TagQueue to LLRPClientFactory (tag_queue=...) decouples the two: clients put
+each decoded tag on the queue, and consumers take them off with get() or
+drain() at their own pace, e.g., from a thread via deferToThread.
+
+What happens when the queue fills is up to its policy:
+
+    TagQueue.BLOCK         stop reading from the readers that are filling the
+                           queue (client.pauseReading()) until it drains
+                           to low_water, so that the readers buffer their
+                           reports instead
+    TagQueue.DROP_OLDEST   discard the oldest queued tag
+    TagQueue.COALESCE      keep one entry per reader and EPC, folding repeat
+                           sightings into it; if the queue is still full,
+                           discard the oldest entry
+
+Queue items are (peername, tag) pairs, where tag is whatever the client
+decodes (a TagReportData dict or a record such as TagRead).
+"""
+
+import copy
+import logging
+from collections import deque, OrderedDict
+from twisted.internet import defer
+
+logger = logging.getLogger(__name__)
+
+def tag_epc (tag):
+    """Return the EPC of a TagReportData dict or TagRead record."""
+    if isinstance(tag, dict):
+        epc = tag.get('EPC-96')
+        return epc if epc is not None else tag['EPCData']['EPC']
+    return tag.EPC96 if tag.EPC96 is not None else tag.EPCData['EPC']
+
+def merge_sightings (old, new):
+    """Return a copy of new with an earlier sighting old of the same tag
+    folded in: the first-seen timestamps of old and the sum of the
+    TagSeenCounts."""
+    merged = copy.copy(new)
+    if isinstance(new, dict):
+        for key in ('FirstSeenTimestampUTC', 'FirstSeenTimestampUptime'):
+            if key in old:
+                merged[key] = old[key]
+        if 'TagSeenCount' in old and 'TagSeenCount' in new:
+            merged['TagSeenCount'] = (old['TagSeenCount'][0] +
+                                      new['TagSeenCount'][0],)
+    else:
+        for attr in ('FirstSeenTimestampUTC', 'FirstSeenTimestampUptime'):
+            if getattr(old, attr) is not None:
+                setattr(merged, attr, getattr(old, attr))
+        if old.TagSeenCount is not None and new.TagSeenCount is not None:
+            merged.TagSeenCount = old.TagSeenCount + new.TagSeenCount
+    return merged
+
+class TagQueue (object):
+    """A bounded queue of (peername, tag) pairs; see the module docstring.
+
+    With the BLOCK policy, tags already received when the queue fills are
+    still queued, so the queue can briefly exceed maxlen by up to a TCP
+    read's worth of tags per reader."""
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    COALESCE = 'coalesce'
+    policies = (BLOCK, DROP_OLDEST, COALESCE)
+
+    def __init__ (self, maxlen=10000, policy=BLOCK, low_water=None):
+        if policy not in self.policies:
+            raise ValueError('unknown TagQueue policy {!r}'.format(policy))
+        if maxlen < 1:
+            raise ValueError('maxlen must be positive')
+        self.maxlen = maxlen
+        self.policy = policy
+        self.low_water = maxlen // 2 if low_water is None else low_water
+        if policy == TagQueue.COALESCE:
+            # (peername, EPC) -> (peername, tag)
+            self._items = OrderedDict()
+        else:
+            self._items = deque()
+        self._waiters = deque()
+        self._paused = set()
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.pauses = 0
+        self.max_depth = 0
+
+    def __len__ (self):
+        return len(self._items)
+
+    def stats (self):
+        """Return the queue's counters as a dict."""
+        return {
+            'depth': len(self._items),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dequeued': self.dequeued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'pauses': self.pauses,
+            'paused_readers': len(self._paused),
+        }
+
+    def put (self, client, tags):
+        """Queue tags reported by client (an LLRPClient)."""
+        peername = client.peername
+        items = self._items
+        for tag in tags:
+            self.enqueued += 1
+            if self._waiters:
+                self.dequeued += 1
+                self._waiters.popleft().callback((peername, tag))
+                continue
+            if self.policy == TagQueue.COALESCE:
+                key = (peername, tag_epc(tag))
+                if key in items:
+                    tag = merge_sightings(items.pop(key)[1], tag)
+                    self.coalesced += 1
+                elif len(items) >= self.maxlen:
+                    items.popitem(last=False)
+                    self.dropped += 1
+                items[key] = (peername, tag)
+                continue
+            if self.policy == TagQueue.DROP_OLDEST and \
+                    len(items) >= self.maxlen:
+                items.popleft()
+                self.dropped += 1
+            items.append((peername, tag))
+        self.max_depth = max(self.max_depth, len(items))
+
+        if self.policy == TagQueue.BLOCK and len(items) >= self.maxlen and \
+                client not in self._paused:
+            logger.info('tag queue full (%d); pausing %s', len(items),
+                        peername)
+            client.pauseReading()
+            self._paused.add(client)
+            self.pauses += 1
+
+    def _popleft (self):
+        if self.policy == TagQueue.COALESCE:
+            return self._items.popitem(last=False)[1]
+        return self._items.popleft()
+
+    def _dequeued (self, n):
+        self.dequeued += n
+        if self._paused and len(self._items) <= self.low_water:
+            self.resumeAll()
+
+    def get (self):
+        """Return a Deferred that fires with the next (peername, tag)."""
+        if self._items:
+            item = self._popleft()
+            self._dequeued(1)
+            return defer.succeed(item)
+        d = defer.Deferred(canceller=self._waiters.remove)
+        self._waiters.append(d)
+        return d
+
+    def drain (self, n=None):
+        """Remove and return up to n (default: all) queued items as a
+        list."""
+        if n is None or n >= len(self._items):
+            if self.policy == TagQueue.COALESCE:
+                items = self._items.values()
+                self._items.clear()
+            else:
+                items = list(self._items)
+                self._items.clear()
+        else:
+            items = [self._popleft() for _ in xrange(n)]
+        self._dequeued(len(items))
+        return items
+
+    def resumeAll (self):
+        """Resume reading from every reader paused by the queue."""
+        for client in self._paused:
+            logger.info('tag queue drained (%d); resuming %s',
+                        len(self._items), client.peername)
+            client.resumeReading()
+        self._paused.clear()
+
+    def forget (self, client):
+        """Stop tracking client, e.g., when its connection is lost."""
+        self._paused.discard(client)
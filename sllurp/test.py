@@ -4,8 +4,30 @@ import sllurp
 import sllurp.llrp
 import sllurp.llrp_proto
 import sllurp.llrp_errors
+import sllurp.llrp_decoder
+import sllurp.columnar
+import sllurp.tagqueue
+import sllurp.decodepool
+import sllurp.trace
+import sllurp.bench
+import sllurp.aio
+import sllurp.capabilities
+import sllurp.fleet
+import sllurp.timerwheel
+import sllurp.aggregate
+import sllurp.presence
 import binascii
+import copy
 import logging
+import os
+import pickle
+import shutil
+import tempfile
+import struct
+from StringIO import StringIO
+from twisted.internet import address, error, task
+from twisted.python import failure
+from twisted.test import proto_helpers
 
 logLevel = logging.WARNING
 logging.basicConfig(level=logLevel,
@@ -28,6 +50,31 @@ def bytes_to_hex (bindata):
     assert len(ascrep) == (len(bindata) * 2)
     return ascrep
 
+def report_bytes ():
+    """Return the RO_ACCESS_REPORTs of TestDecodeROAccessReport as bytes."""
+    return hex_to_bytes(TestDecodeROAccessReport._r.strip()\
+            .replace('\n', '').replace(' ', ''))
+
+def report_messages ():
+    """Return the messages of report_bytes(), one string each."""
+    return [m.tobytes()
+            for m in sllurp.llrp.LLRPFramer().feed(report_bytes())]
+
+def report_tags (tag_decoder=None):
+    """Return the tags of report_bytes() as an inventorying LLRPClient with
+    tag_decoder decodes them."""
+    tags = []
+    client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                                    start_inventory=False)
+    client.transport = mock_conn('')
+    client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+    client.tag_decoder = tag_decoder
+    client.addMessageCallback('RO_ACCESS_REPORT',
+            lambda msg: tags.extend(
+                msg.msgdict['RO_ACCESS_REPORT']['TagReportData']))
+    client.dataReceived(report_bytes())
+    return tags
+
 class mock_stream (object):
     _bytes = None
     def __init__ (self, mybytes):
@@ -149,6 +196,1427 @@ class TestDecodeROAccessReport (unittest.TestCase):
     def tearDown (self):
         pass
 
+class TestTagReportDataDecoder (unittest.TestCase):
+    # matches the layout of most reports in TestDecodeROAccessReport
+    tagReportContentSelector = {
+        'EnableAntennaID': True,
+        'EnablePeakRRSI': True,
+        'EnableFirstSeenTimestamp': True,
+        'EnableTagSeenCount': True,
+    }
+    def test_matches_generic (self):
+        generic = report_tags(None)
+        fast = report_tags(sllurp.llrp_proto.TagReportDataDecoder(
+            self.tagReportContentSelector))
+        self.assertEqual(len(fast), 45)
+        self.assertEqual(fast, generic)
+        self.assertEqual(fast[0]['EPC-96'], '3005fb63ac1f3841ec880467')
+        self.assertEqual(fast[0]['PeakRSSI'], (-50,))
+        self.assertEqual(fast[0]['TagSeenCount'], (1,))
+    def test_fallback (self):
+        # no report matches this layout, so all go through the generic path
+        generic = report_tags(None)
+        selector = dict(self.tagReportContentSelector, EnableChannelIndex=True)
+        fast = report_tags(sllurp.llrp_proto.TagReportDataDecoder(selector))
+        self.assertEqual(fast, generic)
+    def test_records (self):
+        TagRead = sllurp.llrp_proto.TagRead
+        generic = report_tags(None)
+        for selector in (self.tagReportContentSelector, {}):
+            reads = report_tags(sllurp.llrp_proto.TagReportDataDecoder(
+                selector, record_type=TagRead))
+            self.assertEqual([read.to_dict() for read in reads], generic)
+            self.assertEqual(reads, [TagRead(par) for par in generic])
+        self.assertEqual(reads[0].EPC96, '3005fb63ac1f3841ec880467')
+        self.assertEqual(reads[0].PeakRSSI, -50)
+        self.assertIsNone(reads[0].ChannelIndex)
+        self.assertEqual(pickle.loads(pickle.dumps(reads[0], 2)), reads[0])
+
+@unittest.skipIf(sllurp.columnar.numpy is None, 'NumPy not installed')
+class TestColumnarDecoder (unittest.TestCase):
+    tagReportContentSelector = \
+            TestTagReportDataDecoder.tagReportContentSelector
+    def setUp (self):
+        self._binr = report_bytes()
+        self._generic = report_tags()
+    def check (self, tags, generic):
+        self.assertEqual(len(tags), len(generic))
+        for tag, par in zip(tags, generic):
+            # EPCs longer than 96 bits are truncated
+            epc = par.get('EPC-96') or par['EPCData']['EPC'][:24]
+            self.assertEqual(binascii.hexlify(tag['EPC'].tobytes()), epc)
+            self.assertEqual(tag['AntennaID'], par['AntennaID'][0])
+            self.assertEqual(tag['PeakRSSI'], par['PeakRSSI'][0])
+            self.assertEqual(tag['FirstSeenTimestamp'],
+                    par['FirstSeenTimestampUTC'][0])
+            self.assertEqual(tag['TagSeenCount'], par['TagSeenCount'][0])
+    def test_messages (self):
+        tags = sllurp.columnar.decode_ROAccessReports(self._binr,
+                self.tagReportContentSelector)
+        self.check(tags, self._generic)
+    def bodies (self, decoder):
+        """Return the bodies of the fixed-layout reports."""
+        bodies = []
+        offset = 0
+        while offset < len(self._binr):
+            length = int(binascii.hexlify(self._binr[offset+2:offset+6]), 16)
+            if length == 10 + decoder.size:
+                bodies.append(self._binr[offset+10:offset+length])
+            offset += length
+        return bodies
+    def test_bodies (self):
+        decoder = sllurp.columnar.ColumnarDecoder(
+                self.tagReportContentSelector)
+        tags = decoder.decode(''.join(self.bodies(decoder)))
+        self.check(tags, [par for par in self._generic if 'EPC-96' in par])
+    def test_missing_field (self):
+        decoder = sllurp.columnar.ColumnarDecoder(
+                self.tagReportContentSelector)
+        bodies = self.bodies(decoder)
+        # EPCData and AntennaID only, between two fixed-layout tags
+        short = hex_to_bytes('00f00019' '00f100120060' + 'ab' * 12 +
+                             '810002')
+        tags = decoder.decode(bodies[0] + short + bodies[1])
+        self.assertEqual(len(tags), 3)
+        self.assertNotEqual(tags['PeakRSSI'][0], 0)
+        self.assertEqual(tags['EPC'][1].tobytes(), '\xab' * 12)
+        self.assertEqual(tags['AntennaID'][1], 2)
+        self.assertEqual(tags['PeakRSSI'][1], 0)
+        self.assertEqual(tags['TagSeenCount'][1], 0)
+        self.assertEqual(tags['FirstSeenTimestamp'][1], 0)
+
+class TestIterTagReports (unittest.TestCase):
+    def setUp (self):
+        self._binr = report_bytes()
+        self._generic = report_tags()
+    def test_stream (self):
+        tags = sllurp.llrp_proto.iter_tag_reports(self._binr)
+        self.assertEqual(next(tags), self._generic[0])
+        self.assertEqual([self._generic[0]] + list(tags), self._generic)
+    def test_file (self):
+        tags = sllurp.llrp_proto.iter_tag_reports(StringIO(self._binr))
+        self.assertEqual(list(tags), self._generic)
+    def test_truncated (self):
+        tags = sllurp.llrp_proto.iter_tag_reports(self._binr[:-1])
+        self.assertEqual(list(tags), self._generic[:-1])
+
+class TestTVEDecoder (unittest.TestCase):
+    # AntennaID 1, PeakRSSI -50, C1G2PC 0x3000, C1G2SingulationDetails (2, 5),
+    # then the start of a TLV parameter
+    _run = hex_to_bytes('810001' '86ce' '8c3000' '920002' '0005' '00f1')
+    def test_run (self):
+        out = {}
+        offset = sllurp.llrp_decoder.decode_tve_run(self._run, 0, out)
+        self.assertEqual(offset, 13)
+        self.assertEqual(out, {'AntennaID': (1,), 'PeakRSSI': (-50,),
+            'C1G2PC': (0x3000,), 'C1G2SingulationDetails': (2, 5)})
+    def test_run_end (self):
+        # a parameter that doesn't fit before end isn't decoded
+        out = {}
+        offset = sllurp.llrp_decoder.decode_tve_run(self._run, 0, out, 12)
+        self.assertEqual(offset, 8)
+        self.assertNotIn('C1G2SingulationDetails', out)
+    def test_parameter (self):
+        decode = sllurp.llrp_decoder.decode_tve_parameter
+        self.assertEqual(decode(self._run, 3), ({'PeakRSSI': (-50,)}, 2))
+        self.assertEqual(decode(self._run, 13), (None, 0))
+        self.assertEqual(decode(self._run[:2], 0), (None, 0))
+
+class TestSchemaCodecs (unittest.TestCase):
+    s = sllurp.llrp_proto.Message_struct
+    # the encodings of sample() by the hand-written codecs that the schemas
+    # replaced, which also decoded them back to sample()
+    _handwritten = {
+        'ADD_ACCESSSPEC': '00cf003e00000001000001000000000000d00007000001'
+            '00d100220152000f0153000b200000000000000155000f0000000000'
+            '00c00000000100ef000501',
+        'ADD_ROSPEC': '00b1006900000001000000b2001200b300050100b600090000'
+            '00000000b700400001000100b8000901000001f400ba002f00010100de'
+            '0028000100e0000a00010001005b014a001800014f000800011c520150'
+            '000b8000040000000000ed000d01000100ee00061580',
+        'AISpecStopTrigger': '00b800090000000001',
+        'AccessReportSpec': '00ef000501',
+        'AccessSpecStopTrigger': '00d00007010001',
+        'AntennaConfiguration': '00de002e000100df0006000100e0000a00010001'
+            '0001014a001800014f000800011c520150000b80000400000000',
+        'AntennaEvent': '00ff0007000001',
+        'C1G2RFControl': '014f000800010001',
+        'CLOSE_CONNECTION': '',
+        'ConnectionAttemptEvent': '010000060000',
+        'DELETE_ACCESSSPEC': '00000001',
+        'DELETE_ROSPEC': '00000001',
+        'DISABLE_ACCESSSPEC': '00000001',
+        'DISABLE_ROSPEC': '00000001',
+        'ENABLE_ACCESSSPEC': '00000001',
+        'ENABLE_ROSPEC': '00000001',
+        'FieldError': '0120000800010001',
+        'GET_READER_CAPABILITIES': '01',
+        'GET_ROSPECS': '',
+        'GET_ROSPECS_RESPONSE': '011f001b0000000378797a012000080001000101'
+            '2100080001000100b1006900000001000000b2001200b300050100b600'
+            '09000000000000b700400001000100b8000901000001f400ba002f0001'
+            '0100de0028000100e0000a00010001005b014a001800014f000800011c'
+            '520150000b8000040000000000ed000d01000100ee00061580',
+        'GPIOCapabilities': '008d000800010001',
+        'InventoryParameterSpec': '00ba003500010100de002e000100df00060001'
+            '00e0000a000100010001014a001800014f000800011c520150000b8000'
+            '0400000000',
+        'KEEPALIVE': '',
+        'KEEPALIVE_ACK': '',
+        'LLRPStatus': '011f002b0000000378797a0120000800010001012100180001'
+            '000101200008000100010121000800010001',
+        'MaximumReceiveSensitivity': '016b00060001',
+        'ParameterError': '0121002800010001012000080001000101210018000100'
+            '0101200008000100010121000800010001',
+        'PerAntennaReceiveSensitivityRange': '0095000a000100010001',
+        'RFReceiver': '00df00060001',
+        'RFTransmitter': '00e0000a000100010001',
+        'ROBoundarySpec': '00b2001200b300050000b600090000000001',
+        'ROReportSpec': '00ed000d00000100ee00061780',
+        'ROSpecStartTrigger': '00b3000500',
+        'ROSpecStopTrigger': '00b600090000000001',
+        'ReceiveSensitivityTableEntry': '008b000800010001',
+        'START_ROSPEC': '00000001',
+        'STOP_ROSPEC': '00000001',
+        'TransmitPowerLevelTableEntry': '0091000800010001',
+    }
+    # responses that carry nothing but an LLRPStatus
+    for _name in ('ADD_ACCESSSPEC', 'ADD_ROSPEC', 'CLOSE_CONNECTION',
+                  'DELETE_ACCESSSPEC', 'DELETE_ROSPEC', 'DISABLE_ACCESSSPEC',
+                  'DISABLE_ROSPEC', 'ENABLE_ACCESSSPEC', 'ENABLE_ROSPEC',
+                  'SET_READER_CONFIG', 'START_ROSPEC', 'STOP_ROSPEC'):
+        _handwritten[_name + '_RESPONSE'] = '011f001b0000000378797a0120'\
+                '0008000100010121000800010001'
+    del _name
+    def setUp (self):
+        rospec = sllurp.llrp.LLRPROSpec(FauxClient(), 1)['ROSpec']
+        antconf = rospec['AISpec']['InventoryParameterSpec']\
+                ['AntennaConfiguration'][0]
+        # FauxClient's mode identifier isn't numeric
+        antconf['C1G2InventoryCommand']['C1G2RFControl']['ModeIndex'] = 1
+        # as decoded
+        rospec['AISpec']['AntennaIDs'] = [1]
+        # sample values for parameters that have no schema
+        self.samples = {
+            'ROSpec': rospec,
+            'TagReportContentSelector':
+                TestEncodings.tagReportContentSelector,
+            'C1G2InventoryCommand': antconf['C1G2InventoryCommand'],
+            'AccessSpec': self.accessSpec(),
+        }
+    def accessSpec (self):
+        """Return the AccessSpec that LLRPClient.startAccess() adds."""
+        specs = []
+        client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                                        start_inventory=False)
+        client.transport = mock_conn('')
+        encode = client.getEncodedSpec
+        client.getEncodedSpec = lambda name, spec: \
+                specs.append(spec) or encode(name, spec)
+        client.startAccess(readWords={'MB': 3, 'WordPtr': 0, 'WordCount': 1})
+        return specs[0]
+    def sample (self, name, depth=0):
+        par = {}
+        for item in self.s[name]['schema']:
+            field, kind = item[:2]
+            if kind == 'v':
+                par[field] = 'xyz'
+            elif kind in sllurp.llrp_proto.schema_int_kinds:
+                par[field] = item[2][min(item[2])] if len(item) > 2 else 1
+            elif field in self.samples:
+                sub = self.samples[field]
+                par[field] = [sub] if kind == 'params' else sub
+            elif 'schema' not in self.s[field]:
+                if len(item) > 2 and item[2]:
+                    return None
+            elif depth < 2 or (len(item) > 2 and item[2]):
+                sub = self.sample(field, depth + 1)
+                if sub is None:
+                    return None
+                par[field] = [sub] if kind == 'params' else sub
+        return par
+    def decode (self, decoder, data):
+        if decoder.__name__.endswith('_from'):
+            par, end = decoder(data, 0, len(data))
+            self.assertEqual(end, len(data))
+            return par
+        return dict(decoder(data))
+    def test_matches_handwritten (self):
+        for name, data in self._handwritten.items():
+            entry = self.s[name]
+            par = self.sample(name)
+            data = binascii.unhexlify(data)
+            self.assertEqual(entry['encode'](par), data, name)
+            decoder = entry.get('decode_from', entry.get('decode'))
+            if decoder is not None:
+                self.assertEqual(self.decode(decoder, data), par, name)
+    def test_bound_by_name (self):
+        for name, entry in self.s.items():
+            if 'schema' not in entry or 'Ver' in entry['fields']:
+                continue
+            ident = name.replace('-', '')
+            for key, fname in (('decode_from', 'decode_{}_from'),
+                               ('decode', 'decode_{}'),
+                               ('encode_into', 'encode_{}_into'),
+                               ('encode', 'encode_{}')):
+                if key in entry:
+                    self.assertIs(getattr(sllurp.llrp_proto,
+                            fname.format(ident)), entry[key], name)
+    def test_round_trip (self):
+        for name, entry in self.s.items():
+            par = self.sample(name) if 'schema' in entry else None
+            if par is None or not hasattr(entry.get('encode'), 'source'):
+                continue
+            decoder = entry.get('decode_from', entry.get('decode'))
+            if hasattr(decoder, 'source'):
+                self.assertEqual(self.decode(decoder, entry['encode'](par)),
+                        par, name)
+
+class TestCursorDecoders (unittest.TestCase):
+    # LLRPStatus (Success, no description) followed by trailing bytes
+    _status = hex_to_bytes('011f00080000000000f1')
+    def test_decode_from_offset (self):
+        data = 'junk' + self._status
+        par, offset = sllurp.llrp_proto.decode_LLRPStatus_from(data, 4,
+                len(data))
+        self.assertEqual(par['StatusCode'], 'Success')
+        self.assertEqual(offset, 12)
+    def test_no_match (self):
+        par, offset = sllurp.llrp_proto.decode_EPCData_from(self._status, 0,
+                len(self._status))
+        self.assertIsNone(par)
+        self.assertEqual(offset, 0)
+    def test_slice_wrapper (self):
+        par, rest = sllurp.llrp_proto.decode_LLRPStatus(self._status)
+        self.assertEqual(par['StatusCode'], 'Success')
+        self.assertEqual(rest, '\x00\xf1')
+    def test_buffer (self):
+        par, offset = sllurp.llrp_proto.decode_LLRPStatus_from(
+                buffer(self._status), 0, len(self._status))
+        self.assertEqual(par['ErrorDescription'], '')
+        self.assertEqual(offset, 8)
+
+class TestLazyMessage (unittest.TestCase):
+    _keepalive = hex_to_bytes('043e0000000a0000002a')
+    _notification = hex_to_bytes('043f000000200ab288c900f600160080000c0004f8'
+            '535baadaff010000060000')
+    def test_header_only (self):
+        data = self._notification
+        lmsg = sllurp.llrp.LLRPMessage(msgbytes=data, lazy=True)
+        self.assertEqual(lmsg.getName(), 'READER_EVENT_NOTIFICATION')
+        self.assertTrue(lmsg._undecoded)
+        eager = sllurp.llrp.LLRPMessage(msgbytes=data)
+        self.assertEqual(lmsg.getID(), eager.getID())
+        self.assertEqual(lmsg.msgdict, eager.msgdict)
+        self.assertFalse(lmsg._undecoded)
+    def test_unconsumed_report (self):
+        client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                                        start_inventory=False)
+        client.transport = mock_conn('')
+        client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        lmsg = sllurp.llrp.LLRPMessage(msgbytes=report_messages()[0],
+                                       lazy=True)
+        client.handleMessage(lmsg)
+        self.assertTrue(lmsg._undecoded)
+    def test_keepalive (self):
+        written = []
+        client = sllurp.llrp.LLRPClient(self, start_inventory=False)
+        client.transport = mock_conn('')
+        client.transport.write = written.append
+        client.dataReceived(self._keepalive)
+        self.assertEqual(len(written), 1)
+        msgtype = (ord(written[0][0]) << 8 | ord(written[0][1])) & 0x3ff
+        self.assertEqual(sllurp.llrp_proto.Message_Type2Name[msgtype],
+                'KEEPALIVE_ACK')
+        # the ACK echoes the KEEPALIVE's ID without using one up
+        self.assertEqual(sllurp.llrp.LLRPMessage(msgbytes=written[0]).getID(),
+                0x2a)
+        self.assertEqual(client.nextMessageID(), 1)
+
+class TestFramer (unittest.TestCase):
+    def setUp (self):
+        self._binr = report_bytes()
+        self._msgs = [m.tobytes() for m in
+                sllurp.llrp.LLRPFramer().feed(self._binr)]
+    def chunks (self, data, rng):
+        start = 0
+        while start < len(data):
+            end = start + rng.randint(0, 64)
+            yield data[start:end]
+            start = end
+    def test_whole (self):
+        self.assertEqual(len(self._msgs), 45)
+        self.assertEqual(''.join(self._msgs), self._binr)
+    def test_fragmented (self):
+        rng = random.Random(5084)
+        for _ in range(20):
+            framer = sllurp.llrp.LLRPFramer()
+            framer.compact_threshold = rng.choice((1, 100, 65536))
+            msgs = []
+            for chunk in self.chunks(self._binr, rng):
+                msgs.extend(m.tobytes() for m in framer.feed(chunk))
+            self.assertEqual(msgs, self._msgs)
+            self.assertEqual(len(framer), 0)
+    def test_bytewise (self):
+        framer = sllurp.llrp.LLRPFramer()
+        msgs = []
+        for byte in self._binr:
+            msgs.extend(m.tobytes() for m in framer.feed(byte))
+        self.assertEqual(msgs, self._msgs)
+    def test_held_view (self):
+        framer = sllurp.llrp.LLRPFramer()
+        first = framer.feed(self._msgs[0] + self._msgs[1][:5])
+        self.assertEqual(framer.feed(self._msgs[1][5:])[0].tobytes(),
+                self._msgs[1])
+        self.assertEqual(first[0].tobytes(), self._msgs[0])
+    _bad_header = hex_to_bytes('043d00000002000000000000')
+    def test_bad_length (self):
+        framer = sllurp.llrp.LLRPFramer()
+        self.assertRaises(sllurp.llrp_errors.LLRPError, framer.feed,
+                self._bad_header)
+    def test_good_then_bad (self):
+        framer = sllurp.llrp.LLRPFramer()
+        try:
+            framer.feed(self._msgs[0] + self._msgs[1] + self._bad_header)
+        except sllurp.llrp_errors.LLRPFramingError as err:
+            self.assertEqual([m.tobytes() for m in err.frames],
+                             self._msgs[:2])
+        else:
+            self.fail('no LLRPFramingError')
+        # the client handles the good messages and drops the rest
+        tags = []
+        client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                                        start_inventory=False)
+        client.transport = mock_conn('')
+        client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        client.addMessageCallback('RO_ACCESS_REPORT', tags.append)
+        client.dataReceived(self._msgs[0] + self._bad_header + self._msgs[1])
+        self.assertEqual(len(tags), 1)
+        self.assertEqual(len(client.framer), 0)
+        client.dataReceived(self._msgs[2])
+        self.assertEqual(len(tags), 2)
+    def test_client (self):
+        tags = []
+        client = sllurp.llrp.LLRPClient(self, start_inventory=False)
+        client.transport = mock_conn('')
+        client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        client.addMessageCallback('RO_ACCESS_REPORT', tags.append)
+        # splits inside the first header, then a 1-byte read
+        for chunk in (self._binr[:3], self._binr[3:9], self._binr[9:10],
+                self._binr[10:100], self._binr[100:]):
+            client.dataReceived(chunk)
+        self.assertEqual(len(tags), 45)
+
+class TestTagBatch (unittest.TestCase):
+    def setUp (self):
+        self._msgs = report_messages()
+        self.batches = []
+    def client (self, **kwargs):
+        client = sllurp.llrp.LLRPClient(self, start_inventory=False, **kwargs)
+        client.transport = mock_conn('')
+        client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        client.addTagBatchCallback(lambda peer, tags:
+                self.batches.append(tags))
+        return client
+    def test_per_read (self):
+        client = self.client()
+        client.dataReceived(''.join(self._msgs[:10]) + self._msgs[10][:5])
+        client.dataReceived(self._msgs[10][5:])
+        client.dataReceived(''.join(self._msgs[11:]))
+        self.assertEqual([len(b) for b in self.batches], [10, 1, 34])
+        self.assertEqual(self.batches[0][0]['AntennaID'], (1,))
+    def test_window (self):
+        clock = task.Clock()
+        client = self.client(tag_batch_window=0.5)
+        client.clock = clock
+        for msg in self._msgs[:20]:
+            client.dataReceived(msg)
+        clock.advance(0.4)
+        self.assertEqual(self.batches, [])
+        clock.advance(0.1)
+        self.assertEqual([len(b) for b in self.batches], [20])
+        client.dataReceived(''.join(self._msgs[20:]))
+        client.flushTagBatch()
+        self.assertEqual([len(b) for b in self.batches], [20, 25])
+        self.assertFalse(clock.getDelayedCalls())
+
+class TestTagQueue (unittest.TestCase):
+    class producer (mock_conn):
+        paused = False
+        def pauseProducing (self):
+            self.paused = True
+        def resumeProducing (self):
+            self.paused = False
+    def setUp (self):
+        self.tags = report_tags()
+        self.client = sllurp.llrp.LLRPClient(self, start_inventory=False)
+        self.client.transport = self.producer('')
+        self.client.peername = ('reader', 5084)
+    def test_block (self):
+        queue = sllurp.tagqueue.TagQueue(10, low_water=4)
+        queue.put(self.client, self.tags[:9])
+        self.assertFalse(self.client.transport.paused)
+        queue.put(self.client, self.tags[9:12])
+        self.assertTrue(self.client.transport.paused)
+        self.assertEqual(len(queue.drain(7)), 7)
+        self.assertTrue(self.client.transport.paused)
+        queue.get()
+        self.assertFalse(self.client.transport.paused)
+        self.assertEqual(queue.stats()['pauses'], 1)
+        self.assertEqual(queue.stats()['max_depth'], 12)
+        self.assertEqual(queue.stats()['dropped'], 0)
+    def test_block_keepalive (self):
+        # a paused reader is silent, but not dead
+        client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                start_inventory=False, keepalive_interval=10)
+        client.clock = task.Clock()
+        client.transport = self.producer('')
+        aborted = []
+        client.transport.abortConnection = lambda: aborted.append(True)
+        client.transport.loseConnection = client.transport.abortConnection
+        client.peername = ('reader', 5084)
+        client.startWatchdog()
+        queue = sllurp.tagqueue.TagQueue(10, low_water=4)
+        queue.put(client, self.tags[:10])
+        self.assertTrue(client.transport.paused)
+        self.assertEqual(client.clock.getDelayedCalls(), [])
+        client.clock.advance(100)
+        self.assertEqual(aborted, [])
+        queue.drain()
+        self.assertFalse(client.transport.paused)
+        # watching again, from the resumption
+        client.clock.advance(29)
+        self.assertEqual(aborted, [])
+        client.clock.advance(1)
+        self.assertEqual(aborted, [True])
+    def test_drop_oldest (self):
+        queue = sllurp.tagqueue.TagQueue(3,
+                sllurp.tagqueue.TagQueue.DROP_OLDEST)
+        queue.put(self.client, self.tags[:5])
+        self.assertEqual(queue.drain(),
+                [(('reader', 5084), tag) for tag in self.tags[2:5]])
+        self.assertEqual(queue.dropped, 2)
+    def test_coalesce (self):
+        # the report alternates between two EPCs (plus one EPCData tag)
+        queue = sllurp.tagqueue.TagQueue(10,
+                sllurp.tagqueue.TagQueue.COALESCE)
+        queue.put(self.client, self.tags)
+        items = queue.drain()
+        self.assertEqual(len(items), 3)
+        self.assertEqual(sum(tag['TagSeenCount'][0] for _, tag in items),
+                len(self.tags))
+        self.assertEqual(queue.coalesced, len(self.tags) - 3)
+        first = [tag for tag in self.tags
+                if sllurp.tagqueue.tag_epc(tag) ==
+                    sllurp.tagqueue.tag_epc(items[0][1])][0]
+        self.assertEqual(items[0][1]['FirstSeenTimestampUTC'],
+                first['FirstSeenTimestampUTC'])
+        self.assertEqual(first['TagSeenCount'], (1,))
+    def test_get (self):
+        queue = sllurp.tagqueue.TagQueue(10)
+        got = []
+        queue.get().addCallback(got.append)
+        self.client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        self.client.tag_queue = queue
+        self.client.dataReceived(report_bytes()[:0x2c * 3])
+        self.assertEqual(got, [(('reader', 5084), self.tags[0])])
+        self.assertEqual(len(queue), 2)
+
+class TestTimerWheel (unittest.TestCase):
+    def test_wheel (self):
+        wheel = sllurp.timerwheel.TimerWheel(4)
+        wheel.schedule('a', 1)
+        wheel.schedule('b', 3)
+        wheel.schedule('c', 3)
+        wheel.cancel('c')
+        self.assertEqual(set(wheel.advance()), set(['a']))
+        wheel.schedule('b', 1)
+        self.assertEqual(set(wheel.advance()), set(['b']))
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual(wheel.advance(), ())
+        self.assertRaises(ValueError, wheel.schedule, 'd', 4)
+    def test_levels (self):
+        wheel = sllurp.timerwheel.TimerWheel(4, levels=3)
+        rand = random.Random(7)
+        deadlines = dict((key, rand.randrange(1, 64)) for key in range(200))
+        for key, ticks in deadlines.items():
+            wheel.schedule(key, ticks)
+        # some keys are rescheduled partway through
+        expired = {}
+        for tick in range(1, 64):
+            for key in wheel.advance():
+                expired[key] = tick
+            if tick == 10:
+                for key in range(0, 200, 10):
+                    deadlines[key] = 10 + rand.randrange(1, 54)
+                    wheel.schedule(key, deadlines[key] - 10)
+        self.assertEqual(expired, deadlines)
+        self.assertEqual(len(wheel), 0)
+
+class TestPresence (unittest.TestCase):
+    def setUp (self):
+        self.tags = report_tags()
+        self.clock = task.Clock()
+        self.events = []
+    def tracker (self, **kwargs):
+        tracker = sllurp.presence.PresenceTracker(clock=self.clock, **kwargs)
+        tracker.addCallback(lambda event, key, peername, tag:
+                            self.events.append((event, key)))
+        return tracker
+    def test_presence (self):
+        a, b = [sllurp.tagqueue.tag_epc(tag) for tag in self.tags[:2]]
+        tracker = self.tracker(timeout=1.0)
+        tracker.put(('reader', 5084), self.tags[:2])
+        self.assertEqual(self.events, [('arrived', a), ('arrived', b)])
+        self.clock.advance(0.5)
+        tracker.put(('reader', 5084), self.tags[:1])
+        self.clock.advance(0.6)
+        self.assertEqual(self.events[2:], [('departed', b)])
+        self.assertIn(a, tracker)
+        self.clock.advance(0.5)
+        self.assertEqual(self.events[3:], [('departed', a)])
+        self.assertEqual(tracker.stats(),
+                         {'present': 0, 'arrivals': 2, 'departures': 2})
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+    def test_scope (self):
+        tracker = self.tracker(timeout=60, per='antenna')
+        self.assertEqual(len(tracker.wheel.rings), 2)
+        tracker.put(('reader', 5084), self.tags)
+        self.assertEqual(len(tracker), 3)
+        self.assertIn((('reader', 5084),
+                       sllurp.tagqueue.tag_epc(self.tags[0]), 1), tracker)
+        tracker.stop()
+        self.assertEqual(len(tracker), 0)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+class TestTagAggregator (unittest.TestCase):
+    def setUp (self):
+        self.tags = report_tags()
+        self.client = sllurp.llrp.LLRPClient(sllurp.llrp.LLRPClientFactory(),
+                                             start_inventory=False)
+        self.client.transport = mock_conn('')
+        self.client.peername = ('reader', 5084)
+        self.clock = task.Clock()
+        self.records = []
+    def aggregator (self, **kwargs):
+        agg = sllurp.aggregate.TagAggregator(clock=self.clock, **kwargs)
+        agg.addCallback(lambda peername, records:
+                        self.records.extend(records))
+        return agg
+    def epcs (self):
+        epcs = sorted((sllurp.tagqueue.tag_epc(tag), tag['TagSeenCount'][0])
+                      for tag in self.records)
+        del self.records[:]
+        return epcs
+    def test_window (self):
+        agg = self.aggregator()
+        agg.put(self.client, self.tags)
+        self.clock.advance(0.9)
+        self.assertEqual(self.records, [])
+        self.clock.advance(0.1)
+        self.assertEqual(len(self.records), 3)
+        self.assertEqual(sum(tag['TagSeenCount'][0] for tag in self.records),
+                         len(self.tags))
+        first = self.records[0]
+        epc = sllurp.tagqueue.tag_epc(first)
+        sightings = [tag for tag in self.tags
+                     if sllurp.tagqueue.tag_epc(tag) == epc]
+        self.assertEqual(first['FirstSeenTimestampUTC'],
+                         sightings[0]['FirstSeenTimestampUTC'])
+        self.assertEqual(first['PeakRSSI'],
+                         max(tag['PeakRSSI'] for tag in sightings))
+        self.assertEqual(agg.stats()['tags'], len(self.tags))
+    def test_changes (self):
+        a, b = [sllurp.tagqueue.tag_epc(tag) for tag in self.tags[:2]]
+        agg = self.aggregator()
+        agg.put(self.client, self.tags[:2])
+        self.clock.advance(1)
+        self.assertEqual(self.epcs(), sorted([(a, 1), (b, 1)]))
+        # the same peak RSSIs again
+        agg.put(self.client, self.tags[:2])
+        self.clock.advance(1)
+        self.assertEqual(self.epcs(), [])
+        self.assertEqual(agg.suppressed, 2)
+        # a's peak RSSI rises, and b goes unseen
+        agg.put(self.client, self.tags[2:3])
+        self.clock.advance(1)
+        self.assertEqual(self.epcs(), sorted([(a, 2), (b, 1)]))
+        self.clock.advance(1)
+        self.assertEqual(self.epcs(), [])
+        self.assertEqual(len(agg), 0)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+    def test_evict (self):
+        agg = self.aggregator(maxlen=1)
+        agg.put(self.client, self.tags[:2])
+        self.assertEqual(self.epcs(),
+                         [(sllurp.tagqueue.tag_epc(self.tags[0]), 1)])
+        self.assertEqual(agg.evicted, 1)
+        agg.flush()
+        self.assertEqual(len(self.epcs()), 1)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+    def test_client (self):
+        agg = self.aggregator(per_antenna=False)
+        self.client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        self.client.tag_aggregator = agg
+        self.client.dataReceived(report_bytes())
+        self.assertEqual(len(agg), 3)
+    def test_factory (self):
+        batches = []
+        agg = sllurp.aggregate.TagAggregator(clock=self.clock,
+                                             per_antenna=False)
+        factory = sllurp.llrp.LLRPClientFactory(tag_aggregator=agg)
+        factory.addTagBatchCallback(lambda peername, tags:
+                                    batches.append((peername, tags)))
+        proto = factory.buildProtocol(None)
+        proto.transport = mock_conn('')
+        proto.peername = ('reader', 5084)
+        proto.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        proto.dataReceived(report_bytes())
+        self.assertEqual(batches, [])
+        self.clock.advance(1)
+        self.assertEqual(len(batches), 1)
+        peername, records = batches[0]
+        self.assertEqual(peername, ('reader', 5084))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sum(tag['TagSeenCount'][0] for tag in records),
+                         len(self.tags))
+
+class TestDecodePool (unittest.TestCase):
+    class pool (object):
+        def __init__ (self):
+            self.pending = []
+        def decode (self, msgbytes, tag_decoder=None):
+            d = sllurp.decodepool.defer.Deferred()
+            self.pending.append((d, msgbytes, tag_decoder))
+            return d
+        def finish (self, i):
+            d, msgbytes, tag_decoder = self.pending[i]
+            d.callback(sllurp.decodepool.decode_message(msgbytes,
+                tag_decoder))
+    def setUp (self):
+        self._msgs = report_messages()
+        self.handled = []
+        self.written = []
+        self.client = sllurp.llrp.LLRPClient(self, start_inventory=False,
+                decode_pool=self.pool())
+        self.client.transport = mock_conn('')
+        self.client.transport.write = self.written.append
+        self.client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        self.client.addMessageCallback('RO_ACCESS_REPORT', self.handled.append)
+    def test_order (self):
+        pool = self.client.decode_pool
+        self.client.dataReceived(''.join(self._msgs[:3]) +
+                TestLazyMessage._keepalive)
+        # the keepalive doesn't wait for the reports ahead of it
+        self.assertEqual(len(self.written), 1)
+        pool.finish(2)
+        pool.finish(1)
+        self.assertEqual(self.handled, [])
+        pool.finish(0)
+        self.assertEqual([m.getID() for m in self.handled],
+                [sllurp.llrp.LLRPMessage(msgbytes=m).getID()
+                    for m in self._msgs[:3]])
+        self.assertEqual(self.handled[0].msgdict,
+                sllurp.llrp.LLRPMessage(msgbytes=self._msgs[0]).msgdict)
+    def test_failure (self):
+        pool = self.client.decode_pool
+        self.client.dataReceived(''.join(self._msgs[:2]))
+        pool.pending[0][0].errback(sllurp.llrp_errors.LLRPError('bad'))
+        self.assertEqual(self.handled, [])
+        pool.finish(1)
+        self.assertEqual(len(self.handled), 1)
+    def test_undecodable (self):
+        pool = self.client.decode_pool
+        self.client.dataReceived(''.join(self._msgs[:2]))
+        pool.pending[0][0].callback(None)
+        pool.finish(1)
+        self.assertEqual(len(self.handled), 1)
+    def test_worker (self):
+        decoder = sllurp.llrp_proto.TagReportDataDecoder(
+                TestTagReportDataDecoder.tagReportContentSelector,
+                record_type=sllurp.llrp_proto.TagRead)
+        copied = pickle.loads(pickle.dumps(decoder))
+        self.assertEqual(copied.layouts, decoder.layouts)
+        spec = pickle.dumps(decoder, pickle.HIGHEST_PROTOCOL)
+        ok, msgdict = sllurp.decodepool._decode_in_worker(self._msgs[0],
+                spec)
+        self.assertTrue(ok)
+        self.assertEqual(msgdict, pickle.loads(pickle.dumps(msgdict)))
+        tag = msgdict['RO_ACCESS_REPORT']['TagReportData'][0]
+        self.assertEqual(tag.AntennaID, 1)
+        self.assertFalse(sllurp.decodepool._decode_in_worker('\x04', None)[0])
+        # selectors may hold unhashable values
+        decoder = sllurp.llrp_proto.TagReportDataDecoder(dict(
+                TestTagReportDataDecoder.tagReportContentSelector,
+                C1G2EPCMemorySelector={'EnableCRC': False}))
+        ok, msgdict = sllurp.decodepool._decode_in_worker(self._msgs[0],
+                pickle.dumps(decoder, pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(ok)
+
+class TestEncodedSpec (unittest.TestCase):
+    path = ('AISpec', 'InventoryParameterSpec', 'AntennaConfiguration')
+    def setUp (self):
+        fx = FauxClient()
+        fx.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        self.rospec = sllurp.llrp.LLRPROSpec(fx, 1, antennas=(1, 2, 3),
+                duration_sec=10)['ROSpec']
+        self.encode = sllurp.llrp_proto.encode_ROSpec
+    def antconfs (self, rospec):
+        return rospec['AISpec']['InventoryParameterSpec']\
+                ['AntennaConfiguration']
+    def test_bytes (self):
+        spec = sllurp.llrp_proto.EncodedSpec('ROSpec', self.rospec)
+        self.assertEqual(str(spec), self.encode(self.rospec))
+        self.assertEqual(spec['ROSpecID'], 1)
+        add = sllurp.llrp_proto.Message_struct['ADD_ROSPEC']['encode']
+        self.assertEqual(add({'ROSpec': spec}), add({'ROSpec': self.rospec}))
+    def test_replace (self):
+        spec = sllurp.llrp_proto.EncodedSpec('ROSpec', self.rospec)
+        antconf = self.antconfs(self.rospec)[1]
+        antconf['RFTransmitter'] = dict(antconf['RFTransmitter'],
+                TransmitPower=42)
+        spec.replace(self.path + (1, 'RFTransmitter'),
+                antconf['RFTransmitter'])
+        self.assertEqual(str(spec), self.encode(self.rospec))
+        self.assertEqual(spec.par, self.rospec)
+    def test_replace_resized (self):
+        spec = sllurp.llrp_proto.EncodedSpec('ROSpec', self.rospec)
+        antconf = dict(self.antconfs(self.rospec)[2],
+                RFReceiver={'ReceiverSensitivity': 3})
+        del antconf['C1G2InventoryCommand']
+        spec.replace(self.path + (2,), antconf)
+        self.antconfs(self.rospec)[2] = antconf
+        self.assertEqual(str(spec), self.encode(self.rospec))
+        self.assertRaises(sllurp.llrp_errors.LLRPError, spec.find,
+                self.path + (3,))
+    def test_client_cache (self):
+        client = sllurp.llrp.LLRPClient(self, start_inventory=False,
+                antennas=(1, 2))
+        client.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        rospec = client.getROSpec()['ROSpec']
+        spec = client.getEncodedSpec('ROSpec', rospec)
+        self.assertIs(client.getEncodedSpec('ROSpec', rospec), spec)
+        client.setTxPower(17, antennas=(2,))
+        self.assertIs(client.getEncodedSpec('ROSpec', rospec), spec)
+        self.assertEqual([a['RFTransmitter']['TransmitPower']
+                for a in self.antconfs(rospec)], [client.tx_power, 17])
+        self.assertEqual(str(spec), self.encode(rospec))
+        other = sllurp.llrp.LLRPClient(self, start_inventory=False)
+        other.spec_cache = client.spec_cache
+        self.assertIs(other.getEncodedSpec('ROSpec', rospec), spec)
+
+def response_bytes (name, msgid, status=0, error=''):
+    """Return the bytes of a response message with only an LLRPStatus."""
+    status = struct.pack('!HHHH', 287, 8 + len(error), status,
+            len(error)) + error
+    return struct.pack('!HII',
+            (1 << 10) | sllurp.llrp_proto.Message_struct[name]['type'],
+            10 + len(status), msgid) + status
+
+class TestMessageIDs (unittest.TestCase):
+    def response (self, msgid, status=0, error=''):
+        return response_bytes('DELETE_ROSPEC_RESPONSE', msgid, status, error)
+    def setUp (self):
+        self.written = []
+        self.client = sllurp.llrp.LLRPClient(self, start_inventory=False)
+        self.client.transport = mock_conn('')
+        self.client.transport.write = self.written.append
+        self.client.state = sllurp.llrp.LLRPClient.STATE_SENT_DELETE_ROSPEC
+    def delete (self):
+        return self.client.sendMessage({'DELETE_ROSPEC': {
+            'Ver': 1, 'Type': 21, 'ROSpecID': 0}})
+    def test_sequence (self):
+        first, second = self.delete(), self.delete()
+        self.assertEqual([sllurp.llrp.LLRPMessage(msgbytes=m).getID()
+                for m in self.written], [1, 2])
+        got = []
+        first.addCallback(lambda lmsg: got.append((1, lmsg.getID())))
+        second.addCallback(lambda lmsg: got.append((2, lmsg.getID())))
+        self.client.dataReceived(self.response(2))
+        self.assertEqual(got, [(2, 2)])
+        self.client.dataReceived(self.response(1))
+        self.assertEqual(got, [(2, 2), (1, 1)])
+        self.assertEqual(self.client._responses, {})
+    def test_wrap (self):
+        self.client._next_msgid = 0xffffffff
+        self.assertEqual(self.client.nextMessageID(), 0xffffffff)
+        self.assertEqual(self.client.nextMessageID(), 1)
+    def test_failure (self):
+        failed = []
+        self.delete().addErrback(failed.append)
+        self.client.processResponse(sllurp.llrp.LLRPMessage(
+            msgbytes=self.response(1, 100, 'bad')))
+        failed[0].trap(sllurp.llrp_errors.LLRPResponseError)
+        self.assertIn('bad', failed[0].getErrorMessage())
+    def test_error_message (self):
+        failed = []
+        self.delete().addErrback(failed.append)
+        data = response_bytes('ErrorMessage', 1, 101, 'unsupported')
+        self.client.dataReceived(data)
+        failed[0].trap(sllurp.llrp_errors.LLRPResponseError)
+        self.assertIn('unsupported', failed[0].getErrorMessage())
+
+class TestPipelinedBringUp (unittest.TestCase):
+    def setUp (self):
+        self.written = []
+        self.spec_cache = {}
+    def connect (self):
+        client = sllurp.llrp.LLRPClient(self, pipeline_bringup=True)
+        client.transport = mock_conn('')
+        client.transport.write = self.written.append
+        client.peername = ('reader', 5084)
+        client.spec_cache = self.spec_cache
+        def parseCapabilities (capdict):
+            client.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        client.parseCapabilities = parseCapabilities
+        client.dataReceived(TestLazyMessage._notification)
+        return client
+    def sent (self):
+        """Return the names and IDs of the messages in the last write."""
+        sent = []
+        for frame in sllurp.llrp.LLRPFramer().feed(self.written[-1]):
+            msgtype, _, msgid = struct.unpack_from('!HII', frame.tobytes())
+            sent.append((sllurp.llrp_proto.Message_Type2Name[
+                msgtype & 0x3ff], msgid))
+        return sent
+    def respond (self, client, sent, failing=None):
+        client.dataReceived(''.join(response_bytes(name + '_RESPONSE', msgid,
+                    100 if name == failing else 0)
+                for name, msgid in sent))
+    def test_pipelined (self):
+        client = self.connect()
+        sent = self.sent()
+        self.assertEqual(sent, [('GET_READER_CAPABILITIES', 1),
+                ('DELETE_ACCESSSPEC', 2), ('DELETE_ROSPEC', 3)])
+        self.respond(client, sent)
+        sent = self.sent()
+        self.assertEqual(sent, [('ADD_ROSPEC', 4), ('ENABLE_ROSPEC', 5)])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_BRINGING_UP)
+        self.respond(client, sent)
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(len(self.written), 2)
+
+        # on reconnecting, the cached ROSpec goes in the first write
+        client = self.connect()
+        sent = self.sent()
+        self.assertEqual([name for name, _ in sent],
+                ['GET_READER_CAPABILITIES', 'DELETE_ACCESSSPEC',
+                 'DELETE_ROSPEC', 'ADD_ROSPEC', 'ENABLE_ROSPEC'])
+        self.respond(client, sent)
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+        self.assertIsNotNone(client.tag_decoder)
+    def test_fallback (self):
+        client = self.connect()
+        self.respond(client, self.sent(), failing='DELETE_ROSPEC')
+        self.assertEqual(self.sent(), [('GET_READER_CAPABILITIES', 4)])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_SENT_GET_CAPABILITIES)
+
+class TestStateMachine (unittest.TestCase):
+    def connect (self):
+        client = sllurp.llrp.LLRPClient(self, reset_on_connect=False)
+        client.clock = task.Clock()
+        client.transport = proto_helpers.StringTransport()
+        client.peername = ('reader', 5084)
+        def parseCapabilities (capdict):
+            client.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        client.parseCapabilities = parseCapabilities
+        client.dataReceived(TestLazyMessage._notification)
+        return client
+    def test_state_names (self):
+        LLRPClient = sllurp.llrp.LLRPClient
+        self.assertEqual(LLRPClient.getStateName(
+            LLRPClient.STATE_INVENTORYING), 'STATE_INVENTORYING')
+        self.assertEqual(len(list(LLRPClient.getStates())), 12)
+        self.assertRaises(sllurp.llrp_errors.LLRPError,
+                          LLRPClient.getStateName, 99)
+    def test_latencies (self):
+        LLRPClient = sllurp.llrp.LLRPClient
+        client = self.connect()
+        self.assertEqual(client.state, LLRPClient.STATE_SENT_GET_CAPABILITIES)
+        client.clock.advance(1)
+        client.dataReceived(response_bytes(
+            'GET_READER_CAPABILITIES_RESPONSE', 1))
+        self.assertEqual(client.state, LLRPClient.STATE_SENT_ADD_ROSPEC)
+        client.clock.advance(2)
+        client.dataReceived(response_bytes('ADD_ROSPEC_RESPONSE', 2))
+        client.clock.advance(3)
+        client.dataReceived(response_bytes('ENABLE_ROSPEC_RESPONSE', 3))
+        self.assertEqual(client.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(client.getLatencies(), {'capabilities': 1,
+                         'add_rospec': 2, 'enable_rospec': 3})
+        self.assertEqual([new for _, _, new in client.transitions],
+                [LLRPClient.STATE_SENT_GET_CAPABILITIES,
+                 LLRPClient.STATE_CONNECTED, LLRPClient.STATE_SENT_ADD_ROSPEC,
+                 LLRPClient.STATE_SENT_ENABLE_ROSPEC,
+                 LLRPClient.STATE_INVENTORYING])
+        self.assertEqual(client.transitions[-1][0], 6)
+    def test_unexpected (self):
+        client = self.connect()
+        client.dataReceived(response_bytes('ADD_ROSPEC_RESPONSE', 1))
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_SENT_GET_CAPABILITIES)
+
+class TestReuseROSpec (unittest.TestCase):
+    def setUp (self):
+        self.written = []
+    def connect (self, pipeline=True):
+        client = sllurp.llrp.LLRPClient(self, pipeline_bringup=pipeline,
+                                        reuse_rospec=True)
+        client.transport = mock_conn('')
+        client.transport.write = self.written.append
+        client.peername = ('reader', 5084)
+        client.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        client.parseCapabilities = lambda capdict: None
+        client.dataReceived(TestLazyMessage._notification)
+        return client
+    def sent (self):
+        return [sllurp.llrp.LLRPMessage(msgbytes=frame.tobytes(), lazy=True)
+                for frame in sllurp.llrp.LLRPFramer().feed(self.written[-1])]
+    def names (self):
+        return [lmsg.getName() for lmsg in self.sent()]
+    def rospecs_response (self, msgid, rospecs):
+        body = sllurp.llrp_proto.Message_struct['GET_ROSPECS_RESPONSE']\
+                ['encode']({'LLRPStatus': {'StatusCode': 'Success',
+                                           'ErrorDescription': ''},
+                            'ROSpec': rospecs})
+        return struct.pack('!HII', (1 << 10) | 36, 10 + len(body),
+                           msgid) + body
+    def respond (self, client, rospecs):
+        data = ''
+        for lmsg in self.sent():
+            if lmsg.getName() == 'GET_ROSPECS':
+                data += self.rospecs_response(lmsg.getID(), rospecs)
+            else:
+                data += response_bytes(lmsg.getName() + '_RESPONSE',
+                                       lmsg.getID())
+        client.dataReceived(data)
+    def rospec (self, client, state):
+        rospec = copy.deepcopy(client.getROSpec()['ROSpec'])
+        rospec['CurrentState'] = state
+        return rospec
+    def test_decode (self):
+        client = self.connect()
+        rospec = self.rospec(client, 'Inactive')
+        data = self.rospecs_response(1, [rospec])
+        lmsg = sllurp.llrp.LLRPMessage(msgbytes=data)
+        theirs = lmsg.msgdict['GET_ROSPECS_RESPONSE']['ROSpec']
+        self.assertEqual(len(theirs), 1)
+        self.assertEqual(theirs[0]['CurrentState'], 'Inactive')
+        self.assertEqual(theirs[0]['AISpec']['AntennaIDs'], [1])
+        self.assertEqual(theirs[0]['ROReportSpec'], rospec['ROReportSpec'])
+        self.assertEqual(client.matchingROSpecState(lmsg), 'Inactive')
+    def test_enable (self):
+        client = self.connect()
+        self.assertEqual(self.names(),
+                ['GET_READER_CAPABILITIES', 'GET_ROSPECS'])
+        self.respond(client, [self.rospec(client, 'Disabled')])
+        self.assertEqual(self.names(), ['ENABLE_ROSPEC'])
+        self.respond(client, [])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(len(self.written), 2)
+    def test_active (self):
+        client = self.connect()
+        self.respond(client, [self.rospec(client, 'Active')])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(len(self.written), 1)
+    def test_mismatch (self):
+        client = self.connect()
+        rospec = self.rospec(client, 'Active')
+        rospec['AISpec']['InventoryParameterSpec']['AntennaConfiguration']\
+                [0]['C1G2InventoryCommand']['C1G2SingulationControl']\
+                ['Session'] = 1
+        self.respond(client, [rospec])
+        self.assertEqual(self.names(), ['DELETE_ACCESSSPEC', 'DELETE_ROSPEC',
+                'ADD_ROSPEC', 'ENABLE_ROSPEC'])
+        self.respond(client, [])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+    def test_serial (self):
+        client = self.connect(pipeline=False)
+        self.assertEqual(self.names(), ['GET_READER_CAPABILITIES'])
+        self.respond(client, [])
+        self.assertEqual(self.names(), ['GET_ROSPECS'])
+        self.respond(client, [self.rospec(client, 'Inactive')])
+        self.assertEqual(self.names(), ['START_ROSPEC'])
+        self.respond(client, [])
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+    def test_serial_reset (self):
+        client = self.connect(pipeline=False)
+        self.respond(client, [])
+        self.respond(client, [])
+        self.assertEqual(self.names(), ['DELETE_ACCESSSPEC'])
+
+class TestKeepalive (unittest.TestCase):
+    def test_encode (self):
+        msg = sllurp.llrp.LLRPMessage(msgdict={'SET_READER_CONFIG': {
+                'Ver': 1, 'Type': 3, 'ID': 7, 'ResetToFactoryDefault': False,
+                'KeepaliveSpec': {'KeepaliveTriggerType': 'Periodic',
+                                  'PeriodicTriggerValue': 10000}}})
+        self.assertEqual(binascii.hexlify(msg.msgbytes),
+                '04030000001400000007' '00' '00dc0009' '01' '00002710')
+    def test_encode_unsupported (self):
+        self.assertRaises(sllurp.llrp_errors.LLRPError,
+                sllurp.llrp.LLRPMessage, msgdict={'SET_READER_CONFIG': {
+                    'Ver': 1, 'Type': 3, 'ID': 7,
+                    'ResetToFactoryDefault': False,
+                    'AntennaConfiguration': {}}})
+    def connect (self, **kwargs):
+        client = sllurp.llrp.LLRPClient(self, start_inventory=False,
+                keepalive_interval=10, **kwargs)
+        client.clock = task.Clock()
+        client.transport = proto_helpers.StringTransport()
+        client.peername = ('reader', 5084)
+        client.parseCapabilities = lambda capdict: None
+        client.dataReceived(TestLazyMessage._notification)
+        return client
+    def test_watchdog (self):
+        client = self.connect()
+        self.assertEqual(client.transport.value()[:2], '\x04\x03')
+        client.transport.clear()
+        client.dataReceived(response_bytes('SET_READER_CONFIG_RESPONSE', 1))
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_SENT_GET_CAPABILITIES)
+        self.assertEqual(len(client.clock.getDelayedCalls()), 1)
+        client.clock.advance(20)
+        client.dataReceived(TestLazyMessage._keepalive)
+        client.clock.advance(15)
+        # rescheduled for 30 seconds after the KEEPALIVE
+        self.assertFalse(client.transport.disconnecting)
+        self.assertEqual(len(client.clock.getDelayedCalls()), 1)
+        client.clock.advance(15)
+        self.assertTrue(client.transport.disconnected)
+        self.assertEqual(client.clock.getDelayedCalls(), [])
+    def test_rejected (self):
+        client = self.connect()
+        client.dataReceived(response_bytes('SET_READER_CONFIG_RESPONSE', 1,
+                                           status=100))
+        self.assertEqual(client.clock.getDelayedCalls(), [])
+    def test_pipelined (self):
+        client = self.connect(pipeline_bringup=True)
+        names = [sllurp.llrp_proto.Message_Type2Name[
+                    struct.unpack_from('!H', frame.tobytes())[0] & 0x3ff]
+                 for frame in sllurp.llrp.LLRPFramer().feed(
+                     client.transport.value())]
+        self.assertEqual(names, ['SET_READER_CONFIG',
+                'GET_READER_CAPABILITIES', 'DELETE_ACCESSSPEC',
+                'DELETE_ROSPEC'])
+        client.dataReceived(''.join(response_bytes(name + '_RESPONSE', i + 1)
+                                    for i, name in enumerate(names)))
+        self.assertEqual(client.state,
+                sllurp.llrp.LLRPClient.STATE_CONNECTED)
+        self.assertEqual(len(client.clock.getDelayedCalls()), 1)
+
+class TestReconnect (unittest.TestCase):
+    class connector (object):
+        def __init__ (self):
+            self.attempts = 0
+        def connect (self):
+            self.attempts += 1
+        def getDestination (self):
+            return address.IPv4Address('TCP',
+                    'reader', 5084)
+    def setUp (self):
+        self.factory = sllurp.llrp.LLRPClientFactory(reconnect=True,
+                reconnect_delay=1, max_reconnect_delay=5,
+                reconnect_jitter=0.5)
+        self.factory.clock = task.Clock()
+        self.connector = self.connector()
+        self.reason = failure.Failure(error.ConnectionRefusedError())
+    def fail (self):
+        self.factory.clientConnectionFailed(self.connector, self.reason)
+        return self.factory.clock.getDelayedCalls()[0].getTime() - \
+                self.factory.clock.seconds()
+    def test_backoff (self):
+        clock = self.factory.clock
+        for base in (1, 2, 4, 5, 5):
+            delay = self.fail()
+            self.assertTrue(base * 0.5 <= delay <= base * 1.5)
+            # another failure report while an attempt is pending is ignored
+            self.factory.clientConnectionLost(self.connector, self.reason)
+            self.assertEqual(len(clock.getDelayedCalls()), 1)
+            attempts = self.connector.attempts
+            clock.advance(delay)
+            self.assertEqual(self.connector.attempts, attempts + 1)
+        stats = self.factory.reconnectStats()
+        self.assertEqual(stats['reconnects'], 5)
+        self.assertEqual(stats['readers']['reader:5084']['attempts'], 5)
+    def test_reset (self):
+        self.fail()
+        self.factory.clock.advance(2)
+        proto = self.factory.buildProtocol(None)
+        proto.transport = mock_conn('')
+        proto.transport.connector = self.connector
+        proto.setState(sllurp.llrp.LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(self.factory.reconnectStats()['readers'], {})
+        self.assertTrue(self.fail() <= 1.5)
+        self.factory.stopReconnecting()
+        self.assertEqual(self.factory.clock.getDelayedCalls(), [])
+
+class TestCapabilitiesCache (unittest.TestCase):
+    gdc = {'MaxNumberOfAntennaSupported': 4, 'DeviceManufacturerName': 25882,
+           'ModelName': 2001002, 'ReaderFirmwareVersion': '5.6.2.240'}
+    def mode (self, i, mod, tari):
+        return {'ModeIdentifier': i, 'Mod': mod, 'MaxTari': tari,
+                'MinTari': 6250}
+    def setUp (self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'caps.json')
+        band = {'UHFRFModeTable': {}}
+        for i in range(1, 4):
+            band['TransmitPowerLevelTableEntry{}'.format(i)] = {
+                'Index': i, 'TransmitPowerValue': 1000 + 500 * i}
+        for i, (mod, tari) in enumerate([(0, 25000), (2, 25000),
+                                         (2, 12500), (3, 25000)]):
+            band['UHFRFModeTable']['UHFC1G2RFModeTableEntry{}'.format(i)] = \
+                    self.mode(i, mod, tari)
+        self.capdict = {'GeneralDeviceCapabilities': self.gdc,
+                'RegulatoryCapabilities': {'UHFBandCapabilities': band}}
+    def client (self, cache, **kwargs):
+        return sllurp.llrp.LLRPClient(self, start_inventory=False,
+                capabilities_cache=cache, **kwargs)
+    def test_parse (self):
+        caps = sllurp.capabilities.ReaderCapabilities.fromResponse(
+                self.capdict)
+        self.assertEqual(caps.tx_power_table, [0, 15.0, 20.0, 25.0])
+        self.assertEqual(caps.findMode(2)['ModeIdentifier'], 1)
+        self.assertEqual(caps.findMode(2, 12500)['ModeIdentifier'], 2)
+        self.assertIsNone(caps.findMode(1))
+        client = self.client(None, modulation='M8', antennas=(1, 5))
+        self.assertTrue(client.useCapabilities(self.capdict))
+        self.assertEqual(client.reader_mode['ModeIdentifier'], 3)
+        self.assertEqual(client.tx_power, 3)
+        self.assertEqual(client.antennas, [1])
+    def test_cache (self):
+        cache = sllurp.capabilities.CapabilitiesCache(self.path)
+        client = self.client(cache)
+        self.assertEqual(client.capabilitiesRequest()
+                ['GET_READER_CAPABILITIES']['RequestedData'], 1)
+        general = {'GeneralDeviceCapabilities': self.gdc}
+        self.assertFalse(client.useCapabilities(general))
+        self.assertTrue(client.useCapabilities(self.capdict))
+
+        # a new process, with the same model of reader
+        cache = sllurp.capabilities.CapabilitiesCache(self.path)
+        self.assertEqual(len(cache), 1)
+        client = self.client(cache, tari=12500)
+        self.assertTrue(client.useCapabilities(general))
+        self.assertEqual(client.reader_mode, self.mode(2, 2, 12500))
+        self.assertEqual(client.tx_power_table, [0, 15.0, 20.0, 25.0])
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        # different firmware
+        general = {'GeneralDeviceCapabilities': dict(self.gdc,
+            ReaderFirmwareVersion='5.8.0.1')}
+        self.assertFalse(client.useCapabilities(general))
+
+class TestFleet (unittest.TestCase):
+    def test_parse_reader (self):
+        parse = sllurp.fleet.parse_reader
+        defaults = {'tx_power': 50}
+        self.assertEqual(parse('r1', defaults), ('r1', 5084, defaults))
+        self.assertEqual(parse('r1:5085'), ('r1', 5085, {}))
+        self.assertEqual(parse({'host': 'r1', 'tx_power': 60}, defaults),
+                ('r1', 5084, {'tx_power': 60}))
+    def test_shards (self):
+        fleet = sllurp.fleet.Fleet(['r{}'.format(i) for i in range(5)],
+                                   workers=2, reconnect=True)
+        self.assertEqual([[host for host, _, _ in shard]
+                          for shard in fleet.shards],
+                         [['r0', 'r2', 'r4'], ['r1', 'r3']])
+        self.assertEqual(fleet.shards[0][0][2], {'reconnect': True})
+        fleet = sllurp.fleet.Fleet(['r0'], workers=4)
+        self.assertEqual(len(fleet.shards), 1)
+    def connect (self):
+        fleet = sllurp.fleet.Fleet(['r0'], workers=1)
+        worker = sllurp.fleet._Worker()
+        worker.channel.makeConnection(proto_helpers.StringTransport())
+        proc = sllurp.fleet._WorkerProcess(fleet, 0)
+        proc.channel.makeConnection(proto_helpers.StringTransport())
+        fleet._workers[0] = proc
+        return fleet, worker, proc
+    def deliver (self, channel, dest):
+        dest.dataReceived(channel.transport.value())
+        channel.transport.clear()
+    def test_channel (self):
+        fleet, worker, proc = self.connect()
+        batches = []
+        fleet.addTagBatchCallback(lambda peername, tags:
+                                  batches.append((peername, tags)))
+        tags = [{'EPC-96': '00112233', 'AntennaID': (1,)}]
+        worker.sendTags(('r0', 5084), tags)
+        self.deliver(worker.channel, proc.channel)
+        self.assertEqual(batches, [(('r0', 5084), tags)])
+
+        states = []
+        fleet.getProtocolStates().addCallback(states.append)
+        self.deliver(proc.channel, worker.channel)
+        self.deliver(worker.channel, proc.channel)
+        self.assertEqual(states, [{}])
+    def test_restart (self):
+        fleet, worker, proc = self.connect()
+        fleet.clock = task.Clock()
+        spawned = []
+        fleet.spawn = spawned.append
+        states = []
+        fleet.getProtocolStates().addCallback(states.append)
+        reason = failure.Failure(error.ProcessTerminated(signal=9))
+        proc.processEnded(reason)
+        # the unanswered query is left out
+        self.assertEqual(states, [{}])
+        self.assertEqual(fleet.stats(),
+                         {'workers': 1, 'running': 0, 'restarts': 1})
+        fleet.clock.advance(fleet.restart_delay)
+        self.assertEqual(spawned, [0])
+    def test_shutdown (self):
+        fleet, worker, proc = self.connect()
+        stopped = []
+        fleet.politeShutdown().addCallback(stopped.append)
+        self.assertIn('shutdown', proc.channel.transport.value())
+        self.assertEqual(stopped, [])
+        proc.processEnded(failure.Failure(error.ProcessDone(0)))
+        self.assertEqual(stopped, [None])
+        self.assertEqual(fleet.stats()['restarts'], 0)
+
+class TestAsyncClient (unittest.TestCase):
+    class reader (object):
+        """An asyncio transport answering every command with success, but
+        for those named in failing."""
+        def __init__ (self, protocol, loop, failing=()):
+            self.protocol = protocol
+            self.loop = loop
+            self.failing = failing
+            self.sent = []
+        def get_extra_info (self, name):
+            return None
+        def write (self, data):
+            for frame in sllurp.llrp.LLRPFramer().feed(data):
+                msgtype, _, msgid = struct.unpack_from('!HII',
+                        frame.tobytes())
+                name = sllurp.llrp_proto.Message_Type2Name[msgtype & 0x3ff]
+                self.sent.append(name)
+                if name + '_RESPONSE' in sllurp.llrp_proto.Message_struct:
+                    status = 100 if name in self.failing else 0
+                    self.loop.call_soon(self.protocol.data_received,
+                            response_bytes(name + '_RESPONSE', msgid,
+                                           status))
+        def close (self):
+            self.loop.call_soon(self.protocol.connection_lost, None)
+    def setUp (self):
+        if sllurp.aio.asyncio is None:
+            self.skipTest('Trollius is not installed')
+        self.loop = sllurp.aio.asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+    def test_inventory (self):
+        asyncio, From = sllurp.aio.asyncio, sllurp.aio.From
+        reader = sllurp.aio.AsyncLLRPClient(loop=self.loop)
+        client = reader.client
+        def parseCapabilities (capdict):
+            client.reader_mode = {'ModeIdentifier': 1, 'MaxTari': 7250}
+        client.parseCapabilities = parseCapabilities
+        transport = self.reader(reader, self.loop)
+        reader.connection_made(transport)
+        report = report_bytes()
+        got = []
+        @asyncio.coroutine
+        def run ():
+            reader.data_received(TestLazyMessage._notification)
+            yield From(reader.start_inventory())
+            reader.data_received(report)
+            got.append((yield From(reader.next_tags())))
+            yield From(reader.stop_politely(disconnect=True))
+            got.append((yield From(reader.next_tags())))
+        self.loop.run_until_complete(asyncio.wait_for(run(), 5,
+                loop=self.loop))
+        self.assertEqual(len(got[0]), 45)
+        self.assertIsNone(got[1])
+        self.assertEqual(transport.sent[-2:],
+                ['DELETE_ACCESSSPEC', 'DELETE_ROSPEC'])
+        self.assertIn('ENABLE_ROSPEC', transport.sent)
+    def failures (self, failing):
+        asyncio, From = sllurp.aio.asyncio, sllurp.aio.From
+        reader = sllurp.aio.AsyncLLRPClient(loop=self.loop,
+                                            start_inventory=False)
+        transport = self.reader(reader, self.loop, failing)
+        reader.connection_made(transport)
+        reader.client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        errors = []
+        @asyncio.coroutine
+        def attempt (coro):
+            try:
+                yield From(coro)
+            except sllurp.llrp_errors.LLRPError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        @asyncio.coroutine
+        def run ():
+            yield From(attempt(reader.access(readWords={
+                'MB': 3, 'WordPtr': 0, 'WordCount': 1})))
+            yield From(attempt(reader.stop_politely()))
+        self.loop.run_until_complete(asyncio.wait_for(run(), 5,
+                loop=self.loop))
+        return errors, transport.sent
+    def test_access_failure (self):
+        errors, sent = self.failures(['ENABLE_ACCESSSPEC'])
+        self.assertIsInstance(errors[0],
+                              sllurp.llrp_errors.LLRPResponseError)
+        self.assertIn('ENABLE_ACCESSSPEC', str(errors[0]))
+        self.assertIsNone(errors[1])
+        errors, sent = self.failures(['ADD_ACCESSSPEC'])
+        self.assertIsInstance(errors[0],
+                              sllurp.llrp_errors.LLRPResponseError)
+        self.assertNotIn('ENABLE_ACCESSSPEC', sent)
+    def test_stop_failure (self):
+        errors, sent = self.failures(['DELETE_ROSPEC'])
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], sllurp.llrp_errors.LLRPError)
+        errors, sent = self.failures(['DELETE_ACCESSSPEC'])
+        self.assertIsInstance(errors[1], sllurp.llrp_errors.LLRPError)
+        self.assertNotIn('DELETE_ROSPEC', sent)
+
+class TestTrace (unittest.TestCase):
+    _notification = TestLazyMessage._notification
+    def setUp (self):
+        self.events = []
+        sllurp.trace.add_hook(self.hook)
+    def hook (self, kind, name, fields):
+        self.events.append((kind, name, fields))
+    def tearDown (self):
+        sllurp.trace.remove_hook(self.hook)
+        self.assertFalse(sllurp.trace.enabled)
+    def test_events (self):
+        self.assertTrue(sllurp.trace.enabled)
+        msgdict = sllurp.llrp.LLRPMessage(msgbytes=self._notification).msgdict
+        self.assertIn('READER_EVENT_NOTIFICATION', msgdict)
+        names = [name for kind, name, _ in self.events if kind == 'decode']
+        self.assertEqual(names[0], 'READER_EVENT_NOTIFICATION')
+        self.assertIn('decode_UTCTimestamp_from', names)
+        sllurp.trace.log_hook(*self.events[0])
+    def test_untraced (self):
+        untraced = sllurp.bench.load_untraced()
+        # no trace statements are left, only the generated decoders' in
+        # string literals, which load_untraced() compiles without them
+        for line in sllurp.bench.untrace(
+                open(untraced.__file__).read()).splitlines():
+            self.assertFalse(line.strip().startswith(('trace.', 'if trace.')),
+                             line)
+        data = sllurp.bench.synthetic_reports(2, 3)
+        for body in sllurp.bench.report_bodies(data):
+            msg = untraced.decode_ROAccessReport(body)
+            self.assertFalse(self.events)
+            self.assertEqual(msg,
+                    sllurp.llrp_proto.decode_ROAccessReport(body))
+            self.assertTrue(self.events)
+            del self.events[:]
+
 class TestEncodings (unittest.TestCase):
     tagReportContentSelector = {
         'EnableROSpecID': False,
@@ -197,12 +1665,20 @@ class TestMessageStruct (unittest.TestCase):
             self.assertIsInstance(msg_struct['fields'], list)
 
     def test_unique_types (self):
-        d = {}
+        # messages and parameters are numbered separately
+        messages = {}
+        params = {}
         for msg_name, msg_struct in self.s.items():
             self.assertIn('type', msg_struct)
             self.assertIsInstance(msg_struct['type'], int)
+            if msg_struct['fields'][:3] == ['Ver', 'Type', 'ID']:
+                d = messages
+            else:
+                d = params
             self.assertNotIn(msg_struct['type'], d)
             d[msg_struct['type']] = True
+        self.assertEqual(sllurp.llrp_proto.Message_Type2Name[13],
+                'SET_READER_CONFIG_RESPONSE')
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,146 @@
+"""Hierarchical timer wheel for expiring large numbers of keys.
+
+A TimerWheel keeps keys in rings of slots, so scheduling, cancelling and
+expiring a key each take constant time (amortized) however many keys are
+pending; nothing ever scans them all.  The first ring has a slot per tick;
+each further ring has a slot per turn of the ring below it, and its keys
+cascade down into that ring when their slot comes around, so levels rings of
+slots slots reach slots ** levels ticks ahead.  The wheel knows nothing of
+clocks: its owner calls advance() once per tick and handles the keys it
+returns, or a ClockedTimerWheel advances itself on a clock.
+"""
+
+import math
+from twisted.internet import reactor
+
+class TimerWheel (object):
+    """Keys that expire after a whole number of ticks, up to
+    slots ** levels - 1."""
+
+    def __init__ (self, slots, levels=1):
+        if slots < 2:
+            raise ValueError('a timer wheel needs at least two slots')
+        if levels < 1:
+            raise ValueError('a timer wheel needs at least one level')
+        # ticks per slot of each level
+        self.spans = [slots ** level for level in xrange(levels)]
+        self.rings = [[set() for _ in xrange(slots)]
+                      for _ in xrange(levels)]
+        self.horizon = slots ** levels
+        # the current tick
+        self.now = 0
+        # key -> (level, slot index, tick it expires on)
+        self._where = {}
+
+    @property
+    def slots (self):
+        """The slots of the first level."""
+        return self.rings[0]
+
+    def __len__ (self):
+        return len(self._where)
+
+    def __contains__ (self, key):
+        return key in self._where
+
+    def schedule (self, key, ticks):
+        """Expire key ticks ticks from now, replacing any earlier
+        schedule."""
+        if not 0 < ticks < self.horizon:
+            raise ValueError('cannot schedule {} ticks ahead on a wheel '
+                             'reaching {}'.format(ticks, self.horizon))
+        self.cancel(key)
+        self._place(key, self.now + ticks)
+
+    def _place (self, key, deadline):
+        ahead = deadline - self.now
+        level = len(self.spans) - 1
+        while level and ahead < self.spans[level]:
+            level -= 1
+        index = (deadline // self.spans[level]) % len(self.rings[0])
+        self.rings[level][index].add(key)
+        self._where[key] = (level, index, deadline)
+
+    def cancel (self, key):
+        """Forget key, if it is scheduled."""
+        where = self._where.pop(key, None)
+        if where is not None:
+            level, index, _ = where
+            self.rings[level][index].discard(key)
+
+    def advance (self):
+        """Move to the next tick and return the keys that expire on it."""
+        self.now += 1
+        nslots = len(self.rings[0])
+        # cascade the slots coming around on the upper levels, top down,
+        # so that their keys land in the slots about to be handled
+        for level in xrange(len(self.spans) - 1, 0, -1):
+            span = self.spans[level]
+            if self.now % span:
+                continue
+            index = (self.now // span) % nslots
+            keys = self.rings[level][index]
+            if keys:
+                self.rings[level][index] = set()
+                for key in keys:
+                    self._place(key, self._where[key][2])
+        index = self.now % nslots
+        expired = self.rings[0][index]
+        if not expired:
+            return ()
+        self.rings[0][index] = set()
+        where = self._where
+        for key in expired:
+            del where[key]
+        return expired
+
+def ticks_for (seconds, resolution):
+    """Return the number of ticks of resolution seconds, at least one, that
+    cover seconds."""
+    return max(1, int(math.ceil(seconds / resolution - 1e-9)))
+
+class ClockedTimerWheel (TimerWheel):
+    """A TimerWheel that advances itself every resolution seconds of clock
+    (the reactor, or anything else with its seconds() and callLater()) while
+    it holds keys, and calls expired(keys) with the keys expiring on each
+    tick."""
+
+    def __init__ (self, expired, resolution, slots, levels=1, clock=reactor):
+        TimerWheel.__init__(self, slots, levels)
+        self.expired = expired
+        self.resolution = resolution
+        self.clock = clock
+        # the time of tick 0, and the call of the next tick
+        self._epoch = None
+        self._call = None
+        self._ticking = False
+
+    def schedule (self, key, ticks):
+        TimerWheel.schedule(self, key, ticks)
+        if self._call is None and not self._ticking:
+            self._epoch = self.clock.seconds() - self.now * self.resolution
+            self._call = self.clock.callLater(self.resolution, self._tick)
+
+    def stop (self):
+        """Stop ticking until another key is scheduled."""
+        if self._call is not None:
+            if self._call.active():
+                self._call.cancel()
+            self._call = None
+
+    def _tick (self):
+        self._call = None
+        self._ticking = True
+        try:
+            due = int((self.clock.seconds() - self._epoch) /
+                      self.resolution + 1e-9)
+            while self.now < due:
+                keys = self.advance()
+                if keys:
+                    self.expired(keys)
+        finally:
+            self._ticking = False
+        if self._where:
+            delay = self._epoch + (self.now + 1) * self.resolution - \
+                    self.clock.seconds()
+            self._call = self.clock.callLater(max(delay, 0), self._tick)
@@ -0,0 +1,58 @@
+"""Tracing hooks for the LLRP codec and client.
+
+Trace points in the hot paths are written as
+
+    if trace.enabled:
+        trace.event('decode', 'LLRPStatus', type=msgtype, length=length)
+
+so that when tracing is off (the default) they cost one attribute lookup and
+a test, and none of the event's arguments are evaluated.  Each event is a
+kind ('decode', 'recv', ...), the name of the thing it concerns, and keyword
+fields, which are passed as-is to every hook added with add_hook().  Raw
+bytes are passed unformatted; log_hook hexlifies them only when it runs.
+
+trace.enable() logs events at DEBUG level to the sllurp.trace logger.
+"""
+
+import logging
+from binascii import hexlify
+
+logger = logging.getLogger(__name__)
+
+enabled = False
+hooks = []
+
+def _update ():
+    global enabled
+    enabled = bool(hooks)
+
+def add_hook (hook):
+    """Call hook(kind, name, fields) for every trace event."""
+    hooks.append(hook)
+    _update()
+
+def remove_hook (hook):
+    hooks.remove(hook)
+    _update()
+
+def event (kind, name, **fields):
+    for hook in hooks:
+        hook(kind, name, fields)
+
+def log_hook (kind, name, fields):
+    formatted = []
+    for key, value in sorted(fields.items()):
+        if isinstance(value, (str, buffer, bytearray, memoryview)):
+            value = hexlify(value)
+        formatted.append('{}={}'.format(key, value))
+    logger.debug('%s %s %s', kind, name, ' '.join(formatted))
+
+def enable ():
+    """Log trace events to the sllurp.trace logger."""
+    if log_hook not in hooks:
+        add_hook(log_hook)
+
+def disable ():
+    """Remove all trace hooks."""
+    del hooks[:]
+    _update()